@@ -36,6 +36,8 @@ except ImportError:
 
 
 import rabbitvcs.util.helper
+from rabbitvcs.util.settings import add_settings_listener, \
+    remove_settings_listener
 from rabbitvcs.vcs import create_vcs_instance
 from rabbitvcs.util.contextmenu import GtkFilesContextMenuConditions, \
     GtkFilesContextMenuCallbacks, MainContextMenu, MainContextMenuCallbacks, \
@@ -244,7 +246,11 @@ class RabbitVCSWindowHelper(GtkContextMenuCaller):
         # Insert menu items
         self._insert_menu()
 
+        add_settings_listener(self.on_settings_changed)
+
     def deactivate(self):
+        remove_settings_listener(self.on_settings_changed)
+
         # Remove any installed menu items
         self._remove_menu()
 
@@ -348,10 +354,11 @@ class RabbitVCSWindowHelper(GtkContextMenuCaller):
 
             self._menubar_menu.update_action(action)
 
-    # Menu activate handlers
-    def reload_settings(self, proc):
+    def on_settings_changed(self, changed):
         self.update_ui()
 
+    # Menu activate handlers
+
     def on_context_menu_command_finished(self):
         self.update_ui()
 
@@ -52,18 +52,18 @@ def log_all_exceptions(type, value, tb):
 # sys.excepthook = log_all_exceptions
 
 import copy
+import subprocess
+from collections import deque
 
 import os
 os.environ["NAUTILUS_PYTHON_REQUIRE_GTK3"] = "1"
 
 import os.path
-from os.path import isdir, isfile, realpath, basename
+from os.path import isdir, isfile, realpath, basename, dirname
 import datetime
 
 from gi.repository import Nemo, GObject, Gtk, GdkPixbuf
 
-import pysvn
-
 from rabbitvcs.vcs import VCS
 import rabbitvcs.vcs.status
 
@@ -73,21 +73,19 @@ from rabbitvcs.util.helper import pretty_timedelta
 
 from rabbitvcs.util.decorators import timeit, disable
 
-from rabbitvcs.util.contextmenu import MenuBuilder, MainContextMenu, SEPARATOR, ContextMenuConditions
+from rabbitvcs.util.emblems import EmblemUpdater
 
 import rabbitvcs.ui
-import rabbitvcs.ui.property_page
 
 from rabbitvcs.util.log import Log, reload_log_settings
 log = Log("rabbitvcs.util.extensions.Nemo.RabbitVCS")
 
-from rabbitvcs import gettext, get_icon_path
+from rabbitvcs import gettext
 _ = gettext.gettext
 
 from rabbitvcs import version as EXT_VERSION
 
-from rabbitvcs.util.settings import SettingsManager
-settings = SettingsManager()
+from rabbitvcs.util.settings import get_settings, add_settings_listener
 
 import rabbitvcs.services.service
 from rabbitvcs.services.checkerservice import StatusCheckerStub as StatusChecker
@@ -119,76 +117,13 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
     #: checker info.
     always_invalidate = True
 
-    #: When we get the statuses from the callback, put them here for further
-    #: use. This is of the form: [("path/to", {...status dict...}), ...]
-    statuses_from_callback = []
+    #: The most folders we ask the status checker to watch for us
+    max_subscriptions = 50
 
     def get_local_path(self, path):
         return path.replace("file://", "")
 
     def __init__(self):
-        factory = Gtk.IconFactory()
-
-        rabbitvcs_icons = [
-            "scalable/actions/rabbitvcs-settings.svg",
-            "scalable/actions/rabbitvcs-export.svg",
-            "scalable/actions/rabbitvcs-properties.svg",
-            "scalable/actions/rabbitvcs-show_log.svg",
-            "scalable/actions/rabbitvcs-delete.svg",
-            "scalable/actions/rabbitvcs-run.svg",
-            "scalable/actions/rabbitvcs-unlock.svg",
-            "scalable/actions/rabbitvcs-dbus.svg",
-            "scalable/actions/rabbitvcs-rename.svg",
-            "scalable/actions/rabbitvcs-help.svg",
-            "scalable/actions/rabbitvcs-update.svg",
-            "scalable/actions/rabbitvcs-diff.svg",
-            "scalable/actions/rabbitvcs-resolve.svg",
-            "scalable/actions/rabbitvcs-about.svg",
-            "scalable/actions/rabbitvcs-add.svg",
-            "scalable/actions/rabbitvcs-changes.svg",
-            "scalable/actions/rabbitvcs-createpatch.svg",
-            "scalable/actions/rabbitvcs-merge.svg",
-            "scalable/actions/rabbitvcs-drive.svg",
-            "scalable/actions/rabbitvcs-stop.svg",
-            "scalable/actions/rabbitvcs-checkout.svg",
-            "scalable/actions/rabbitvcs-import.svg",
-            "scalable/actions/rabbitvcs-branch.svg",
-            "scalable/actions/rabbitvcs-refresh.svg",
-            "scalable/actions/rabbitvcs-editconflicts.svg",
-            "scalable/actions/rabbitvcs-monkey.svg",
-            "scalable/actions/rabbitvcs-applypatch.svg",
-            "scalable/actions/rabbitvcs-switch.svg",
-            "scalable/actions/rabbitvcs-lock.svg",
-            "scalable/actions/rabbitvcs-annotate.svg",
-            "scalable/actions/rabbitvcs-compare.svg",
-            "scalable/actions/rabbitvcs-revert.svg",
-            "scalable/actions/rabbitvcs-bug.svg",
-            "scalable/actions/rabbitvcs-cleanup.svg",
-            "scalable/actions/rabbitvcs-clear.svg",
-            "scalable/actions/rabbitvcs-unstage.svg",
-            "scalable/actions/rabbitvcs-emblems.svg",
-            "scalable/actions/rabbitvcs-relocate.svg",
-            "scalable/actions/rabbitvcs-reset.svg",
-            "scalable/actions/rabbitvcs-asynchronous.svg",
-            "scalable/actions/rabbitvcs-commit.svg",
-            "scalable/actions/rabbitvcs-checkmods.svg",
-            "scalable/apps/rabbitvcs.svg",
-            "scalable/apps/rabbitvcs-small.svg",
-            "16x16/actions/rabbitvcs-push.png"
-        ]
-        
-        rabbitvcs_icon_path = get_icon_path()
-        for rel_icon_path in rabbitvcs_icons:
-            icon_path = "%s/%s" % (rabbitvcs_icon_path, rel_icon_path)
-            file = os.path.basename(rel_icon_path)
-            (root, ext) = os.path.splitext(file)
-
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(icon_path)
-            iconset = Gtk.IconSet.new_from_pixbuf(pixbuf)
-            factory.add(root, iconset)
-
-        factory.add_default()
-    
         # Create a global client we can use to do VCS related stuff
         self.vcs_client = VCS()
 
@@ -197,6 +132,20 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         self.status_checker.assert_version(EXT_VERSION)
         
         self.items_cache = {}
+
+        # Statuses we get back from the status checker are drawn in batches
+        self.emblem_updater = EmblemUpdater(self.invalidate_item)
+
+        add_settings_listener(self.on_settings_changed)
+
+        # The folders we have asked the checker to watch, least recently seen
+        # first
+        self.subscriptions = deque()
+        self.status_checker.connect_statuses_changed(self.on_statuses_changed)
+        self.status_checker.connect_subscriptions_dropped(
+            self.on_subscriptions_dropped)
+        self.status_checker.connect_checker_restarted(
+            self.on_checker_restarted)
         
     def get_columns(self):
         """
@@ -250,6 +199,7 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         @param  item:
 
         """
+        settings = get_settings()
         enable_emblems = bool(int(settings.get("general", "enable_emblems")))
         enable_attrs = bool(int(settings.get("general", "enable_attributes")))
         
@@ -261,6 +211,11 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
 
         # log.debug("update_file_info() called for %s" % path)
 
+        # We are only asked about an item we have seen before when the file
+        # manager is refreshing it or has noticed it change, or when the
+        # checker has told us it changed (see on_statuses_changed), so it
+        # should be checked again. Changes that the file manager can't see
+        # (eg. commits made from a terminal) reach us through the checker.
         invalidate = False
         if path in self.nautilusVFSFile_table:
             invalidate = True
@@ -277,26 +232,16 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         is_in_a_or_a_working_copy = self.vcs_client.is_in_a_or_a_working_copy(path)
         if not is_in_a_or_a_working_copy: return Nemo.OperationResult.COMPLETE
 
-        # Do our magic...
-
-        # I have added extra logic in cb_status, using a list
-        # (paths_from_callback) that should allow us to work around this for
-        # now. But it'd be good to have an actual status monitor.
+        self.subscribe(dirname(path))
 
-        found = False
-        status = None
-        # Could replace with (st for st in self.... if st.path ...).next()
-        # Need to catch exception
-        for idx in xrange(len(self.statuses_from_callback)):
-            found = (self.statuses_from_callback[idx].path) == path
-            if found: break
+        # Do our magic...
 
-        if found: # We're here because we were triggered by a callback
-            status = self.statuses_from_callback[idx]
-            del self.statuses_from_callback[idx]
+        # If we're here because the item was invalidated by cb_status, the
+        # emblem updater is holding on to the status that was received.
+        status = self.emblem_updater.take(path)
 
         # Don't bother the checker if we already have the info from a callback
-        if not found:
+        if status is None:
             status = \
                 self.status_checker.check_status(path,
                                                  recurse=True,
@@ -371,6 +316,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
 
         """
 
+        load_menu_classes()
+
         paths = []
         for item in items:
             if self.valid_uri(item.get_uri()):
@@ -399,6 +346,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         return ()
 
     def get_file_items(self, window, items):
+        load_menu_classes()
+
         paths = []
         for item in items:
             if self.valid_uri(item.get_uri()):
@@ -453,6 +402,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
 
         """
 
+        load_menu_classes()
+
         if not self.valid_uri(item.get_uri()): return
         path = rabbitvcs.util.helper.unquote_url(self.get_local_path(item.get_uri()))
         self.nautilusVFSFile_table[path] = item
@@ -476,6 +427,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         return ()
 
     def get_background_items(self, window, item):
+        load_menu_classes()
+
         if not self.valid_uri(item.get_uri()): return
         path = rabbitvcs.util.helper.unquote_url(self.get_local_path(item.get_uri()))
         self.nautilusVFSFile_table[path] = item
@@ -487,6 +440,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         return NautilusMainContextMenu(self, path, [path]).get_menu()
 
     def update_background_items(self, provider, base_dir, paths, conditions_dict):
+        load_menu_classes()
+
         paths_str = "-".join(paths)
         conditions = NautilusMenuConditions(conditions_dict)
         self.items_cache[paths_str] =  conditions_dict
@@ -514,26 +469,33 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
     #
 
     def rescan_after_process_exit(self, proc, paths):
+        # The checker tells every window showing these paths (this one
+        # included) to check them, and everything in them, again. This is
+        # needed among other things for:
+        #
+        #   - When a directory is normal and you add files inside it
+        #
+        self.execute_after_process_exit(proc,
+            lambda: self.status_checker.invalidate(paths))
 
-        def do_check():
-            # We'll check the paths first (these were the paths that
-            # were originally passed along to the context menu).
-            #
-            # This is needed among other things for:
-            #
-            #   - When a directory is normal and you add files inside it
-            #
-            for path in paths:
-                # We're not interested in the result now, just the callback
-                self.status_checker.check_status(path,
-                                                 recurse=True,
-                                                 invalidate=True,
-                                                 callback=self.cb_status,
-                                                 summary=True)
+    def execute_after_process_exit(self, proc, func=None):
 
-        self.execute_after_process_exit(proc, do_check)
+        if isinstance(proc, subprocess.Popen):
+            # We started the process ourselves, so the main loop can tell us
+            # when it exits rather than us asking every second
+            def process_exited(pid, condition):
+                log.debug("Process %i exited" % pid)
+                if callable(func):
+                    func()
 
-    def execute_after_process_exit(self, proc, func=None):
+            GObject.child_watch_add(proc.pid, process_exited)
+            return
+
+        if hasattr(proc, "add_exit_callback"):
+            # Windows opened in the UI host aren't our children, but the host
+            # tells us when they close
+            proc.add_exit_callback(func)
+            return
 
         def is_process_still_alive():
             log.debug("is_process_still_alive() for pid: %i" % proc.pid)
@@ -553,25 +515,101 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         # Add our callback function on a 1 second timeout
         GObject.timeout_add_seconds(1, is_process_still_alive)
 
+    def subscribe(self, folder):
+        """
+        Asks the status checker to tell us when the items in the given folder
+        change, forgetting the least recently seen folder if we are watching
+        too many.
+
+        """
+
+        if folder in self.subscriptions:
+            # Just remember that it was seen
+            self.subscriptions.remove(folder)
+            self.subscriptions.append(folder)
+            return
+
+        self.subscriptions.append(folder)
+        self.status_checker.subscribe(folder)
+
+        while len(self.subscriptions) > self.max_subscriptions:
+            oldest = self.subscriptions.popleft()
+            self.status_checker.unsubscribe(oldest)
+
+    def on_subscriptions_dropped(self, folders):
+        """
+        Called when the status checker stops watching the given folders. They
+        are subscribed to again the next time one of their items is shown.
+
+        """
+
+        for folder in folders:
+            if folder in self.subscriptions:
+                self.subscriptions.remove(folder)
+
+    def on_checker_restarted(self):
+        """
+        Called when a new status checker has taken over, which doesn't know
+        about our subscriptions.
+
+        """
+
+        folders = list(self.subscriptions)
+        self.subscriptions = deque()
+        for folder in folders:
+            self.subscribe(folder)
+
+    def on_statuses_changed(self, paths, trees):
+        """
+        Called when the status checker announces that the given paths, or
+        anything in the given trees, may have changed. The items we are
+        showing are invalidated so they are checked again.
+
+        """
+
+        changed = set([path for path in paths
+                       if path in self.nautilusVFSFile_table])
+
+        for tree in trees:
+            prefix = tree.rstrip("/") + "/"
+            changed.update([path for path in self.nautilusVFSFile_table
+                            if path == tree or path.startswith(prefix)])
+
+        for path in changed:
+            # Any status we were about to draw is out of date too
+            self.emblem_updater.discard(path)
+            self.invalidate_item(path)
+
     #
     # Some other methods
     #
 
-    def reload_settings(self, proc):
+    def on_settings_changed(self, changed):
         """
-        Used to re-load settings after the settings dialog has been closed.
+        Called by the settings manager when the settings file has changed
+        (eg. after the settings dialog has been closed).
+
+        @type   changed: list
+        @param  changed: The (section, keyword) tuples of the changed settings
 
-        FIXME: This probably doesn't belong here, ideally the settings manager
-        does this itself and make sure everything is reloaded properly
-        after the settings dialogs saves.
         """
 
-        def do_reload_settings():
-            globals()["settings"] = SettingsManager()
+        if [section for (section, keyword) in changed if section == "logging"]:
             globals()["log"] = reload_log_settings()("rabbitvcs.util.extensions.nautilus")
-            log.debug("Re-scanning settings")
 
-        self.execute_after_process_exit(proc, do_reload_settings)
+        # Emblems and attributes have to be drawn (or removed) for everything
+        # that is already on screen.  This may be called from within
+        # update_file_info, so the items are invalidated from the main loop.
+        if (("general", "enable_emblems") in changed or
+                ("general", "enable_attributes") in changed):
+            def invalidate_all():
+                for path in self.nautilusVFSFile_table.keys():
+                    self.invalidate_item(path)
+                return False
+
+            GObject.idle_add(invalidate_all)
+
+        log.debug("Settings changed: %s" % changed)
 
 
     #
@@ -582,31 +620,39 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
         """
         This is the callback that C{StatusMonitor} calls.
 
-        @type   path:   string
-        @param  path:   The path of the item something interesting happened to.
+        The status is handed to the emblem updater, which invalidates the item
+        at the next opportunity (see C{invalidate_item}). Several statuses for
+        the same path arriving in the meantime only cause a single redraw.
+
+        @type   status: status object
+        @param  status: The status
+        """
+        self.emblem_updater.push(status)
+        if status.path in self.items_cache:
+            del self.items_cache[status.path]
 
-        @type   statuses: list of status objects
-        @param  statuses: The statuses
+    def invalidate_item(self, path):
         """
-        if status.path in self.nautilusVFSFile_table:
-            item = self.nautilusVFSFile_table[status.path]
-            # We need to invalidate the extension info for only one reason:
-            #
-            # - Invalidating the extension info will cause Nautilus to remove all
-            #   temporary emblems we applied so we don't have overlay problems
-            #   (with ourselves, we'd still have some with other extensions).
-            #
-            # After invalidating C{update_file_info} applies the correct emblem.
-            # Since invalidation triggers an "update_file_info" call, we can
-            # tell it NOT to invalidate the status checker path.
-            self.statuses_from_callback.append(status)
-            # NOTE! There is a call to "update_file_info" WITHIN the call to
-            # invalidate_extension_info() - beware recursion!
-            item.invalidate_extension_info()
-            if status.path in self.items_cache:
-                del self.items_cache[status.path]
-        else:
-            log.debug("Path [%s] not found in file table" % status.path)
+        Invalidate the extension info for the item at the given path. This is
+        called by the emblem updater.
+
+        @rtype:         boolean
+        @return:        False if we don't know about the path.
+        """
+        if path not in self.nautilusVFSFile_table:
+            return False
+
+        # We need to invalidate the extension info for only one reason:
+        #
+        # - Invalidating the extension info will cause Nautilus to remove all
+        #   temporary emblems we applied so we don't have overlay problems
+        #   (with ourselves, we'd still have some with other extensions).
+        #
+        # After invalidating C{update_file_info} applies the correct emblem.
+        # NOTE! There is a call to "update_file_info" WITHIN the call to
+        # invalidate_extension_info() - beware recursion!
+        self.nautilusVFSFile_table[path].invalidate_extension_info()
+        return True
 
     def get_property_pages(self, items):
         paths = []
@@ -621,6 +667,8 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
 
         if len(paths) == 0: return []
 
+        import rabbitvcs.ui.property_page
+
         label = rabbitvcs.ui.property_page.PropertyPageLabel(claim_domain=False).get_widget()
         page = rabbitvcs.ui.property_page.PropertyPage(paths, claim_domain=False).get_widget()
 
@@ -630,42 +678,61 @@ class RabbitVCS(Nemo.InfoProvider, Nemo.MenuProvider,
 
         return [ppage]
 
-from rabbitvcs.util.contextmenuitems import *
+#: The menu classes are only defined by load_menu_classes(), the first time a
+#: menu is requested (see below).
+NautilusContextMenu = None
+NautilusMenuConditions = None
+NautilusMainContextMenu = None
 
-class NautilusContextMenu(MenuBuilder):
+def load_menu_classes():
     """
-    Provides a standard Nautilus context menu (ie. a list of
-    "Nemo.MenuItem"s).
+    Defines our menu classes and registers the menu icons. This needs the
+    context menu modules (and through them a good part of the UI code), which
+    we don't want Nemo to pay for while it is starting up, so it is only
+    done when the first menu is built.
     """
+    global NautilusContextMenu, NautilusMenuConditions, NautilusMainContextMenu
 
-    signal = "activate"
+    if NautilusMainContextMenu is not None:
+        return
 
-    def make_menu_item(self, item, id_magic):
-#        return item.make_nautilus_menu_item(id_magic)
+    from rabbitvcs.util.contextmenu import MenuBuilder, MainContextMenu, ContextMenuConditions
+    from rabbitvcs.util.icons import register_icons
 
-        identifier = item.make_magic_id(id_magic)
+    register_icons()
 
-        menuitem = Nemo.MenuItem(
-        name=identifier,
-        label=item.make_label(),
-        tip=item.tooltip,
-        icon=item.icon
-        )
+    class NautilusContextMenu(MenuBuilder):
+        """
+        Provides a standard Nautilus context menu (ie. a list of
+        "Nemo.MenuItem"s).
+        """
+
+        signal = "activate"
+
+        def make_menu_item(self, item, id_magic):
+            identifier = item.make_magic_id(id_magic)
+
+            menuitem = Nemo.MenuItem(
+            name=identifier,
+            label=item.make_label(),
+            tip=item.tooltip,
+            icon=item.icon
+            )
                     
-        return menuitem
+            return menuitem
 
-    def attach_submenu(self, menu_node, submenu_list):
-        submenu = Nemo.Menu()
-        menu_node.set_submenu(submenu)
-        [submenu.append_item(item) for item in submenu_list]
+        def attach_submenu(self, menu_node, submenu_list):
+            submenu = Nemo.Menu()
+            menu_node.set_submenu(submenu)
+            [submenu.append_item(item) for item in submenu_list]
 
-    def top_level_menu(self, items):
-        return items
+        def top_level_menu(self, items):
+            return items
 
-class NautilusMenuConditions(ContextMenuConditions):
-    def __init__(self, path_dict):
-        self.path_dict = path_dict
+    class NautilusMenuConditions(ContextMenuConditions):
+        def __init__(self, path_dict):
+            self.path_dict = path_dict
 
-class NautilusMainContextMenu(MainContextMenu):
-    def get_menu(self):
-        return NautilusContextMenu(self.structure, self.conditions, self.callbacks).menu
+    class NautilusMainContextMenu(MainContextMenu):
+        def get_menu(self):
+            return NautilusContextMenu(self.structure, self.conditions, self.callbacks).menu
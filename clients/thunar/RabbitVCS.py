@@ -53,8 +53,7 @@ log = Log("rabbitvcs.util.extensions.thunarx.RabbitVCS")
 from rabbitvcs import gettext
 _ = gettext.gettext
 
-from rabbitvcs.util.settings import SettingsManager
-settings = SettingsManager()
+from rabbitvcs.util.settings import add_settings_listener
 
 import rabbitvcs.services.service
 from rabbitvcs.services.checkerservice import StatusCheckerStub as StatusChecker
@@ -147,6 +146,8 @@ class RabbitVCS(thunarx.MenuProvider, thunarx.PropertyPageProvider):
         threading.currentThread().setName("RabbitVCS extension thread")
         
         self.status_checker = StatusChecker()
+
+        add_settings_listener(self.on_settings_changed)
     
     def get_local_path(self, item):
         return urllib.unquote(item.get_uri().replace("file://", ""))
@@ -286,21 +287,16 @@ class RabbitVCS(thunarx.MenuProvider, thunarx.PropertyPageProvider):
     # Some other methods
     # 
     
-    def reload_settings(self, proc):
+    def on_settings_changed(self, changed):
         """
-        Used to re-load settings after the settings dialog has been closed.
-        
-        FIXME: This probably doesn't belong here, ideally the settings manager
-        does this itself and make sure everything is reloaded properly 
-        after the settings dialogs saves.
+        Called by the settings manager when the settings file has changed
+        (eg. after the settings dialog has been closed).
+
         """
-    
-        def do_reload_settings():
-            globals()["settings"] = SettingsManager()
+
+        if [section for (section, keyword) in changed if section == "logging"]:
             globals()["log"] = reload_log_settings()("rabbitvcs.util.extensions.thunar")
             log.debug("Re-scanning settings")
-            
-        self.execute_after_process_exit(proc, do_reload_settings)
 
     def get_property_pages(self, items):
 
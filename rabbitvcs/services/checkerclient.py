@@ -0,0 +1,339 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+A client for the checker service that doesn't need a main loop, for scripts
+and editor integrations (the file manager extensions use StatusCheckerStub).
+
+Every call returns a Request straight away, and a few threads make the calls,
+each on its own connection, so many calls can be waiting on the checker at
+once.  For example, to check a lot of paths and use the statuses as they
+arrive:
+
+    client = StatusCheckerClient()
+    requests = [client.check_status(path) for path in paths]
+    for request in as_completed(requests, timeout=30):
+        print request.path, request.wait().single
+    client.close()
+
+The statuses are the same Status objects that the stub returns.
+"""
+
+import threading
+import time
+from Queue import Queue, Empty
+
+import simplejson
+import dbus
+
+from rabbitvcs.services.checkerprotocol import INTERFACE, OBJECT_PATH, \
+    SERVICE, TIMEOUT, SERVICE_VERSION, decode_status, decode_items, start
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.services.checkerclient")
+
+class RequestCancelled(Exception):
+    """ The request was cancelled before it was answered. """
+
+class RequestTimeout(Exception):
+    """ The request wasn't answered in time. """
+
+class Request(object):
+    """ A call to the checker service that may not have been answered yet.
+    """
+
+    def __init__(self, method, args, decode, timeout, path=None):
+        self.method = method
+        self.args = args
+        self.decode = decode
+        self.timeout = timeout
+
+        # The path that was asked about, for status checks
+        self.path = path
+
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.started = False
+        self.cancelled = False
+        self.result = None
+        self.error = None
+        self.callbacks = []
+
+    def run(self, checker):
+        """ Makes the call (from a worker thread) unless it was cancelled. """
+        self.lock.acquire()
+        try:
+            if self.cancelled:
+                return
+            self.started = True
+        finally:
+            self.lock.release()
+
+        try:
+            reply = getattr(checker, self.method)(*self.args,
+                                                   dbus_interface=INTERFACE,
+                                                   timeout=self.timeout)
+            self.set_result(self.decode(reply))
+        except Exception, ex:
+            self.set_error(ex)
+
+    def set_result(self, result):
+        self.result = result
+        self._finish()
+
+    def set_error(self, error):
+        self.error = error
+        self._finish()
+
+    def _finish(self):
+        self.lock.acquire()
+        try:
+            self.finished.set()
+            callbacks = self.callbacks
+            self.callbacks = []
+        finally:
+            self.lock.release()
+
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception, ex:
+                log.exception(ex)
+
+    def cancel(self):
+        """ Cancels the request if it hasn't been sent yet.
+
+        @rtype:     boolean
+        @return:    False if it was too late to cancel it.
+        """
+        self.lock.acquire()
+        try:
+            if self.started or self.finished.isSet():
+                return self.cancelled
+            self.cancelled = True
+        finally:
+            self.lock.release()
+
+        self.set_error(RequestCancelled())
+        return True
+
+    def done(self):
+        return self.finished.isSet()
+
+    def add_done_callback(self, callback):
+        """ Calls the given function with this request once it has been
+        answered (or failed, or been cancelled). This is done from a worker
+        thread, or straight away if it has already been answered.
+        """
+        self.lock.acquire()
+        try:
+            if not self.finished.isSet():
+                self.callbacks.append(callback)
+                return
+        finally:
+            self.lock.release()
+
+        callback(self)
+
+    def wait(self, timeout=None):
+        """ Waits for the answer and returns it.
+
+        @raise  RequestTimeout: if it wasn't answered within timeout seconds
+        @raise  RequestCancelled: if the request was cancelled
+        @raise  dbus.DBusException: if the call itself failed
+        """
+        self.finished.wait(timeout)
+        if not self.finished.isSet():
+            raise RequestTimeout()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.result
+
+def as_completed(requests, timeout=None):
+    """ Yields the given requests as they are answered.
+
+    @raise  RequestTimeout: if they haven't all been answered within timeout
+                            seconds
+    """
+    finished = Queue()
+    for request in requests:
+        request.add_done_callback(finished.put)
+
+    end = None
+    if timeout is not None:
+        end = time.time() + timeout
+
+    for i in range(len(requests)):
+        wait = None
+        if end is not None:
+            wait = max(end - time.time(), 0)
+
+        try:
+            yield finished.get(timeout=wait)
+        except Empty:
+            raise RequestTimeout()
+
+class StatusCheckerClient:
+    """ Calls the checker service from a pool of threads. See the module
+    documentation.
+    """
+
+    #: The most calls waiting on the checker at once
+    WORKERS = 8
+
+    def __init__(self, workers=None, timeout=TIMEOUT, start_checker=True):
+        """
+        @type   workers: integer
+        @param  workers: The most calls waiting on the checker at once
+
+        @type   timeout: number
+        @param  timeout: The default number of seconds to wait for a call
+
+        @type   start_checker: boolean
+        @param  start_checker: Whether to start the checker service if it
+                               isn't running. If False and it isn't running
+                               (or is a different version), every request
+                               fails, so callers can check statuses themselves
+                               rather than waiting for a cold checker.
+        """
+        if workers is None:
+            workers = self.WORKERS
+
+        self.timeout = timeout
+        self.status_decoder = simplejson.JSONDecoder(object_hook=decode_status)
+        self.queue = Queue()
+        self.closed = False
+
+        self.available = True
+        if start_checker:
+            start()
+        else:
+            self.available = self._is_running()
+
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker)
+            thread.setName("RabbitVCS checker client %i" % i)
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _is_running(self):
+        bus = dbus.SessionBus(private=True)
+        try:
+            try:
+                if not bus.name_has_owner(SERVICE):
+                    return False
+                checker = bus.get_object(SERVICE, OBJECT_PATH)
+                return bool(checker.CheckVersion(SERVICE_VERSION,
+                                                 dbus_interface=INTERFACE))
+            except dbus.DBusException, ex:
+                log.exception(ex)
+                return False
+        finally:
+            bus.close()
+
+    def _worker(self):
+        # Each thread has its own connection, so the calls don't wait on each
+        # other on our side
+        bus = None
+        checker = None
+        try:
+            while True:
+                request = self.queue.get()
+                if request is None:
+                    return
+
+                if not self.available:
+                    request.set_error(dbus.DBusException(
+                        "The checker service is not running"))
+                    continue
+
+                try:
+                    if checker is None:
+                        bus = dbus.SessionBus(private=True)
+                        checker = bus.get_object(SERVICE, OBJECT_PATH)
+                except dbus.DBusException, ex:
+                    request.set_error(ex)
+                    continue
+
+                request.run(checker)
+                if isinstance(request.error, dbus.DBusException):
+                    # Reconnect for the next call, in case the checker was
+                    # restarted
+                    checker = None
+        finally:
+            if bus is not None:
+                bus.close()
+
+    def _submit(self, method, args, decode, timeout, path=None):
+        if timeout is None:
+            timeout = self.timeout
+
+        request = Request(method, args, decode, timeout, path)
+        if self.closed:
+            request.cancel()
+        else:
+            self.queue.put(request)
+
+        return request
+
+    def check_status(self, path, recurse=False, invalidate=False,
+                     summary=False, timeout=None):
+        """ Requests the status of the given path (see
+        StatusCheckerService.CheckStatus). The request's result is a Status.
+        """
+        return self._submit("CheckStatus",
+                            (path, recurse, invalidate, summary),
+                            self.status_decoder.decode, timeout, path)
+
+    def generate_menu_conditions(self, paths, timeout=None):
+        """ Requests the menu conditions of the given paths. The request's
+        result is the path dictionary.
+        """
+        return self._submit("GenerateMenuConditions", (paths, ),
+                            simplejson.loads, timeout)
+
+    def get_items(self, paths, statuses, timeout=None):
+        """ Requests everything under the given paths that has one of the
+        given statuses. The request's result is a list of Status objects.
+        """
+        return self._submit("GetItems", (paths, statuses), decode_items,
+                            timeout)
+
+    def close(self):
+        """ Cancels the requests that haven't been sent, and stops the threads
+        once the others have been answered.
+        """
+        self.closed = True
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except Empty:
+                break
+            if request is not None:
+                request.cancel()
+
+        for thread in self.threads:
+            self.queue.put(None)
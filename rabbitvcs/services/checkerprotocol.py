@@ -0,0 +1,125 @@
+#
+# Copyright (C) 2009 Jason Heeris <jason.heeris@gmail.com>
+# Copyright (C) 2009 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2009 by Adam Plumb <adamplumb@gmail.com>#
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" The parts of the checker service that its clients share with it: where to
+find it on DBUS, how statuses are sent over DBUS and how to start it.
+
+This doesn't import gobject or dbus.glib, so clients that don't run a glib
+main loop (see checkerclient.py) can use it without one being set up for them.
+"""
+
+import os.path
+import sys
+
+import simplejson
+
+import rabbitvcs.services.service
+import rabbitvcs.vcs.status
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.services.checkerprotocol")
+
+from rabbitvcs import version as SERVICE_VERSION
+
+INTERFACE = "org.google.code.rabbitvcs.StatusChecker"
+OBJECT_PATH = "/org/google/code/rabbitvcs/StatusChecker"
+SERVICE = "org.google.code.rabbitvcs.RabbitVCS.Checker"
+TIMEOUT = 60*15*100 # seconds
+
+#: The script that runs the checker service
+SERVICE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "checkerservice.py")
+
+def find_class(module, name):
+    """ Given a module name and a class name, return the actual type object.
+    """
+    # From Python stdlib pickle module source
+    __import__(module)
+    mod = sys.modules[module]
+    klass = getattr(mod, name)
+    return klass
+
+def encode_status(status):
+    """ Before encoding a status object to JSON, we need to turn it into
+    something simpler.
+    """
+    return status.__getstate__()
+
+def decode_status(json_dict):
+    """ Once we get a JSON encoded string out the other side of DBUS, we need to
+    reconstitute the original object. This method is based on the pickle module
+    in the Python stdlib.
+    """    
+    cl = find_class(json_dict['__module__'], json_dict['__type__'])
+    st = None
+    if cl in rabbitvcs.vcs.status.STATUS_TYPES:
+        st = cl.__new__(cl)
+        st.__setstate__(json_dict)
+    elif json_dict.has_key('path'):
+        log.warning("Could not deduce status class: %s" % json_dict['__type__'])
+        st = rabbitvcs.vcs.status.Status.status_error(json_dict['path'])
+    else:
+        raise TypeError("RabbitVCS status object has no path")
+    return st
+
+def encode_items(items):
+    """ Condenses a list of status objects for sending over DBUS. Each status
+    becomes a row of its fields, and the status types are only named once
+    rather than for every item.
+    """
+    types = []
+    rows = []
+    for item in items:
+        item_type = [type(item).__module__, type(item).__name__]
+        if item_type not in types:
+            types.append(item_type)
+        
+        rows.append([types.index(item_type), item.path, item.content,
+                     item.metadata, item.revision, item.author, item.date])
+    
+    return simplejson.dumps({"types": types, "rows": rows},
+                            separators=(',', ':'))
+
+def decode_items(json_items):
+    """ Reconstitutes the list of status objects condensed by encode_items.
+    """
+    data = simplejson.loads(json_items)
+    
+    types = []
+    for (module, name) in data["types"]:
+        cl = find_class(module, name)
+        if cl not in rabbitvcs.vcs.status.STATUS_TYPES:
+            log.warning("Could not deduce status class: %s" % name)
+            cl = rabbitvcs.vcs.status.Status
+        types.append(cl)
+    
+    items = []
+    for (type_index, path, content, metadata, revision, author, date) \
+            in data["rows"]:
+        items.append(types[type_index].restore(path, content, metadata,
+                                               revision=revision,
+                                               author=author,
+                                               date=date))
+    
+    return items
+
+def start():
+    """ Starts the checker service, via the utility method in "service.py". """
+    rabbitvcs.services.service.start_service(SERVICE_SCRIPT, SERVICE,
+                                             OBJECT_PATH)
@@ -35,7 +35,8 @@ This currently works like so:
 
 RabbitVCS can then call the stub methods, getting status info via the
 CheckStatus method itself, or more likely from a callback upon completion of a
-status check.
+status check. Clients subscribe to the folders they show, and are told which
+statuses to check again by the StatusesChanged signal.
 
 NOTE: as a general rule, the data piped between processes or sent over DBUS
 should be kept to a minimum. Use convenience methods to condense and summarise
@@ -45,7 +46,9 @@ code).
 
 import os, os.path
 import sys
+import time
 import simplejson
+from collections import deque
 
 try:
     from gi.repository import GObject as gobject
@@ -57,6 +60,14 @@ try:
 except:
     import glib
 
+try:
+    from gi.repository import Gio as gio
+except ImportError:
+    try:
+        import gio
+    except ImportError:
+        gio = None
+
 import dbus
 import dbus.glib # FIXME: this might actually already set the default loop
 import dbus.mainloop.glib
@@ -65,52 +76,60 @@ import dbus.service
 import rabbitvcs.util.decorators
 import rabbitvcs.util._locale
 import rabbitvcs.util.helper
-import rabbitvcs.services.service
-from rabbitvcs.services.statuschecker import StatusChecker
+import rabbitvcs.util.metrics
+import rabbitvcs.util.settings
+from rabbitvcs.services.statuschecker import StatusChecker, find_stamp_files
+from rabbitvcs.util.helper import get_file_stamp
 
 import rabbitvcs.vcs.status
 
-from rabbitvcs.util.log import Log
+from rabbitvcs.util.log import Log, reload_log_settings
 log = Log("rabbitvcs.services.checkerservice")
 
-from rabbitvcs import version as SERVICE_VERSION
+from rabbitvcs.services.checkerprotocol import INTERFACE, OBJECT_PATH, \
+    SERVICE, TIMEOUT, SERVICE_VERSION, find_class, encode_status, \
+    decode_status, encode_items, decode_items, start
 
-INTERFACE = "org.google.code.rabbitvcs.StatusChecker"
-OBJECT_PATH = "/org/google/code/rabbitvcs/StatusChecker"
-SERVICE = "org.google.code.rabbitvcs.RabbitVCS.Checker"
-TIMEOUT = 60*15*100 # seconds
+#: How long (in milliseconds) changes are collected before they are announced
+#: with a single StatusesChanged signal
+SIGNAL_DELAY = 250
 
-def find_class(module, name):
-    """ Given a module name and a class name, return the actual type object.
-    """
-    # From Python stdlib pickle module source
-    __import__(module)
-    mod = sys.modules[module]
-    klass = getattr(mod, name)
-    return klass
-
-def encode_status(status):
-    """ Before encoding a status object to JSON, we need to turn it into
-    something simpler.
+#: The most folders the checker watches for subscribers at once. The ones
+#: subscribed to longest ago are dropped first.
+MAX_SUBSCRIPTIONS = 200
+
+#: Changes to these are not announced as changes to the folder they are in.
+#: The administrative files in them that matter (see find_stamp_files) are
+#: watched separately.
+ADMIN_FOLDERS = (".svn", ".git", ".hg")
+
+def monitor_folder(path, callback):
+    """ Calls the callback with the path of anything in the given folder that
+    is created, deleted or changed. Returns the file monitor (which must be
+    kept, and cancelled when no longer needed), or None if the folder can't
+    be watched.
     """
-    return status.__getstate__()
-
-def decode_status(json_dict):
-    """ Once we get a JSON encoded string out the other side of DBUS, we need to
-    reconstitute the original object. This method is based on the pickle module
-    in the Python stdlib.
-    """    
-    cl = find_class(json_dict['__module__'], json_dict['__type__'])
-    st = None
-    if cl in rabbitvcs.vcs.status.STATUS_TYPES:
-        st = cl.__new__(cl)
-        st.__setstate__(json_dict)
-    elif json_dict.has_key('path'):
-        log.warning("Could not deduce status class: %s" % json_dict['__type__'])
-        st = rabbitvcs.vcs.status.Status.status_error(json_dict['path'])
-    else:
-        raise TypeError("RabbitVCS status object has no path")
-    return st
+    if gio is None:
+        return None
+
+    try:
+        if hasattr(gio.File, "new_for_path"):
+            monitor = gio.File.new_for_path(path).monitor_directory(
+                gio.FileMonitorFlags.NONE, None)
+        else:
+            monitor = gio.File(path).monitor_directory()
+    except Exception, ex:
+        log.debug("Unable to watch %s: %s" % (path, ex))
+        return None
+
+    def changed(monitor, changed_file, other_file, event_type):
+        changed_path = changed_file.get_path()
+        if changed_path and \
+                os.path.basename(changed_path) not in ADMIN_FOLDERS:
+            callback(unicode(changed_path))
+
+    monitor.connect("changed", changed)
+    return monitor
 
 class StatusCheckerService(dbus.service.Object):
     """ StatusCheckerService objects wrap a StatusCheckerPlus instance,
@@ -144,6 +163,61 @@ class StatusCheckerService(dbus.service.Object):
         # Start the status checking daemon so we can do requests in the
         # background
         self.status_checker = StatusChecker()
+        
+        # Whether or not there is an idle handler generating menu conditions
+        self.prefetching = False
+        
+        self.metrics = rabbitvcs.util.metrics.get_metrics()
+        self.metrics.set_gauge("subprocesses",
+                               rabbitvcs.util.metrics.count_child_processes)
+        self.profiler = None
+        
+        # Subscribed folders to [number of subscribers, file monitor, the
+        # administrative folders of its working copy], and the order they
+        # were subscribed in
+        self.subscriptions = {}
+        self.subscription_order = deque()
+        
+        # Watched administrative folders to [number of subscribed folders in
+        # the working copy, file monitor, working copy root, {stamp file:
+        # its stamp when we last checked a status in the working copy}]
+        self.admin_folders = {}
+        
+        # Changes waiting to be announced (see StatusesChanged)
+        self.changed_paths = set()
+        self.changed_trees = set()
+        self.signal_scheduled = False
+        
+        self.metrics.set_gauge("subscriptions",
+                               lambda: len(self.subscriptions))
+        
+        rabbitvcs.util.settings.add_settings_listener(self.on_settings_changed)
+
+    def on_settings_changed(self, changed):
+        """ Picks up changes to the logging settings, which are the only
+        ones the checker itself uses.
+        """
+        if [section for (section, keyword) in changed if section == "logging"]:
+            globals()["log"] = reload_log_settings()(
+                                    "rabbitvcs.services.checkerservice")
+            log.debug("Logging settings changed")
+
+    def prefetch_menu_conditions(self, path):
+        """ Queues the menu conditions for the given path to be generated when
+        we are otherwise idle, so that a right-click can be answered from
+        memory.
+        """
+        if not self.status_checker.queue_menu_conditions(path):
+            return
+        
+        if not self.prefetching:
+            self.prefetching = True
+            gobject.idle_add(self._prefetch_menu_conditions,
+                             priority=glib.PRIORITY_LOW)
+
+    def _prefetch_menu_conditions(self):
+        self.prefetching = self.status_checker.prefetch_menu_conditions()
+        return self.prefetching
 
     @dbus.service.method(INTERFACE)
     def ExtraInformation(self):
@@ -169,21 +243,290 @@ class StatusCheckerService(dbus.service.Object):
                       summary=False):
         """ Requests a status check from the underlying status checker.
         """
+        start = time.time()
+        
+        # This only looks at the settings file every few seconds
+        rabbitvcs.util.settings.check_settings()
+        
         status = self.status_checker.check_status(unicode(path),
                                                   recurse=recurse,
                                                   summary=summary,
                                                   invalidate=invalidate)
+        self._note_admin_stamps(unicode(path))
+        
+        # Now that we know the status of this path, we can get its menu
+        # conditions ready before anyone asks for them
+        self.prefetch_menu_conditions(unicode(path))
         
-        return self.encoder.encode(status)
+        json_status = self.encoder.encode(status)
+        self.metrics.record("dbus.CheckStatus", time.time() - start)
+        return json_status
+
+    @dbus.service.method(INTERFACE, in_signature='asas', out_signature='s')
+    def GetItems(self, paths, statuses):
+        """ Returns everything under the given paths that has one of the given
+        statuses (eg. for the commit dialog), using the statuses we have
+        already checked wherever they are still up to date.
+        """
+        start = time.time()
+        items = self.status_checker.get_items([unicode(path) for path in paths],
+                                              [str(status) for status in statuses])
+        for path in paths:
+            self._note_admin_stamps(unicode(path))
+        json_items = encode_items(items)
+        self.metrics.record("dbus.GetItems", time.time() - start)
+        return json_items
 
     @dbus.service.method(INTERFACE, in_signature='as', out_signature='s')
     def GenerateMenuConditions(self, paths):
+        start = time.time()
         upaths = []
         for path in paths:
             upaths.append(unicode(path))
     
         path_dict = self.status_checker.generate_menu_conditions(upaths)
-        return simplejson.dumps(path_dict)
+        for path in upaths:
+            self._note_admin_stamps(path)
+        json_dict = simplejson.dumps(path_dict)
+        self.metrics.record("dbus.GenerateMenuConditions", time.time() - start)
+        return json_dict
+
+    @dbus.service.method(INTERFACE, in_signature='s', out_signature='b')
+    def Subscribe(self, path):
+        """ Registers interest in the statuses of the items in the given
+        folder. Changes to them are announced with StatusesChanged, whether
+        they are noticed by watching the folder, or reported with Invalidate.
+        
+        The working copy's administrative files (eg. .git/index or .svn/wc.db)
+        are watched too, so that commits, updates and the like made from
+        elsewhere are announced as changes to the whole working copy.
+        
+        Every call should be matched by a call to Unsubscribe. If too many
+        folders are subscribed, the ones subscribed to longest ago are dropped
+        and announced with SubscriptionsDropped.
+        
+        Returns False if the folder can't be watched, in which case only
+        changes reported with Invalidate are announced.
+        """
+        path = unicode(path)
+        
+        subscription = self.subscriptions.get(path)
+        if subscription is not None:
+            subscription[0] += 1
+            return subscription[1] is not None
+        
+        dropped = []
+        while len(self.subscriptions) >= MAX_SUBSCRIPTIONS:
+            oldest = self.subscription_order.popleft()
+            if oldest in self.subscriptions:
+                self._remove_subscription(oldest)
+                dropped.append(oldest)
+        
+        if dropped:
+            self.SubscriptionsDropped(dropped)
+        
+        monitor = monitor_folder(path, self.on_file_changed)
+        admin_folders = []
+        if monitor is not None:
+            admin_folders = self._watch_admin_folders(path)
+        
+        self.subscriptions[path] = [1, monitor, admin_folders]
+        self.subscription_order.append(path)
+        
+        # Unsubscribed folders are left in the order until they come up
+        if len(self.subscription_order) > 2 * MAX_SUBSCRIPTIONS:
+            self.subscription_order = deque([folder for folder
+                in self.subscription_order if folder in self.subscriptions])
+        
+        return monitor is not None
+
+    @dbus.service.method(INTERFACE, in_signature='s', out_signature='')
+    def Unsubscribe(self, path):
+        path = unicode(path)
+        
+        subscription = self.subscriptions.get(path)
+        if subscription is None:
+            return
+        
+        subscription[0] -= 1
+        if subscription[0] <= 0:
+            self._remove_subscription(path)
+
+    def _remove_subscription(self, path):
+        (count, monitor, admin_folders) = self.subscriptions.pop(path)
+        if monitor is not None:
+            monitor.cancel()
+        
+        for admin_folder in admin_folders:
+            watch = self.admin_folders[admin_folder]
+            watch[0] -= 1
+            if watch[0] <= 0:
+                del self.admin_folders[admin_folder]
+                if watch[1] is not None:
+                    watch[1].cancel()
+
+    def _watch_admin_folders(self, path):
+        """ Starts watching the administrative files of the working copy that
+        the given folder is in, if they aren't watched already. Returns the
+        administrative folders they are in.
+        """
+        stamps = {}
+        for stamp in find_stamp_files(path):
+            stamps.setdefault(os.path.dirname(stamp), []).append(stamp)
+        
+        for (admin_folder, files) in stamps.items():
+            watch = self.admin_folders.get(admin_folder)
+            if watch is not None:
+                watch[0] += 1
+                continue
+            
+            def changed(changed_path, admin_folder=admin_folder):
+                self.on_admin_file_changed(admin_folder, changed_path)
+            
+            known = dict([(stamp, get_file_stamp(stamp)) for stamp in files])
+            self.admin_folders[admin_folder] = [
+                1,
+                monitor_folder(admin_folder, changed),
+                os.path.dirname(admin_folder),
+                known
+            ]
+        
+        return stamps.keys()
+
+    def on_admin_file_changed(self, admin_folder, path):
+        watch = self.admin_folders.get(admin_folder)
+        if watch is None or path not in watch[3]:
+            return
+        
+        # Checking a status can rewrite these too (eg. git refreshes its
+        # index), which must not be announced, or the subscribers would check
+        # again, and so on
+        stamp = get_file_stamp(path)
+        if stamp == watch[3][path]:
+            return
+        
+        watch[3][path] = stamp
+        
+        root = watch[2]
+        log.debug("Administrative file changed: %s", path)
+        self.status_checker.invalidate_menu_conditions(root)
+        self.changed_trees.add(root)
+        self._schedule_signal()
+
+    def _note_admin_stamps(self, path):
+        """ Remembers the current stamps of the administrative files of the
+        working copy the given path is in, after we have checked it.
+        """
+        for (count, monitor, root, known) in self.admin_folders.values():
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                for stamp in known:
+                    known[stamp] = get_file_stamp(stamp)
+
+    @dbus.service.method(INTERFACE, in_signature='as', out_signature='')
+    def Invalidate(self, paths):
+        """ Reports that the given paths, and everything in them, may have
+        changed (eg. because a VCS action on them has finished). Subscribers
+        are told with StatusesChanged.
+        """
+        for path in paths:
+            path = unicode(path)
+            self.status_checker.invalidate_menu_conditions(path)
+            self.changed_trees.add(path)
+            self._add_parents(path)
+        
+        self._schedule_signal()
+
+    def on_file_changed(self, path):
+        self.status_checker.invalidate_menu_conditions(path)
+        self.changed_paths.add(path)
+        self._add_parents(path)
+        self._schedule_signal()
+
+    def _add_parents(self, path):
+        # The summaries of the folders above a changed item may change too
+        parent = os.path.dirname(path)
+        while parent and parent not in self.changed_paths:
+            self.changed_paths.add(parent)
+            if parent == os.path.dirname(parent):
+                break
+            parent = os.path.dirname(parent)
+
+    def _schedule_signal(self):
+        if not self.signal_scheduled:
+            self.signal_scheduled = True
+            gobject.timeout_add(SIGNAL_DELAY, self._emit_changes)
+
+    def _emit_changes(self):
+        self.signal_scheduled = False
+        
+        paths = sorted(self.changed_paths)
+        trees = sorted(self.changed_trees)
+        self.changed_paths = set()
+        self.changed_trees = set()
+        
+        if paths or trees:
+            self.metrics.increment("signals.StatusesChanged")
+            self.StatusesChanged(paths, trees)
+        
+        return False
+
+    @dbus.service.signal(INTERFACE, signature='as')
+    def SubscriptionsDropped(self, paths):
+        """ Announces that the given folders are no longer watched, because
+        too many folders were subscribed. Subscribers should forget them, and
+        subscribe again if they still need them.
+        """
+        pass
+
+    @dbus.service.signal(INTERFACE, signature='asas')
+    def StatusesChanged(self, paths, trees):
+        """ Announces that the statuses of the given paths, and of everything
+        in the given trees, may have changed. Subscribers should check them
+        again (with invalidate set) before showing them.
+        """
+        pass
+
+    @dbus.service.method(INTERFACE, in_signature='', out_signature='s')
+    def Metrics(self):
+        """ Returns a JSON snapshot of the latency histograms, counters and
+        gauges recorded by this service, along with the sampling profiler's
+        report if it is running.
+
+        You can call this from the command line with:
+
+        dbus-send --print-reply \
+        --dest=org.google.code.rabbitvcs.RabbitVCS.Checker \
+        /org/google/code/rabbitvcs/StatusChecker \
+        org.google.code.rabbitvcs.StatusChecker.Metrics
+        """
+        snapshot = self.metrics.snapshot()
+        if self.profiler is not None:
+            snapshot["profile"] = self.profiler.report()
+        
+        return simplejson.dumps(snapshot)
+
+    @dbus.service.method(INTERFACE, in_signature='b', out_signature='b')
+    def SetProfiling(self, enabled):
+        """ Starts or stops sampling what the service's main loop is busy
+        with. Starting it again discards the previous samples. Returns whether
+        the profiler is now running.
+        """
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+        
+        if enabled:
+            self.profiler = rabbitvcs.util.metrics.SamplingProfiler()
+            self.profiler.start()
+            log.debug("Sampling profiler started")
+        
+        return self.profiler is not None
+
+    @dbus.service.method(INTERFACE)
+    def ResetMetrics(self):
+        """ Forgets the timings and counters recorded so far.
+        """
+        self.metrics.reset()
 
     @dbus.service.method(INTERFACE)
     def CheckVersionOrDie(self, version):
@@ -409,10 +752,214 @@ class StatusCheckerStub:
         gobject.idle_add(self.generate_menu_conditions, provider, base_dir, paths, callback)
         return {}
 
-def start():
-    """ Starts the checker service, via the utility method in "service.py". """
-    rabbitvcs.services.service.start_service(os.path.abspath(__file__), SERVICE,
-                                             OBJECT_PATH)
+    def get_items(self, paths, statuses):
+        """ Returns everything under the given paths that has one of the given
+        statuses, or None if the checker could not be reached.
+        """
+        items = get_checker_items(self.status_checker, paths, statuses)
+        if items is None:
+            # Try to reconnect
+            self._connect_to_checker()
+
+        return items
+
+    def get_metrics(self):
+        """ Returns the checker's metrics snapshot (see Metrics), or None if
+        the checker could not be reached.
+        """
+        try:
+            json_metrics = self.status_checker.Metrics(dbus_interface=INTERFACE,
+                                                       timeout=TIMEOUT)
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self._connect_to_checker()
+            return None
+        
+        return simplejson.loads(json_metrics)
+
+    def set_profiling(self, enabled):
+        """ Starts or stops the checker's sampling profiler. Returns whether
+        it is running.
+        """
+        try:
+            return bool(self.status_checker.SetProfiling(enabled,
+                                                         dbus_interface=INTERFACE,
+                                                         timeout=TIMEOUT))
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self._connect_to_checker()
+            return False
+
+    def reset_metrics(self):
+        try:
+            self.status_checker.ResetMetrics(dbus_interface=INTERFACE,
+                                             timeout=TIMEOUT)
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self._connect_to_checker()
+
+    def subscribe(self, path, callback=None):
+        """ Asks the checker to announce changes to the items in the given
+        folder (see connect_statuses_changed). The callback, if given, is
+        called with whether the folder is being watched for changes.
+        """
+        def reply_handler(watched):
+            if callback:
+                callback(path, bool(watched))
+        
+        self._call_async("Subscribe", path, reply_handler=reply_handler)
+
+    def unsubscribe(self, path):
+        self._call_async("Unsubscribe", path)
+
+    def invalidate(self, paths):
+        """ Tells the checker (and through it, every subscriber) that the
+        given paths and everything in them may have changed.
+        """
+        self._call_async("Invalidate", paths)
+
+    def connect_statuses_changed(self, callback):
+        """ Calls the callback with the lists of changed paths and changed
+        trees (see StatusCheckerService.StatusesChanged) whenever the checker
+        announces changes. This needs a main loop.
+        """
+        def handler(paths, trees):
+            callback([unicode(path) for path in paths],
+                     [unicode(tree) for tree in trees])
+        
+        self.session_bus.add_signal_receiver(handler,
+                                             signal_name="StatusesChanged",
+                                             dbus_interface=INTERFACE,
+                                             path=OBJECT_PATH)
+
+    def connect_subscriptions_dropped(self, callback):
+        """ Calls the callback with the list of folders the checker has
+        stopped watching (see StatusCheckerService.SubscriptionsDropped).
+        This needs a main loop.
+        """
+        def handler(paths):
+            callback([unicode(path) for path in paths])
+        
+        self.session_bus.add_signal_receiver(handler,
+                                             signal_name="SubscriptionsDropped",
+                                             dbus_interface=INTERFACE,
+                                             path=OBJECT_PATH)
+
+    def connect_checker_restarted(self, callback):
+        """ Calls the callback whenever a new checker process takes over,
+        which has none of the previous one's subscriptions. This needs a main
+        loop.
+        """
+        owners = []
+        
+        def handler(owner):
+            if owner and owners and owner != owners[-1]:
+                callback()
+            if owner:
+                owners[:] = [owner]
+        
+        self.session_bus.watch_name_owner(SERVICE, handler)
+
+    def _call_async(self, method, *args, **kwargs):
+        def reply_handler(*reply):
+            pass
+        
+        def error_handler(dbus_ex):
+            log.exception(dbus_ex)
+            self._connect_to_checker()
+        
+        try:
+            getattr(self.status_checker, method)(*args,
+                dbus_interface=INTERFACE,
+                timeout=TIMEOUT,
+                reply_handler=kwargs.get("reply_handler", reply_handler),
+                error_handler=error_handler)
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self._connect_to_checker()
+
+def format_metrics(snapshot):
+    """ Turns a snapshot returned by the Metrics method into readable text,
+    eg. for showing in a dialog.
+    """
+    lines = ["Checker service (pid %s), up for %ss" % (snapshot["pid"],
+                                                      snapshot["uptime"]), ""]
+    
+    lines.append("%-36s %7s %9s %9s %9s %9s" % (
+        "Timing (ms)", "count", "mean", "p50", "p90", "max"))
+    for name in sorted(snapshot["timings"].keys()):
+        timing = snapshot["timings"][name]
+        lines.append("%-36s %7i %9.2f %9.2f %9.2f %9.2f" % (
+            name, timing["count"], timing["mean"], timing["p50"],
+            timing["p90"], timing["max"]))
+    lines.append("")
+    
+    counters = snapshot["counters"]
+    for name in sorted(counters.keys()):
+        lines.append("%-36s %7i" % (name, counters[name]))
+        if name.endswith(".miss"):
+            rate = rabbitvcs.util.metrics.hit_rate(counters, name[:-5])
+            if rate is not None:
+                lines.append("%-36s %6.1f%%" % (name[:-5] + " hit rate",
+                                                rate * 100))
+    lines.append("")
+    
+    for name in sorted(snapshot["gauges"].keys()):
+        lines.append("%-36s %7s" % (name, snapshot["gauges"][name]))
+    
+    profile = snapshot.get("profile")
+    if profile:
+        lines += ["", "Profile: %i samples" % profile["samples"], "",
+                  "Own time:"]
+        for (key, fraction) in profile["own"]:
+            lines.append("%6.1f%%  %s" % (fraction * 100, key))
+        lines += ["", "Total time:"]
+        for (key, fraction) in profile["total"]:
+            lines.append("%6.1f%%  %s" % (fraction * 100, key))
+    
+    return "\n".join(lines)
+
+def get_checker_items(status_checker, paths, statuses):
+    """ Calls GetItems on the given checker service object.
+
+    @rtype:     list
+    @return:    The status objects, or None if the checker could not be reached.
+    """
+    try:
+        json_items = status_checker.GetItems(paths, statuses,
+                                             dbus_interface=INTERFACE,
+                                             timeout=TIMEOUT)
+    except dbus.DBusException, ex:
+        log.exception(ex)
+        return None
+
+    return decode_items(json_items)
+
+def get_running_checker_items(paths, statuses):
+    """ Asks the checker service for everything under the given paths that has
+    one of the given statuses, if it is already running.
+
+    Unlike the stub, this never starts the checker: a new checker would have
+    nothing cached, so the caller is better off checking the statuses itself.
+
+    @rtype:     list
+    @return:    The status objects, or None if there is no (compatible) checker
+                running.
+    """
+    try:
+        session_bus = dbus.SessionBus()
+        if not session_bus.name_has_owner(SERVICE):
+            return None
+
+        status_checker = session_bus.get_object(SERVICE, OBJECT_PATH)
+        if not status_checker.CheckVersion(SERVICE_VERSION,
+                                           dbus_interface=INTERFACE):
+            return None
+    except dbus.DBusException, ex:
+        log.exception(ex)
+        return None
+
+    return get_checker_items(status_checker, paths, statuses)
 
 def Main():
     """ The main point of entry for the checker service.
@@ -450,11 +997,6 @@ def Main():
 if __name__ == "__main__":
     rabbitvcs.util._locale.initialize_locale()
 
-    # import cProfile
-    # import rabbitvcs.util.helper
-    # profile_data_file = os.path.join(
-    #                        rabbitvcs.util.helper.get_home_folder(),
-    #                        "checkerservice.stats")
-    # cProfile.run("Main()", profile_data_file)
-
+    # The sampling profiler can be switched on at any time with SetProfiling
+    # (eg. from the debug menu), so there is no need to run under cProfile
     Main()
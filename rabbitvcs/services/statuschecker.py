@@ -20,17 +20,62 @@ Very simple status checking class. Useful when you can't get any of the others
 to work, or you need to prototype things. 
 """
 
+import os.path
+import time
+from collections import deque
+
 import rabbitvcs.vcs
 import rabbitvcs.vcs.status
 
 import simplejson
 
+from rabbitvcs.util.metrics import get_metrics
+
 from rabbitvcs import gettext
 _ = gettext.gettext
 
 from rabbitvcs.util.log import Log
 log = Log("rabbitvcs.services.statuschecker")
 
+#: The administrative files that each VCS updates when the status of an item
+#: can change without the item itself being touched (eg. adding or committing)
+VCS_STAMP_FILES = [
+    os.path.join(".svn", "wc.db"),
+    os.path.join(".svn", "entries"),
+    os.path.join(".git", "index"),
+    os.path.join(".git", "HEAD"),
+    os.path.join(".hg", "dirstate")
+]
+
+def find_stamp_files(path):
+    """ Returns the VCS administrative files of the working copy that the
+    given path is in (see VCS_STAMP_FILES).
+    """
+    if os.path.isdir(path):
+        folder = path
+    else:
+        folder = os.path.dirname(path)
+    
+    found = []
+    while folder:
+        stamps = [os.path.join(folder, name) for name in VCS_STAMP_FILES
+                    if os.path.exists(os.path.join(folder, name))]
+        if stamps:
+            found += stamps
+            # Older Subversion working copies have entries in every folder,
+            # newer ones only have the one database at the top
+            if not stamps[0].endswith("entries"):
+                break
+        elif found:
+            break
+        
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    
+    return found
+
 class StatusChecker:
     """ A class for performing status checks. """
     
@@ -38,23 +83,261 @@ class StatusChecker:
     # settings dialog
     CHECKER_NAME = _("Simple status checker")
     
+    #: The maximum number of menu condition dictionaries we keep around for
+    #: selections that have been asked for
+    MAX_CONDITIONS_CACHE = 500
+    
+    #: The maximum number of prefetched menu condition dictionaries that
+    #: nobody has asked for yet, and of selections waiting to be prefetched.
+    #: These are kept apart from the others so they never push them out.
+    MAX_PREFETCHED = 100
+    
+    #: The maximum number of items in a folder whose menu conditions are
+    #: prefetched, until something in the folder changes
+    MAX_PREFETCH_PER_FOLDER = 20
+    
     def __init__(self):
         """ Initialises status checker. Obviously. """
         self.vcs_client = rabbitvcs.vcs.create_vcs_instance()
+        
+        # Menu condition dictionaries keyed by the tuple of selected paths, and
+        # the order in which they were added (so we can drop the oldest ones)
         self.conditions_dict_cache = {}
+        self.conditions_order = deque()
+        
+        # Selections waiting to have their conditions generated in the
+        # background, the ones that have been but haven't been asked for yet
+        # (oldest first), and how many items of each folder have been queued
+        self.conditions_queue = deque()
+        self.prefetched = deque()
+        self.prefetch_counts = {}
+        
+        self.metrics = get_metrics()
+        self.metrics.set_gauge("conditions.queue",
+                               lambda: len(self.conditions_queue))
+        self.metrics.set_gauge("conditions.cached",
+                               lambda: len(self.conditions_dict_cache))
+        self.metrics.set_gauge("conditions.prefetched",
+                               lambda: len(self.prefetched))
+        self.metrics.set_gauge("status_cache.size", self.get_cache_size)
 
     def check_status(self, path, recurse, summary, invalidate):
         """ Performs a status check, blocking until the check is done.
         """
-        path_status = self.vcs_client.status(path, summary, invalidate)
+        if invalidate:
+            self.invalidate_menu_conditions(path)
+        
+        client = self.vcs_client.client(path)
+        self.count_cache_lookup(client, path, invalidate)
+        
+        start = time.time()
+        try:
+            path_status = client.status(path, summary, invalidate)
+        finally:
+            self.record_backend_call(client, "status", start)
+        
         return path_status
     
-    def generate_menu_conditions(self, paths, invalidate=False):
+    def count_cache_lookup(self, client, path, invalidate):
+        """ Counts whether the status of the given path is about to be
+        answered from the client's status cache.
+        """
+        cache = getattr(client, "cache", None)
+        if cache is None:
+            return
+        
+        if not invalidate and path in cache:
+            self.metrics.increment("status_cache.hit")
+        else:
+            self.metrics.increment("status_cache.miss")
+    
+    def record_backend_call(self, client, name, start):
+        """ Records how long a call to a VCS client took, by client type.
+        """
+        vcs = getattr(client, "vcs", rabbitvcs.vcs.VCS_DUMMY)
+        self.metrics.record("backend.%s.%s" % (vcs, name), time.time() - start)
+    
+    def get_items(self, paths, statuses):
+        """ Returns the statuses of everything under the given paths that have
+        one of the given (VCS specific) statuses.
+        
+        Cached statuses are used as long as none of the items they cover, the
+        folders they are in, nor the working copy's administrative files, have
+        been modified since they were checked (see StatusCache.is_fresh).
+        Otherwise the path is checked again.
+        """
+        items = []
+        for path in paths:
+            client = self.vcs_client.client(path)
+            cache = getattr(client, "cache", None)
+            
+            invalidate = True
+            if cache is not None:
+                if cache.is_fresh(path, find_stamp_files(path)):
+                    invalidate = False
+                    self.metrics.increment("items_cache.hit")
+                else:
+                    cache.invalidate_path_statuses(path)
+                    self.metrics.increment("items_cache.miss")
+            
+            if invalidate:
+                self.invalidate_menu_conditions(path)
+            
+            start = time.time()
+            try:
+                items += client.get_items([path], statuses, invalidate)
+            finally:
+                self.record_backend_call(client, "get_items", start)
+            
+            if invalidate and cache is not None:
+                # Only now, since the check itself may have touched the
+                # administrative files (eg. git refreshes its index)
+                cache.mark_fresh(path, find_stamp_files(path))
+        
+        return items
+    
+    def generate_menu_conditions(self, paths, invalidate=False,
+                                 prefetch=False):
+        """ Returns the menu conditions dictionary for the given selection,
+        using a previously generated one if we have it.
+        
+        If prefetch is True, the dictionary is being generated before anyone
+        has asked for it, and is only kept until MAX_PREFETCHED others have
+        been prefetched since.
+        """
+        key = tuple(paths)
+        
+        if invalidate:
+            for path in paths:
+                self.invalidate_menu_conditions(path)
+        elif key in self.conditions_dict_cache:
+            if prefetch:
+                return self.conditions_dict_cache[key]
+            
+            self.metrics.increment("conditions_cache.hit")
+            if key in self.prefetched:
+                # Someone wanted it after all
+                self.prefetched.remove(key)
+                self.remember_menu_conditions(key)
+            return self.conditions_dict_cache[key]
+        
+        if not prefetch:
+            self.metrics.increment("conditions_cache.miss")
+        
         from rabbitvcs.util.contextmenu import MainContextMenuConditions
         
+        start = time.time()
         conditions = MainContextMenuConditions(self.vcs_client, paths)
+        self.metrics.record("backend.menu_conditions", time.time() - start)
+        
+        self.conditions_dict_cache[key] = conditions.path_dict
+        if prefetch:
+            self.prefetched.append(key)
+            while len(self.prefetched) > self.MAX_PREFETCHED:
+                oldest = self.prefetched.popleft()
+                self.conditions_dict_cache.pop(oldest, None)
+        else:
+            self.remember_menu_conditions(key)
+        
         return conditions.path_dict
     
+    def remember_menu_conditions(self, key):
+        """ Keeps the (already cached) menu conditions for the given selection
+        until MAX_CONDITIONS_CACHE others have been asked for since.
+        """
+        self.conditions_order.append(key)
+        
+        while len(self.conditions_order) > self.MAX_CONDITIONS_CACHE:
+            oldest = self.conditions_order.popleft()
+            if oldest in self.conditions_dict_cache:
+                del self.conditions_dict_cache[oldest]
+    
+    def queue_menu_conditions(self, path):
+        """ Queues the menu conditions for a single item selection of the given
+        path to be generated later. For directories this also covers the
+        background menu, since both are requested as [path].
+        
+        Only the first MAX_PREFETCH_PER_FOLDER items of a folder are queued
+        (until something in it changes), so listing a big folder doesn't
+        fill the queue with items nobody will click on.
+        
+        Returns True if there is anything waiting in the queue.
+        """
+        key = (path,)
+        folder = os.path.dirname(path)
+        count = self.prefetch_counts.get(folder, 0)
+        if (count < self.MAX_PREFETCH_PER_FOLDER and
+                key not in self.conditions_dict_cache and
+                key not in self.conditions_queue and
+                len(self.conditions_queue) < self.MAX_PREFETCHED):
+            self.conditions_queue.append(key)
+            self.prefetch_counts[folder] = count + 1
+        
+        return len(self.conditions_queue) > 0
+    
+    def prefetch_menu_conditions(self):
+        """ Generates the menu conditions for the next queued selection. This
+        is meant to be called repeatedly from an idle handler, so it only does
+        one selection at a time.
+        
+        Returns True if there are more selections waiting.
+        """
+        while self.conditions_queue:
+            key = self.conditions_queue.popleft()
+            if key in self.conditions_dict_cache:
+                continue
+            
+            try:
+                self.generate_menu_conditions(list(key), prefetch=True)
+            except Exception, ex:
+                log.exception(ex)
+            break
+        
+        return len(self.conditions_queue) > 0
+    
+    def invalidate_menu_conditions(self, path):
+        """ Removes any cached (or queued) menu conditions that depend on the
+        status of the given path. This includes selections of the path itself,
+        of anything below it, and of any directory above it (since those take
+        their children into account).
+        """
+        def related(other):
+            return (other == path or
+                    other.startswith(path.rstrip(os.sep) + os.sep) or
+                    path.startswith(other.rstrip(os.sep) + os.sep))
+        
+        for key in self.conditions_dict_cache.keys():
+            for other in key:
+                if related(other):
+                    del self.conditions_dict_cache[key]
+                    break
+        
+        self.conditions_order = deque(
+            [key for key in self.conditions_order
+                if key in self.conditions_dict_cache])
+        self.prefetched = deque(
+            [key for key in self.prefetched
+                if key in self.conditions_dict_cache])
+        self.conditions_queue = deque(
+            [key for key in self.conditions_queue if not related(key[0])])
+        
+        # The items of the folders that changed may be prefetched again
+        folder = os.path.dirname(path)
+        for other in self.prefetch_counts.keys():
+            if other == folder or related(other):
+                del self.prefetch_counts[other]
+    
+    def get_cache_size(self):
+        """ Returns the number of statuses held by all of the VCS clients.
+        """
+        size = 0
+        for client in self.vcs_client.clients.values():
+            cache = getattr(client, "cache", None)
+            if cache is not None:
+                size += len(cache.cache)
+        
+        return size
+    
     def extra_info(self):
         return None
     
@@ -0,0 +1,479 @@
+#
+# Copyright (C) 2009 Jason Heeris <jason.heeris@gmail.com>
+# Copyright (C) 2009 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2009 by Adam Plumb <adamplumb@gmail.com>#
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" The UI host service for RabbitVCS dialogs.
+
+This file can be run as a Python script, in which case it starts a long-lived
+process that opens RabbitVCS windows (commit, log, annotate etc.) on request via
+DBUS. It also contains class definitions to call these methods from within a
+separate Python process.
+
+Normally every window is started in its own Python interpreter (see
+rabbitvcs.util.helper.launch_ui_window), which has to import GTK and the VCS
+backends from scratch. Windows opened by the UI host share one interpreter, so
+all of that is already loaded. Each window still gets VCS clients of its own
+(see rabbitvcs.vcs.DEFAULT_CLIENTS), since they hold the window's repository
+and the callbacks of its running action. The host never changes its working
+directory or sys.argv for a window, since the other windows' actions may be
+running; the window's arguments and working directory are handed to it through
+rabbitvcs.ui.DEFAULT_ARGV and DEFAULT_CWD instead.
+
+This works like so:
+
+    1. launch_ui_window is asked to open a window that can be hosted, and the
+       "use_ui_host" setting is on
+    2. It gets a UIHostStub, which starts the service via the utility method
+       in "service.py" if it is not running yet
+    3. The stub calls OpenWindow, and the service runs the window's script as
+       if it had been started from the command line
+    4. The caller gets back a UIHostWindow, which behaves enough like the
+       subprocess.Popen object it would otherwise have got (pid, poll() and
+       wait()) for the callers to watch for the window to finish. The host
+       announces finished windows with the WindowClosed signal, so callers
+       with a main loop can use add_exit_callback() rather than polling.
+
+If the service can't be reached, launch_ui_window falls back to starting a new
+process.
+"""
+
+import os, os.path
+import sys
+import time
+
+import dbus
+import dbus.glib
+import dbus.mainloop.glib
+import dbus.service
+
+import rabbitvcs.util._locale
+import rabbitvcs.services.service
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.services.uihostservice")
+
+from rabbitvcs import version as SERVICE_VERSION
+
+INTERFACE = "org.google.code.rabbitvcs.UIHost"
+OBJECT_PATH = "/org/google/code/rabbitvcs/UIHost"
+SERVICE = "org.google.code.rabbitvcs.RabbitVCS.UIHost"
+TIMEOUT = 60 # seconds
+
+#: The windows that may be opened by the UI host. These all quit through
+#: rabbitvcs.ui.InterfaceView/InterfaceNonView, which is how we find out that
+#: the window is finished. Windows that call gtk.main_quit() themselves (eg.
+#: settings) must always get their own process, as must windows whose actions
+#: change the working directory of the process (eg. createpatch).
+HOSTED_WINDOWS = [
+    "add",
+    "annotate",
+    "branches",
+    "browser",
+    "changes",
+    "checkmods",
+    "commit",
+    "log",
+    "properties",
+    "remotes",
+    "revert",
+    "tags",
+    "update"
+]
+
+#: The folder containing the window scripts
+UI_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "ui")
+
+class HostedWindow:
+    """ Keeps track of a single OpenWindow request inside the UI host. """
+
+    def __init__(self, window_id, on_finish=None):
+        self.window_id = window_id
+        self.on_finish = on_finish
+        self.finished = False
+        self.toplevels = []
+
+    def finish(self):
+        """ Called instead of gtk.main_quit() when the window would have quit
+        its process. Any top level windows it left behind (eg. hidden ones)
+        are destroyed.
+        """
+        if self.finished:
+            return
+
+        self.finished = True
+        log.debug("Hosted window %i finished" % self.window_id)
+
+        for toplevel in self.toplevels:
+            toplevel.destroy()
+        self.toplevels = []
+
+        if self.on_finish:
+            self.on_finish(self)
+
+class UIHostService(dbus.service.Object):
+    """ UIHostService objects open RabbitVCS windows in the service process,
+    exporting methods that can be called via DBUS.
+
+    There should only be a single such object running in a separate process
+    (ie. do not create this in the Nautilus extension code, you should use a
+    UIHostStub there instead).
+    """
+
+    def __init__(self, connection):
+        """ Creates a new UI host service, with the given DBUS connection.
+
+        @param connection: the DBUS connection (eg. session bus, system bus)
+        @type connection: a DBUS connection object
+        """
+        dbus.service.Object.__init__(self, connection, OBJECT_PATH)
+
+        self.windows = {}
+        self.next_window_id = 1
+
+    @dbus.service.method(INTERFACE)
+    def PID(self):
+        return os.getpid()
+
+    @dbus.service.method(INTERFACE, in_signature='sass', out_signature='i')
+    def OpenWindow(self, filename, args, cwd):
+        """ Opens the given window as soon as the main loop is idle, and
+        returns an id that can be passed to IsWindowOpen. Returns -1 if the
+        window can't be hosted.
+        """
+        filename = str(filename)
+        if filename not in HOSTED_WINDOWS:
+            return -1
+
+        window = HostedWindow(self.next_window_id, self.on_window_finished)
+        self.next_window_id += 1
+        self.windows[window.window_id] = window
+
+        import gobject
+        gobject.idle_add(self.open_window, window, filename,
+                         [unicode(arg) for arg in args], unicode(cwd))
+
+        return window.window_id
+
+    @dbus.service.method(INTERFACE, in_signature='i', out_signature='b')
+    def IsWindowOpen(self, window_id):
+        """ Returns True until the window with the given id has finished.
+        """
+        window = self.windows.get(window_id)
+        return (window is not None and not window.finished)
+
+    def on_window_finished(self, window):
+        self.windows.pop(window.window_id, None)
+        self.WindowClosed(window.window_id)
+
+    @dbus.service.signal(INTERFACE, signature='i')
+    def WindowClosed(self, window_id):
+        """ Announces that the window with the given id has finished.
+        """
+        pass
+
+    def open_window(self, window, filename, args, cwd):
+        """ Runs the window script as if it was the main program, with the
+        given arguments and working directory.
+        """
+        import runpy
+        import gtk
+        import rabbitvcs.ui
+        import rabbitvcs.vcs
+
+        path = os.path.join(UI_DIR, filename + ".py")
+
+        toplevels = set(gtk.window_list_toplevels())
+
+        # These are only read while the window is being created, which is
+        # done here on the main loop, so no other window can see them
+        rabbitvcs.ui.DEFAULT_ARGV = [path] + args
+        rabbitvcs.ui.DEFAULT_CWD = cwd
+        rabbitvcs.ui.DEFAULT_GTK_QUIT = window.finish
+        rabbitvcs.vcs.DEFAULT_CLIENTS = {}
+
+        try:
+            runpy.run_path(path, run_name="__main__")
+        except SystemExit:
+            window.finish()
+        except Exception, e:
+            log.exception(e)
+            window.finish()
+
+        rabbitvcs.ui.DEFAULT_ARGV = None
+        rabbitvcs.ui.DEFAULT_CWD = None
+        rabbitvcs.ui.DEFAULT_GTK_QUIT = True
+        rabbitvcs.vcs.DEFAULT_CLIENTS = None
+
+        if not window.finished:
+            window.toplevels = [toplevel for toplevel
+                in gtk.window_list_toplevels() if toplevel not in toplevels]
+
+        return False
+
+    @dbus.service.method(INTERFACE)
+    def CheckVersion(self, version):
+        """
+        Return True iff the version of RabbitVCS imported by this service is the
+        same as that passed in (ie. used by extension code).
+        """
+        return version == SERVICE_VERSION
+
+    @dbus.service.method(INTERFACE)
+    def Quit(self):
+        """ Quits the service, closing any windows it has open.
+
+        You can call this from the command line with:
+
+        dbus-send --print-reply \
+        --dest=org.google.code.rabbitvcs.RabbitVCS.UIHost \
+        /org/google/code/rabbitvcs/UIHost \
+        org.google.code.rabbitvcs.UIHost.Quit
+        """
+        import gtk
+
+        log.debug("Quitting main loop...")
+        gtk.main_quit()
+        return self.PID()
+
+class UIHostWindow:
+    """ Stands in for the subprocess.Popen object that launch_ui_window would
+    otherwise return, for a window that was opened by the UI host.
+    """
+
+    def __init__(self, stub, window_id, pid):
+        self.stub = stub
+        self.window_id = window_id
+        self.pid = pid
+        self.returncode = None
+        self.callbacks = []
+
+    def closed(self):
+        """ Called by the stub when the host says the window has finished.
+        """
+        if self.returncode is not None:
+            return
+
+        self.returncode = 0
+
+        callbacks = self.callbacks
+        self.callbacks = []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception, ex:
+                log.exception(ex)
+
+    def add_exit_callback(self, callback):
+        """ Calls the given function (from the main loop) once the window has
+        finished, or straight away if it already has.
+        """
+        if not callable(callback):
+            return
+
+        if self.returncode is None:
+            self.callbacks.append(callback)
+        else:
+            callback()
+
+    def poll(self):
+        # This is kept up to date by the WindowClosed signal, so it doesn't
+        # need to ask the host
+        return self.returncode
+
+    def wait(self):
+        # There may not be a main loop to deliver the signal, so ask
+        while self.returncode is None:
+            if self.stub.is_window_open(self.window_id):
+                time.sleep(0.5)
+            else:
+                self.stub.windows.pop(self.window_id, None)
+                self.closed()
+
+        return self.returncode
+
+class UIHostStub:
+    """ UIHostStub objects contain methods that call the UI host running in
+    another process.
+
+    The inter-process communication is via DBUS.
+    """
+
+    def __init__(self):
+        """ Creates an object that can call the UI host via DBUS.
+
+        If there is not already a DBUS object with the path "OBJECT_PATH", we
+        create one by starting a new Python process that runs this file.
+        """
+        self.session_bus = dbus.SessionBus()
+        self.ui_host = None
+
+        # The UIHostWindows that haven't finished, by id, and the unique name
+        # of the host they are in
+        self.windows = {}
+        self.host_owner = None
+
+        self.session_bus.add_signal_receiver(self.on_window_closed,
+                                             signal_name="WindowClosed",
+                                             dbus_interface=INTERFACE,
+                                             path=OBJECT_PATH)
+        self.session_bus.watch_name_owner(SERVICE, self.on_name_owner_changed)
+
+        start()
+        self._connect_to_host()
+
+    def on_window_closed(self, window_id):
+        window = self.windows.pop(int(window_id), None)
+        if window is not None:
+            window.closed()
+
+    def on_name_owner_changed(self, owner):
+        if self.host_owner is not None and owner != self.host_owner:
+            # The host went away (or was replaced), and its windows with it
+            log.debug("UI host changed, closing its windows")
+            windows = self.windows.values()
+            self.windows = {}
+            for window in windows:
+                window.closed()
+
+        self.host_owner = owner
+
+    def _connect_to_host(self):
+        try:
+            self.ui_host = self.session_bus.get_object(SERVICE, OBJECT_PATH)
+
+            if not self.ui_host.CheckVersion(SERVICE_VERSION,
+                                             dbus_interface=INTERFACE):
+                log.warning("Version mismatch, restarting UI host")
+                self.ui_host.Quit(dbus_interface=INTERFACE)
+                start()
+                self.ui_host = self.session_bus.get_object(SERVICE,
+                                                           OBJECT_PATH)
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self.ui_host = None
+
+    def open_window(self, filename, args=[]):
+        """ Asks the UI host to open a window.
+
+        @rtype:             UIHostWindow
+        @return:            An object to watch the window with, or None if the
+                            UI host could not open it.
+        """
+        if self.ui_host is None:
+            return None
+
+        try:
+            window_id = self.ui_host.OpenWindow(filename, args, os.getcwd(),
+                                                dbus_interface=INTERFACE,
+                                                timeout=TIMEOUT)
+            if window_id < 0:
+                return None
+
+            pid = self.ui_host.PID(dbus_interface=INTERFACE, timeout=TIMEOUT)
+        except dbus.DBusException, ex:
+            log.exception(ex)
+            self._connect_to_host()
+            return None
+
+        window = UIHostWindow(self, window_id, pid)
+        self.windows[window_id] = window
+        return window
+
+    def is_window_open(self, window_id):
+        try:
+            return self.ui_host.IsWindowOpen(window_id,
+                                             dbus_interface=INTERFACE,
+                                             timeout=TIMEOUT)
+        except dbus.DBusException, ex:
+            # If the host went away, so did the window
+            log.exception(ex)
+            return False
+
+_stub = None
+
+def get_ui_host():
+    """ Returns a UIHostStub, creating it (and starting the service) the first
+    time it is needed.
+    """
+    global _stub
+    if _stub is None:
+        _stub = UIHostStub()
+
+    return _stub
+
+def start():
+    """ Starts the UI host, via the utility method in "service.py". """
+    rabbitvcs.services.service.start_service(os.path.abspath(__file__), SERVICE,
+                                             OBJECT_PATH)
+
+def Main():
+    """ The main point of entry for the UI host.
+
+    This will set up the DBUS and glib extensions, the GTK main loop, and start
+    the service.
+    """
+    global log
+    log = Log("rabbitvcs.services.uihostservice:main")
+    log.debug("UI host: starting service: %s (%s)" % (OBJECT_PATH, os.getpid()))
+
+    # The windows are run as they would be from the command line, so they
+    # should get the same GTK as they would there
+    if "NAUTILUS_PYTHON_REQUIRE_GTK3" in os.environ:
+        del os.environ["NAUTILUS_PYTHON_REQUIRE_GTK3"]
+
+    import gobject
+    import gtk
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+
+    # The following calls are required to make DBus thread-aware and therefore
+    # support the ability run threads.
+    gobject.threads_init()
+    dbus.glib.threads_init()
+    gtk.gdk.threads_init()
+
+    # Every window script ends with gtk.main(), which would block the service
+    # until the window was closed. We are already running the main loop, so
+    # hosted windows get a no-op instead.
+    run_main_loop = gtk.main
+    gtk.main = lambda: None
+
+    # Load the modules every window needs up front, so the first window opens
+    # as quickly as the rest
+    import rabbitvcs.ui
+    import rabbitvcs.ui.action
+    import rabbitvcs.ui.widget
+    import rabbitvcs.vcs
+
+    # This registers our service name with the bus
+    session_bus = dbus.SessionBus()
+    service_name = dbus.service.BusName(SERVICE, session_bus)
+
+    ui_host_service = UIHostService(session_bus)
+
+    gobject.idle_add(sys.stdout.write, "Started UI host service\n")
+    gobject.idle_add(sys.stdout.flush)
+
+    run_main_loop()
+
+    log.debug("UI host: ended service: %s (%s)" % (OBJECT_PATH, os.getpid()))
+
+if __name__ == "__main__":
+    rabbitvcs.util._locale.initialize_locale()
+    Main()
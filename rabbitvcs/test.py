@@ -24,11 +24,13 @@ import unittest
 import doctest
 
 import rabbitvcs.util.helper
+import rabbitvcs.util.excludes
 
 if __name__ == "__main__":
     suite = unittest.TestSuite()
     
-    for module in (rabbitvcs.util.helper,):
+    for module in (rabbitvcs.util.helper, rabbitvcs.util.excludes):
         suite.addTest(doctest.DocTestSuite(module))
-        runner = unittest.TextTestRunner()
-        runner.run(suite)
+    
+    runner = unittest.TextTestRunner()
+    runner.run(suite)
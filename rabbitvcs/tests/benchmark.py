@@ -0,0 +1,401 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+Performance benchmarks for RabbitVCS.
+
+Generates synthetic Subversion, Git and Mercurial working copies and times the
+operations that the file manager extensions and dialogs depend on (status
+checks, item listings, log, annotate, menu conditions and, optionally, the
+round trip to the status checker service).  The generated trees are
+reproducible for a given set of options (see --seed).
+
+The results are written as JSON, so they can be kept and compared across
+releases, eg.
+
+    python rabbitvcs/tests/benchmark.py --vcs svn,git --files 5000 \\
+        --output results.json
+
+This needs the svn, svnadmin, git and hg command line tools for whichever
+systems are benchmarked.
+
+"""
+
+# make sure the current working copy is in sys.path before anything else
+from os.path import abspath, dirname, join, normpath
+import sys
+toplevel = normpath(join(dirname(abspath(__file__)), '..', '..'))
+sys.path.insert(0, toplevel)
+
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from optparse import OptionParser
+
+import simplejson
+
+import rabbitvcs
+import rabbitvcs.vcs
+
+#: The extension given to the files that the working copies ignore
+IGNORED_EXTENSION = ".tmp"
+
+class SyntheticRepository:
+    """
+    Builds a repository and a working copy of it with a configurable number
+    of files, folder depth and history, and then leaves a configurable
+    fraction of the files modified, untracked and ignored.
+
+    Subclasses provide the VCS specific commands.
+
+    """
+
+    vcs = None
+
+    def __init__(self, root, options):
+        """
+        @type   root: string
+        @param  root: The folder to create the repository (and working copy) in
+
+        @type   options: optparse.Values
+        @param  options: The benchmark options (see make_parser)
+
+        """
+
+        self.root = root
+        self.options = options
+        self.working_copy = os.path.join(root, "wc")
+        self.random = random.Random(options.seed)
+        self.folders = []
+        self.files = []
+
+        # This file is changed in every commit, so that it has the longest
+        # history to annotate
+        self.annotated = None
+
+    def run(self, args, cwd=None):
+        if cwd is None:
+            cwd = self.working_copy
+
+        devnull = open(os.devnull, "w")
+        try:
+            subprocess.check_call(args, cwd=cwd, stdout=devnull,
+                stderr=subprocess.STDOUT)
+        finally:
+            devnull.close()
+
+    def create(self):
+        self.initialize()
+        self.make_tree()
+        self.add_all()
+        self.commit("Initial import")
+
+        for revision in range(1, self.options.history):
+            changed = self.random.sample(self.files,
+                min(self.options.commit_size, len(self.files)))
+            if self.annotated not in changed:
+                changed.append(self.annotated)
+            for path in changed:
+                self.change_file(path, "Revision %d" % revision)
+            self.commit("Revision %d" % revision)
+
+        self.make_changes()
+
+    def make_tree(self):
+        self.folders = [self.working_copy]
+        level = [self.working_copy]
+        for depth in range(self.options.depth):
+            next_level = []
+            for parent in level:
+                for index in range(self.options.folders):
+                    folder = os.path.join(parent, "folder%d" % index)
+                    os.mkdir(folder)
+                    next_level.append(folder)
+            self.folders += next_level
+            level = next_level
+
+        for index in range(self.options.files):
+            folder = self.random.choice(self.folders)
+            path = os.path.join(folder, "file%d.txt" % index)
+            self.change_file(path, "File %d" % index)
+            self.files.append(path)
+
+        self.annotated = self.files[0]
+
+    def change_file(self, path, line):
+        fh = open(path, "a")
+        fh.write(line + "\n")
+        fh.close()
+
+    def make_changes(self):
+        count = len(self.files)
+
+        for path in self.random.sample(self.files,
+                int(count * self.options.modified)):
+            self.change_file(path, "Modified")
+
+        for index in range(int(count * self.options.untracked)):
+            folder = self.random.choice(self.folders)
+            self.change_file(os.path.join(folder, "untracked%d.txt" % index),
+                "Untracked")
+
+        for index in range(int(count * self.options.ignored)):
+            folder = self.random.choice(self.folders)
+            self.change_file(os.path.join(folder,
+                "ignored%d%s" % (index, IGNORED_EXTENSION)), "Ignored")
+
+    def initialize(self):
+        raise NotImplementedError
+
+    def add_all(self):
+        raise NotImplementedError
+
+    def commit(self, message):
+        raise NotImplementedError
+
+class SVNRepository(SyntheticRepository):
+
+    vcs = rabbitvcs.vcs.VCS_SVN
+
+    def initialize(self):
+        repository = os.path.join(self.root, "repository")
+        self.run(["svnadmin", "create", repository], cwd=self.root)
+        self.run(["svn", "checkout", "-q", "file://" + repository,
+            self.working_copy], cwd=self.root)
+
+    def add_all(self):
+        self.run(["svn", "add", "-q", "--force", "."])
+        self.run(["svn", "propset", "-q", "svn:ignore",
+            "*" + IGNORED_EXTENSION] + self.folders)
+
+    def commit(self, message):
+        self.run(["svn", "commit", "-q", "-m", message])
+        self.run(["svn", "update", "-q"])
+
+class GitRepository(SyntheticRepository):
+
+    vcs = rabbitvcs.vcs.VCS_GIT
+
+    def initialize(self):
+        self.run(["git", "init", "-q", self.working_copy], cwd=self.root)
+        self.run(["git", "config", "user.name", "RabbitVCS Benchmark"])
+        self.run(["git", "config", "user.email", "benchmark@rabbitvcs.org"])
+        self.change_file(os.path.join(self.working_copy, ".gitignore"),
+            "*" + IGNORED_EXTENSION)
+
+    def add_all(self):
+        self.run(["git", "add", "-A", "."])
+
+    def commit(self, message):
+        self.run(["git", "commit", "-q", "-a", "-m", message])
+
+class MercurialRepository(SyntheticRepository):
+
+    vcs = rabbitvcs.vcs.VCS_MERCURIAL
+
+    def initialize(self):
+        self.run(["hg", "init", self.working_copy], cwd=self.root)
+        self.change_file(os.path.join(self.working_copy, ".hgignore"),
+            "syntax: glob\n*" + IGNORED_EXTENSION)
+
+    def add_all(self):
+        self.run(["hg", "addremove", "-q"])
+
+    def commit(self, message):
+        self.run(["hg", "commit", "-q", "-u", "benchmark", "-m", message])
+
+REPOSITORY_TYPES = {
+    "svn": SVNRepository,
+    "git": GitRepository,
+    "mercurial": MercurialRepository
+}
+
+def time_call(repeat, func, *args, **kwargs):
+    """
+    Calls a function repeat times, and returns how long each call took.
+
+    """
+
+    times = []
+    for index in range(repeat):
+        start = time.time()
+        func(*args, **kwargs)
+        times.append(time.time() - start)
+    return times
+
+def summarize(vcs, benchmark, times):
+    ordered = sorted(times)
+    return {
+        "vcs": vcs,
+        "benchmark": benchmark,
+        "repeat": len(times),
+        "min": ordered[0],
+        "median": ordered[len(ordered) // 2],
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+        "times": times
+    }
+
+def run_benchmarks(repository, options):
+    """
+    Times each operation against the given working copy.
+
+    @rtype:     list
+    @return:    A list of result dicts (see summarize)
+
+    """
+
+    vcs = rabbitvcs.vcs.VCS()
+    path = repository.working_copy
+    client = vcs.client(path)
+    repeat = options.repeat
+
+    benchmarks = [
+        ("status", lambda: client.status(path, invalidate=True)),
+        ("status_cached", lambda: client.status(path)),
+        ("statuses", lambda: client.statuses(path, invalidate=True)),
+        ("get_items", lambda: vcs.get_items([path],
+            vcs.statuses_for_commit([path])))
+    ]
+
+    if repository.vcs in (rabbitvcs.vcs.VCS_SVN, rabbitvcs.vcs.VCS_GIT):
+        benchmarks += [
+            ("log", lambda: client.log(path, limit=options.history)),
+            ("annotate", lambda: client.annotate(repository.annotated))
+        ]
+
+    def generate_path_dict():
+        from rabbitvcs.util.contextmenu import MainContextMenuConditions
+        MainContextMenuConditions(vcs, [path])
+
+    benchmarks.append(("generate_path_dict", generate_path_dict))
+
+    if options.dbus:
+        from rabbitvcs.services.checkerservice import StatusCheckerStub
+        checker = StatusCheckerStub()
+
+        # Make sure the checker has seen the working copy, so that the
+        # round trips are timed rather than the status checks themselves
+        checker.check_status_now(path, recurse=True, invalidate=True)
+
+        benchmarks += [
+            ("dbus_check_status", lambda: checker.check_status_now(path,
+                recurse=True)),
+            ("dbus_get_items", lambda: checker.get_items([path],
+                vcs.statuses_for_commit([path])))
+        ]
+
+    results = []
+    for (name, func) in benchmarks:
+        results.append(summarize(repository.vcs, name, time_call(repeat, func)))
+        sys.stderr.write("%-10s %-20s %.4fs\n" % (repository.vcs, name,
+            results[-1]["median"]))
+
+    return results
+
+def make_parser():
+    parser = OptionParser(usage="usage: %prog [options]",
+        description="Benchmark RabbitVCS against synthetic repositories")
+    parser.add_option("--vcs", default="svn,git,mercurial",
+        help="comma separated list of systems to benchmark")
+    parser.add_option("--files", type="int", default=1000,
+        help="number of files in each working copy")
+    parser.add_option("--depth", type="int", default=3,
+        help="depth of the folder tree")
+    parser.add_option("--folders", type="int", default=4,
+        help="number of subfolders in each folder")
+    parser.add_option("--history", type="int", default=50,
+        help="number of commits")
+    parser.add_option("--commit-size", type="int", default=10,
+        help="number of files changed by each commit")
+    parser.add_option("--modified", type="float", default=0.05,
+        help="fraction of files left modified")
+    parser.add_option("--untracked", type="float", default=0.02,
+        help="number of untracked files, as a fraction of the files")
+    parser.add_option("--ignored", type="float", default=0.02,
+        help="number of ignored files, as a fraction of the files")
+    parser.add_option("--repeat", type="int", default=5,
+        help="number of times to time each operation")
+    parser.add_option("--seed", type="int", default=0,
+        help="seed for generating the working copies")
+    parser.add_option("--dbus", action="store_true", default=False,
+        help="also time calls to the status checker service")
+    parser.add_option("--directory", default=None,
+        help="where to generate the repositories (default: a temporary "
+            "folder)")
+    parser.add_option("--keep", action="store_true", default=False,
+        help="don't delete the generated repositories")
+    parser.add_option("--output", default=None,
+        help="file to write the JSON results to (default: stdout)")
+    return parser
+
+def main(argv=None):
+    (options, args) = make_parser().parse_args(argv)
+
+    base = options.directory
+    if base is None:
+        base = tempfile.mkdtemp(prefix="rabbitvcs-benchmark-")
+    elif not os.path.isdir(base):
+        os.makedirs(base)
+
+    report = {
+        "rabbitvcs": rabbitvcs.package_version(),
+        "python": sys.version.split()[0],
+        "date": int(time.time()),
+        "options": dict([(key, value) for (key, value)
+            in options.__dict__.items() if key not in ("directory", "output")]),
+        "results": []
+    }
+
+    try:
+        for vcs in options.vcs.split(","):
+            vcs = vcs.strip()
+            if vcs not in REPOSITORY_TYPES:
+                raise SystemExit("Unknown version control system: %s" % vcs)
+
+            root = os.path.join(base, vcs)
+            os.mkdir(root)
+
+            sys.stderr.write("Generating %s repository in %s...\n" % (vcs, root))
+            repository = REPOSITORY_TYPES[vcs](root, options)
+            start = time.time()
+            repository.create()
+            sys.stderr.write("Generated in %.1fs\n" % (time.time() - start))
+
+            report["results"] += run_benchmarks(repository, options)
+    finally:
+        if not options.keep and options.directory is None:
+            shutil.rmtree(base, ignore_errors=True)
+
+    output = simplejson.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        fh = open(options.output, "w")
+        fh.write(output)
+        fh.close()
+    else:
+        print output
+
+if __name__ == "__main__":
+    main()
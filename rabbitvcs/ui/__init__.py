@@ -72,6 +72,55 @@ STATUS_EMBLEMS = {
     rabbitvcs.vcs.status.status_unversioned : "rabbitvcs-unversioned"
 }
 
+#: What register_gtk_quit() records when it is not given anything. The UI host
+#: (see rabbitvcs.services.uihostservice) replaces this with a callable while it
+#: opens a window, so that the window ends its request when it closes instead
+#: of quitting the main loop that all the hosted windows share.
+DEFAULT_GTK_QUIT = True
+
+#: The command line arguments and working directory that main() uses instead
+#: of the process's, if not None. The UI host sets these while it opens a
+#: window, rather than changing sys.argv and the working directory of a process
+#: whose other windows may be running actions.
+DEFAULT_ARGV = None
+DEFAULT_CWD = None
+
+def gtk_quit(do_gtk_quit=True):
+    """
+    Quits the main loop, or if the window is being run by the UI host (ie.
+    do_gtk_quit is callable), lets the UI host know instead.
+    
+    """
+    
+    if callable(do_gtk_quit):
+        do_gtk_quit()
+    else:
+        gtk.main_quit()
+
+def get_items(vcs, paths, statuses):
+    """
+    Returns everything under the given paths that has one of the given
+    statuses, for dialogs like commit, revert and add.
+    
+    If the status checker service is running, it answers from the statuses it
+    has already checked for the file manager (as long as they are still up to
+    date), so we don't have to check the whole tree again. Otherwise the
+    statuses are checked here.
+    
+    """
+    
+    items = None
+    try:
+        from rabbitvcs.services.checkerservice import get_running_checker_items
+        items = get_running_checker_items(paths, statuses)
+    except ImportError:
+        pass
+    
+    if items is None:
+        items = vcs.get_items(paths, statuses)
+    
+    return items
+
 class GtkBuilderWidgetWrapper:
         
     def __init__(self, gtkbuilder_filename = None,
@@ -160,15 +209,18 @@ class InterfaceView(GtkBuilderWidgetWrapper):
                 gtk.gdk.threads_leave()
             
         if self.do_gtk_quit:
-            gtk.main_quit()
+            gtk_quit(self.do_gtk_quit)
             
-    def register_gtk_quit(self):
+    def register_gtk_quit(self, do_gtk_quit=None):
+        if do_gtk_quit is None:
+            do_gtk_quit = DEFAULT_GTK_QUIT
+        
         window = self.get_widget(self.gtkbuilder_id)
-        self.do_gtk_quit = True
+        self.do_gtk_quit = do_gtk_quit
         
         # This means we've already been closed
         if window is None:
-            gobject.idle_add(gtk.main_quit)
+            gobject.idle_add(gtk_quit, do_gtk_quit)
     
     def gtk_quit_is_set(self):
         return self.do_gtk_quit
@@ -216,13 +268,20 @@ class InterfaceNonView:
         self.do_gtk_quit = False
 
     def close(self):
+        if callable(self.do_gtk_quit):
+            self.do_gtk_quit()
+            return
+        
         try:
             gtk.main_quit()
         except RuntimeError:
             raise SystemExit()
             
-    def register_gtk_quit(self):
-        self.do_gtk_quit = True
+    def register_gtk_quit(self, do_gtk_quit=None):
+        if do_gtk_quit is None:
+            do_gtk_quit = DEFAULT_GTK_QUIT
+        
+        self.do_gtk_quit = do_gtk_quit
     
     def gtk_quit_is_set(self):
         return self.do_gtk_quit
@@ -246,16 +305,25 @@ def main(allowed_options=None, description=None, usage=None):
         for (option_args, option_kwargs) in allowed_options:
             parser.add_option(*option_args, **option_kwargs)
         
+    if DEFAULT_ARGV is not None:
+        argv = DEFAULT_ARGV
+    
+    cwd = DEFAULT_CWD
+    if cwd is None:
+        cwd = getcwd()
+    
     (options, args) = parser.parse_args(argv)
     
     # Convert "." to current working directory
     paths = args[1:]
     for i in range(0, len(paths)):
         if paths[i] == ".":
-            paths[i] = getcwd()
+            paths[i] = cwd
+        elif DEFAULT_CWD is not None and not os.path.isabs(paths[i]):
+            paths[i] = os.path.join(cwd, paths[i])
         
     if not paths:
-        paths = [getcwd()]
+        paths = [cwd]
         
     if parser.has_option("--base-dir") and not options.base_dir: 
         options.base_dir = get_common_directory(paths)
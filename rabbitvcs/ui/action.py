@@ -99,6 +99,13 @@ class MessageCallbackNotifier(VCSNotifier):
     gtkbuilder_filename = "notification"
     gtkbuilder_id = "Notification"
 
+    #: How often (in milliseconds) queued notifications are added to the table
+    FLUSH_INTERVAL = 100
+
+    #: The most rows we add to the table at a time, so that a flood of
+    #: notifications can't hold up the main loop
+    FLUSH_MAX_ROWS = 2000
+
     def __init__(self, callback_cancel=None, visible=True, client_in_same_thread=True):
         """
         @type   callback_cancel: def
@@ -125,6 +132,16 @@ class MessageCallbackNotifier(VCSNotifier):
         self.pbar.start_pulsate()
         self.finished = False
 
+        # Notifications usually arrive from the action's thread. They are
+        # queued up here and added to the table from the main loop (see flush)
+        self.lock = threading.Lock()
+        self.pending_rows = []
+        self.pending_fraction = None
+        self.flush_scheduled = False
+
+        # Every notification we have been given, for "Save As"
+        self.log_rows = []
+
     def on_destroy(self, widget):
         if self.callback_cancel is not None:
             self.callback_cancel()
@@ -157,14 +174,67 @@ class MessageCallbackNotifier(VCSNotifier):
             gtk.gdk.threads_leave()
 
     def append(self, entry):
-        if not self.client_in_same_thread:
-            gtk.gdk.threads_enter()
+        """
+        Queues a row to be added to the table.  This is safe to call from any
+        thread, and doesn't touch the UI itself.
 
-        self.table.append(entry)
-        self.table.scroll_to_bottom()
+        """
 
-        if not self.client_in_same_thread:
-            gtk.gdk.threads_leave()
+        self.lock.acquire()
+        try:
+            self.pending_rows.append(entry)
+            self.log_rows.append(entry)
+            self._schedule_flush()
+        finally:
+            self.lock.release()
+
+    def set_progress(self, fraction):
+        """
+        Sets the fraction to show in the progress bar the next time the queued
+        notifications are flushed.  Like append, this is safe to call from any
+        thread.
+
+        """
+
+        self.lock.acquire()
+        try:
+            self.pending_fraction = fraction
+            self._schedule_flush()
+        finally:
+            self.lock.release()
+
+    def _schedule_flush(self):
+        # The caller must hold self.lock
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            gobject.timeout_add(self.FLUSH_INTERVAL, self.flush)
+
+    def flush(self):
+        """
+        Adds the queued rows to the table (up to FLUSH_MAX_ROWS of them) and
+        updates the progress bar.  This is a timeout handler, and returns True
+        while there are rows left for the next one.
+
+        """
+
+        self.lock.acquire()
+        try:
+            rows = self.pending_rows[:self.FLUSH_MAX_ROWS]
+            del self.pending_rows[:self.FLUSH_MAX_ROWS]
+            fraction = self.pending_fraction
+            self.pending_fraction = None
+            self.flush_scheduled = bool(self.pending_rows)
+        finally:
+            self.lock.release()
+
+        if rows:
+            self.table.insert_rows(rows)
+            self.table.scroll_to_bottom()
+
+        if fraction is not None:
+            self.pbar.update(fraction)
+
+        return self.flush_scheduled
 
     def get_title(self):
         return self.get_widget("Notification").get_title()
@@ -214,8 +284,18 @@ class MessageCallbackNotifier(VCSNotifier):
             path = dialog.run()
 
         if path is not None:
+            self.lock.acquire()
+            try:
+                rows = list(self.log_rows)
+            finally:
+                self.lock.release()
+
+            lines = []
+            for row in rows:
+                lines.append("\t".join([unicode(cell) for cell in row]))
+
             fh = open(path, "w")
-            fh.write(self.table.generate_string_from_data())
+            fh.write("\n".join(lines))
             fh.close()
 
 class LoadingNotifier(VCSNotifier):
@@ -301,7 +381,7 @@ class VCSAction(threading.Thread):
         # Tells the notification window to do a gtk.main_quit() when closing
         # Is used when the script is run from a command line
         if register_gtk_quit:
-            self.notification.register_gtk_quit()
+            self.notification.register_gtk_quit(register_gtk_quit)
 
     def set_pbar_ticks(self, num):
         """
@@ -325,13 +405,7 @@ class VCSAction(threading.Thread):
         """
         
         if self.has_notifier:
-            if not self.client_in_same_thread:
-                gtk.gdk.threads_enter()
-    
-            self.notification.pbar.update(fraction)
-    
-            if not self.client_in_same_thread:
-                gtk.gdk.threads_leave()
+            self.notification.set_progress(fraction)
 
     def set_header(self, header):
         self.notification.set_header(header)
@@ -357,6 +431,13 @@ class VCSAction(threading.Thread):
         self.notification.set_canceled_by_user(True)
         self.queue.cancel_queue()
 
+    def is_cancelled(self):
+        """
+        Returns True once the user has clicked the cancel button.
+
+        """
+        return self.cancel is True
+
     def finish(self, message=None):
         """
         This is called when the final notifcation message has been received,
@@ -378,8 +459,7 @@ class VCSAction(threading.Thread):
             title = self.notification.get_title()
             self.notification.set_title(_("%s - Finished") % title)
             self.set_status(message)
-            self.notification.pbar.stop_pulsate()
-            self.notification.pbar.update(1)
+            self.notification.set_progress(1)
             self.notification.toggle_ok_button(True)
 
     def get_log_message(self):
@@ -685,7 +765,7 @@ class SVNAction(VCSAction):
                 frac = self.pbar_ticks_current / self.pbar_ticks
                 if frac > 1:
                     frac = 1
-                self.notification.pbar.update(frac)
+                self.notification.set_progress(frac)
 
             is_known_action = False
             if self.client.NOTIFY_ACTIONS.has_key(data["action"]):
@@ -737,7 +817,10 @@ class GitAction(VCSAction):
         self.client.set_callback_notify(self.notify)
         self.client.set_callback_progress_update(self.set_progress_fraction)
         self.client.set_callback_get_user(self.get_user)
-        self.client.set_callback_get_cancel(self.cancel)
+
+        # self.cancel is the flag set by the cancel button (it hides the
+        # method of the same name), so give the client a way to read it later
+        self.client.set_callback_get_cancel(self.is_cancelled)
 
     def notify(self, data):
         if self.has_notifier:
@@ -100,7 +100,7 @@ class Add(InterfaceView, GtkContextMenuCaller):
     def load(self):
         gtk.gdk.threads_enter()
         self.get_widget("status").set_text(_("Loading..."))
-        self.items = self.vcs.get_items(self.paths, self.statuses)
+        self.items = rabbitvcs.ui.get_items(self.vcs, self.paths, self.statuses)
         
         if self.show_ignored:
             for path in paths:
@@ -28,6 +28,7 @@ import gtk
 
 from datetime import datetime
 import time
+import threading
 
 from rabbitvcs.ui import InterfaceView
 from rabbitvcs.ui.log import log_dialog_factory
@@ -206,6 +207,11 @@ class SVNAnnotate(Annotate):
         return text
 
 class GitAnnotate(Annotate):
+
+    #: How often (in milliseconds) we show the lines that have been annotated
+    #: since last time
+    FLUSH_INTERVAL = 100
+
     def __init__(self, path, revision=None):
         Annotate.__init__(self, path, revision)
 
@@ -219,15 +225,24 @@ class GitAnnotate(Annotate):
         self.get_widget("to_show_log").hide()
         self.get_widget("to").set_text(str(revision))
 
-        self.table = rabbitvcs.ui.widget.Table(
+        self.table = rabbitvcs.ui.widget.VirtualTable(
             self.get_widget("table"),
             [gobject.TYPE_STRING, gobject.TYPE_STRING, gobject.TYPE_STRING, 
                 gobject.TYPE_STRING, gobject.TYPE_STRING], 
             [_("Line"), _("Revision"), _("Author"), 
-                _("Date"), _("Text")]
+                _("Date"), _("Text")],
+            self.make_row
         )
         self.table.allow_multiple()
         
+        # The lines are annotated in the action's thread, and shown from a
+        # timeout handler in batches
+        self.lock = threading.Lock()
+        self.lines = None
+        self.shown_lines = None
+        self.pending_ranges = []
+        self.flush_scheduled = False
+        
         self.load()
 
     #
@@ -245,40 +260,84 @@ class GitAnnotate(Annotate):
         self.action.append(
             self.git.annotate,
             self.path,
-            to_rev
+            to_rev,
+            self.on_lines_annotated
         )
-        self.action.append(self.populate_table)
         self.action.append(self.enable_saveas)
         self.action.start()
 
-    @gtk_unsafe
-    def populate_table(self):
-        blamedict = self.action.get_result(0)
-
-        self.table.clear()
-        for item in blamedict:
-            self.table.append([
-                item["number"],
-                item["revision"][:7],
-                item["author"],
-                rabbitvcs.util.helper.format_datetime(item["date"]),
-                item["line"]
-            ])
+    def make_row(self, item):
+        date = ""
+        if item["date"] is not None:
+            date = rabbitvcs.util.helper.format_datetime(item["date"])
+        
+        return [
+            str(item["number"]),
+            item["revision"][:7],
+            item["author"],
+            date,
+            item["line"]
+        ]
+
+    def on_lines_annotated(self, lines, first, last):
+        """
+        Called from the action's thread as git finds the commits for the
+        lines of the file.
+        
+        """
+        
+        self.lock.acquire()
+        try:
+            if lines is not self.lines:
+                self.lines = lines
+                self.pending_ranges = []
+            elif last > first:
+                self.pending_ranges.append((first, last))
             
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                gobject.timeout_add(self.FLUSH_INTERVAL, self.flush)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        """
+        Shows the lines that have been read or annotated since the last time
+        this was called.  This is a timeout handler.
+        
+        """
+        
+        self.lock.acquire()
+        try:
+            lines = self.lines
+            ranges = self.pending_ranges
+            self.pending_ranges = []
+            self.flush_scheduled = False
+        finally:
+            self.lock.release()
+        
+        if lines is not self.shown_lines:
+            # The rows are made from the lines when they are drawn, so any that
+            # have been annotated already will be shown as they are
+            self.shown_lines = lines
+            self.table.clear()
+            self.table.populate(lines)
+            return False
+        
+        for (first, last) in ranges:
+            for index in xrange(first, last):
+                self.table.update_item(index, lines[index])
+        
+        return False
+
     def generate_string_from_result(self):
         blamedict = self.action.get_result(0)
         
-        text = ""
+        text = []
         for item in blamedict:
-            text += "%s\t%s\t%s\t%s\t%s\n" % (
-                item["number"],
-                item["revision"][:7],
-                item["author"],
-                rabbitvcs.util.helper.format_datetime(item["date"]),
-                item["line"]
-            )
+            text.append("\t".join(self.make_row(item)) + "\n")
         
-        return text
+        return "".join(text)
 
 classes_map = {
     rabbitvcs.vcs.VCS_SVN: SVNAnnotate,
@@ -22,6 +22,8 @@
 
 import os.path
 import thread
+import threading
+import time
 
 import pygtk
 import gobject
@@ -123,6 +125,8 @@ class SVNBrowser(InterfaceView, GtkContextMenuCaller):
         self.clipboard = None
         self.url_clipboard = gtk.Clipboard()
         self.repo_root_url = None
+        self.listings = ListingCache()
+        self.prefetcher = None
 
         if self.url:
             rabbitvcs.util.helper.save_repository_path(url)
@@ -135,14 +139,97 @@ class SVNBrowser(InterfaceView, GtkContextMenuCaller):
             notification=False
         )
         revision = self.revision_selector.get_revision_object()
-        self.action.append(
-                        self.svn.list,
-                        rabbitvcs.util.helper.quote_url(self.url), 
-                        revision=revision, recurse=False)
-        self.action.append(self.init_repo_root_url)
+        url = rabbitvcs.util.helper.quote_url(self.url)
+
+        if self.prefetcher:
+            self.prefetcher.stop()
+            self.prefetcher = None
+
+        self.action.append(self.get_listing, url, revision)
         self.action.append(self.populate_table, 0)
+        self.action.append(self.update_repo_info, url, revision)
+        self.action.append(self.prefetch_listings, 0, revision)
         self.action.start()
 
+    def get_listing(self, url, revision):
+        """
+        Returns the listing for the given url and revision, from the listing
+        cache if we have it.
+        
+        """
+        
+        items = self.listings.get(url, revision)
+        if items is None:
+            items = self.svn.list(url, revision=revision, recurse=False)
+            self.listings.set(url, revision, items)
+
+        return items
+
+    def update_repo_info(self, url, revision):
+        """
+        Looks up the repository root url and youngest revision.  If the youngest
+        revision has changed since we cached our HEAD listings, they are thrown
+        out and, if we were showing one of them, the listing is loaded again.
+        
+        """
+        
+        if not self.listings.should_check_head():
+            return
+
+        try:
+            (root_url, youngest) = self.svn.get_repo_info(url)
+        except Exception, e:
+            log.exception(e)
+            return
+
+        if self.repo_root_url is None and root_url:
+            self.repo_root_url = root_url
+
+        if (not self.listings.set_head(youngest) and
+                self.listings.is_head(revision)):
+            log.debug("Repository has changed, reloading %s" % url)
+            gobject.idle_add(self.load)
+
+    def prefetch_listings(self, item_index, revision):
+        """
+        Starts fetching the listings of the child folders in the background, so
+        they are ready when the user opens one.
+        
+        """
+        
+        urls = []
+        for item,locked in self.action.get_result(item_index)[1:]:
+            if self.svn.NODE_KINDS_REVERSE[item.kind] == "dir":
+                urls.append(self.get_listing_url(item.path))
+
+        if urls:
+            self.prefetcher = ListingPrefetcher(self.listings, urls, revision)
+            self.prefetcher.start()
+
+    def get_listing_url(self, path):
+        """
+        Converts a url from a listing to the form load() uses as a cache key.
+        
+        """
+        
+        url = rabbitvcs.util.helper.unquote_url(path)
+        if isinstance(url, unicode):
+            url = url.encode("utf-8")
+        return rabbitvcs.util.helper.quote_url(url)
+
+    def invalidate_listings(self):
+        """
+        Called when we change the repository, so that we don't show any out of
+        date HEAD listings.
+        
+        """
+        
+        if self.prefetcher:
+            self.prefetcher.stop()
+            self.prefetcher = None
+
+        self.listings.set_head(None)
+
     @gtk_unsafe
     def populate_table(self, item_index=0):
         self.list_table.clear()
@@ -159,13 +246,9 @@ class SVNBrowser(InterfaceView, GtkContextMenuCaller):
                 item.time
             ])
     
-    def init_repo_root_url(self):
-        if self.repo_root_url is None and self.svn.is_in_a_or_a_working_copy(self.url):
-            action = rabbitvcs.ui.action.SVNAction(self.svn, notification=False, run_in_thread=False)
-            self.repo_root_url = action.run_single(self.svn.get_repo_root_url, self.url)
-
     def on_refresh_clicked(self, widget):
         rabbitvcs.util.helper.save_repository_path(self.urls.get_active_text())
+        self.listings.empty()
         self.load()
 
     def on_row_activated(self, treeview, data, col):
@@ -341,6 +424,118 @@ class SVNBrowserDialog(SVNBrowser):
 
 
 
+class ListingCache:
+    """
+    Caches repository listings by url and revision.
+    
+    Listings of numbered revisions never change, so they are kept for as long
+    as the browser is open.  HEAD listings are only valid for the youngest
+    revision of the repository at the time, so they are all thrown out when
+    the youngest revision changes.  This is checked at most once every
+    HEAD_CHECK_INTERVAL seconds.
+    
+    This is used by the browser and its prefetch thread, but only needs plain
+    dict operations, which are atomic.
+    
+    """
+    
+    HEAD_CHECK_INTERVAL = 10 # seconds
+    
+    def __init__(self):
+        self.empty()
+
+    def empty(self):
+        self.listings = {}
+        self.head = None
+        self.head_checked = 0
+
+    def get_key(self, url, revision):
+        return (url.rstrip("/"), unicode(revision).lower())
+
+    def is_head(self, revision):
+        return (unicode(revision).lower() == "head")
+
+    def get(self, url, revision):
+        return self.listings.get(self.get_key(url, revision))
+
+    def has(self, url, revision):
+        return (self.get_key(url, revision) in self.listings)
+
+    def set(self, url, revision, items):
+        self.listings[self.get_key(url, revision)] = items
+
+    def should_check_head(self):
+        return (time.time() - self.head_checked > self.HEAD_CHECK_INTERVAL)
+
+    def set_head(self, youngest):
+        """
+        Records the youngest revision of the repository.  Passing None forces
+        the HEAD listings to be thrown out.
+        
+        @rtype  boolean
+        @return True if the youngest revision is the one we already had
+        
+        """
+        
+        self.head_checked = (youngest is not None and time.time() or 0)
+
+        # If we didn't know the youngest revision yet, the listings we have
+        # were fetched just now, so they are up to date
+        if youngest is not None and self.head in (None, youngest):
+            self.head = youngest
+            return True
+
+        for key in self.listings.keys():
+            if key[1] == "head":
+                del self.listings[key]
+
+        self.head = youngest
+        return False
+
+class ListingPrefetcher(threading.Thread):
+    """
+    Fetches listings in the background and puts them in a ListingCache.  It
+    uses an SVN client of its own so it never competes with the browser's
+    client, and never prompts the user for anything.  Any error just ends the
+    prefetch.
+    
+    """
+    
+    #: The most folders we prefetch for a single listing
+    LIMIT = 25
+    
+    def __init__(self, listings, urls, revision):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        
+        self.listings = listings
+        self.urls = urls[:self.LIMIT]
+        self.revision = revision
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        from rabbitvcs.vcs.svn import SVN
+        svn = SVN()
+        
+        for url in self.urls:
+            if self.stopped:
+                return
+
+            if self.listings.has(url, self.revision):
+                continue
+
+            try:
+                items = svn.list(url, revision=self.revision, recurse=False)
+            except Exception, e:
+                log.debug("Stopped prefetching listings: %s" % e)
+                return
+            
+            if not self.stopped:
+                self.listings.set(url, self.revision, items)
+
 class MenuCreateRepositoryFolder(MenuItem):
     identifier = "RabbitVCS::Create_Repository_Folder"
     label = _("Create folder...")
@@ -484,6 +679,7 @@ class BrowserContextMenuCallbacks:
             notification=False
         )
         self.caller.action.append(self.svn.move, self.paths[0], new_url)
+        self.caller.action.append(self.caller.invalidate_listings)
         self.caller.action.append(self.svn.list, path_to_refresh, recurse=False)
         self.caller.action.append(self.caller.populate_table, 1)
         self.caller.action.start()
@@ -502,6 +698,7 @@ class BrowserContextMenuCallbacks:
             notification=False
         )
         self.caller.action.append(self.svn.remove, self.paths)
+        self.caller.action.append(self.caller.invalidate_listings)
         self.caller.action.append(self.svn.list, path_to_refresh, recurse=False)
         self.caller.action.append(self.caller.populate_table, 1)
         self.caller.action.start()  
@@ -521,6 +718,7 @@ class BrowserContextMenuCallbacks:
             notification=False
         )
         self.caller.action.append(self.svn.mkdir, new_url, log_message)
+        self.caller.action.append(self.caller.invalidate_listings)
         self.caller.action.append(self.svn.list, self.paths[0], recurse=False)
         self.caller.action.append(self.caller.populate_table, 1)
         self.caller.action.start()        
@@ -547,6 +745,7 @@ class BrowserContextMenuCallbacks:
             notification=False
         )
         self.caller.action.append(self.svn.copy_all, sources, new_url, copy_as_child=True)
+        self.caller.action.append(self.caller.invalidate_listings)
         self.caller.action.append(self.svn.list, self.caller.get_url(), recurse=False)
         self.caller.action.append(self.caller.populate_table, 1)
         self.caller.action.start()
@@ -574,6 +773,7 @@ class BrowserContextMenuCallbacks:
             notification=False
         )
         self.caller.action.append(self.svn.move_all, self.paths, new_url, move_as_child=True)
+        self.caller.action.append(self.caller.invalidate_listings)
         self.caller.action.append(self.svn.list, self.caller.get_url(), recurse=False)
         self.caller.action.append(self.caller.populate_table, 1)
         self.caller.action.start()
@@ -271,11 +271,12 @@ class SVNChanges(Changes):
             url_combobox=self.second_urls
         )
 
-        self.changes_table = rabbitvcs.ui.widget.Table(
+        self.changes_table = rabbitvcs.ui.widget.VirtualTable(
             self.get_widget("changes_table"),
             [gobject.TYPE_STRING, gobject.TYPE_STRING, 
                 gobject.TYPE_STRING], 
             [_("Path"), _("Change"), _("Property Change")],
+            self.make_row,
             flags={
                 "sortable": True,
                 "sort_on": 1
@@ -319,18 +320,20 @@ class SVNChanges(Changes):
         summary = self.action.get_result(1)
 
         self.changes_table.clear()
-        for item in summary:
-            prop_changed = (item["prop_changed"] == 1 and _("Yes") or _("No"))
+        self.changes_table.populate(summary)
+
+    def make_row(self, item):
+        prop_changed = (item["prop_changed"] == 1 and _("Yes") or _("No"))
+        
+        path = item["path"]
+        if path == "":
+            path = "."
             
-            path = item["path"]
-            if path == "":
-                path = "."
-                
-            self.changes_table.append([
-                path,
-                item["summarize_kind"],
-                prop_changed
-            ])
+        return [
+            path,
+            item["summarize_kind"],
+            prop_changed
+        ]
 
     def on_first_urls_browse_clicked(self, widget, data=None):
         from rabbitvcs.ui.browser import SVNBrowserDialog
@@ -373,10 +376,11 @@ class GitChanges(Changes):
             url_combobox=self.second_urls
         )
 
-        self.changes_table = rabbitvcs.ui.widget.Table(
+        self.changes_table = rabbitvcs.ui.widget.VirtualTable(
             self.get_widget("changes_table"),
             [gobject.TYPE_STRING, gobject.TYPE_STRING], 
-            [_("Path"), _("Change")]
+            [_("Path"), _("Change")],
+            self.make_row
         )
 
         self.check_ui()
@@ -413,11 +417,13 @@ class GitChanges(Changes):
         summary = self.action.get_result(1)
 
         self.changes_table.clear()
-        for item in summary:
-            self.changes_table.append([
-                item.path,
-                item.action
-            ])
+        self.changes_table.populate(summary)
+
+    def make_row(self, item):
+        return [
+            item.path,
+            item.action
+        ]
 
 
 class MenuOpenFirst(MenuItem):
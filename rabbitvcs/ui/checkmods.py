@@ -102,10 +102,11 @@ class SVNCheckLocalModifications(GtkContextMenuCaller):
         self.paths = paths
         self.base_dir = base_dir
 
-        self.files_table = rabbitvcs.ui.widget.Table(
+        self.files_table = rabbitvcs.ui.widget.VirtualTable(
             self.caller.get_widget("local_files_table"), 
             [gobject.TYPE_STRING, gobject.TYPE_STRING, gobject.TYPE_STRING], 
             [_("Path"), _("Status"), _("Extension")],
+            self.make_row,
             filters=[{
                 "callback": rabbitvcs.ui.widget.path_filter,
                 "user_data": {
@@ -137,16 +138,18 @@ class SVNCheckLocalModifications(GtkContextMenuCaller):
         self.action.append(self.populate_files_table)
         self.action.start()
 
+    def make_row(self, item):
+        return [
+            item.path, 
+            item.simple_content_status(),
+            rabbitvcs.util.helper.get_file_extension(item.path)
+        ]
+
     @gtk_unsafe
     def populate_files_table(self):
         self.files_table.clear()
         self.items = self.action.get_result(0)
-        for item in self.items:
-            self.files_table.append([
-                item.path, 
-                item.simple_content_status(),
-                rabbitvcs.util.helper.get_file_extension(item.path)
-            ])
+        self.files_table.populate(self.items)
 
     def diff_local(self, path):
         rabbitvcs.util.helper.launch_diff_tool(path)
@@ -163,7 +166,7 @@ class SVNCheckRemoteModifications(GtkContextMenuCaller):
         self.paths = paths
         self.base_dir = base_dir
 
-        self.files_table = rabbitvcs.ui.widget.Table(
+        self.files_table = rabbitvcs.ui.widget.VirtualTable(
             self.caller.get_widget("remote_files_table"), 
             [gobject.TYPE_STRING, gobject.TYPE_STRING, 
                 gobject.TYPE_STRING, gobject.TYPE_STRING, 
@@ -171,6 +174,7 @@ class SVNCheckRemoteModifications(GtkContextMenuCaller):
             [_("Path"), _("Extension"), 
                 _("Text Status"), _("Property Status"), 
                 _("Revision"), _("Author")],
+            self.make_row,
             filters=[{
                 "callback": rabbitvcs.ui.widget.path_filter,
                 "user_data": {
@@ -202,27 +206,29 @@ class SVNCheckRemoteModifications(GtkContextMenuCaller):
         self.action.append(self.populate_files_table)
         self.action.start()
 
+    def make_row(self, item):
+        revision = -1
+        author = ""
+
+        if item.revision is not None:
+            revision = item.revision
+        if item.author is not None:
+            author = item.author
+
+        return [
+            item.path, 
+            rabbitvcs.util.helper.get_file_extension(item.path),
+            item.remote_content,
+            item.remote_metadata,
+            str(revision),
+            author
+        ]
+
     @gtk_unsafe
     def populate_files_table(self):
         self.files_table.clear()
         self.items = self.action.get_result(0)
-        for item in self.items:
-            revision = -1
-            author = ""
-
-            if item.revision is not None:
-                revision = item.revision
-            if item.author is not None:
-                author = item.author
-
-            self.files_table.append([
-                item.path, 
-                rabbitvcs.util.helper.get_file_extension(item.path),
-                item.remote_content,
-                item.remote_metadata,
-                str(revision),
-                author
-            ])
+        self.files_table.populate(self.items)
 
     def diff_remote(self, path):
         from rabbitvcs.ui.diff import SVNDiff
@@ -52,7 +52,7 @@ class Commit(InterfaceView, GtkContextMenuCaller):
     changes to a repository.  Pass it a list of local paths to commit.
     
     """
-    SETTINGS = rabbitvcs.util.settings.SettingsManager()
+    SETTINGS = rabbitvcs.util.settings.get_settings()
 
     TOGGLE_ALL = False
     SHOW_UNVERSIONED = SETTINGS.get("general", "show_unversioned_files")
@@ -126,7 +126,8 @@ class Commit(InterfaceView, GtkContextMenuCaller):
         self.get_widget("status").set_text(_("Loading..."))
         gtk.gdk.threads_leave()
 
-        self.items = self.vcs.get_items(self.paths, self.vcs.statuses_for_commit(self.paths))
+        self.items = rabbitvcs.ui.get_items(self.vcs, self.paths,
+            self.vcs.statuses_for_commit(self.paths))
 
         gtk.gdk.threads_enter()
         self.populate_files_table()
@@ -242,7 +243,7 @@ class Commit(InterfaceView, GtkContextMenuCaller):
         """
         
         self.files_table.clear()
-        n = 0
+        rows = []
         for item in self.items:
             if item.path in self.changes:
                 checked = self.changes[item.path]
@@ -252,15 +253,15 @@ class Commit(InterfaceView, GtkContextMenuCaller):
             if not self.should_item_be_visible(item):
                 continue
 
-            n += 1
-            self.files_table.append([
+            rows.append([
                 checked,
                 item.path, 
                 rabbitvcs.util.helper.get_file_extension(item.path),
                 item.simple_content_status(),
                 item.simple_metadata_status()
             ])
-        self.get_widget("status").set_text(_("Found %d item(s)") % n)
+        self.files_table.populate(rows)
+        self.get_widget("status").set_text(_("Found %d item(s)") % len(rows))
 
 class SVNCommit(Commit):
     def __init__(self, paths, base_dir=None, message=None):
@@ -345,7 +346,7 @@ class GitCommit(Commit):
             self.close()
             return
 
-        staged = 0
+        to_stage = []
         for item in items:
             try:
                 status = self.vcs.status(item, summarize=False).simple_content_status()
@@ -353,12 +354,11 @@ class GitCommit(Commit):
                     self.git.checkout([item])
                     self.git.remove(item)
                 else:
-                    self.git.stage(item)
-                    staged += 1
+                    to_stage.append(item)
             except Exception, e:
                 log.exception(e)
 
-        ticks = staged + len(items)*2
+        ticks = len(to_stage) + len(items)*2
 
         self.action = rabbitvcs.ui.action.GitAction(
             self.git,
@@ -366,6 +366,11 @@ class GitCommit(Commit):
         )
         self.action.set_pbar_ticks(ticks)
         self.action.append(self.action.set_header, _("Commit"))
+        
+        # Everything is staged at once, so the index is only written once
+        if to_stage:
+            self.action.append(self.git.stage, to_stage)
+        
         self.action.append(self.action.set_status, _("Running Commit Command..."))
         self.action.append(
             rabbitvcs.util.helper.save_log_message,
@@ -47,6 +47,96 @@ _ = gettext.gettext
 
 gtk.gdk.threads_init()
 
+def split_svn_diff(diff_text):
+    """
+    Splits the output of svn diff into sections, one for each "Index:" or
+    "Property changes on:" header, in the order svn wrote them.
+    
+    @type   diff_text: string
+    @param  diff_text: The output of svn diff
+    
+    @rtype  generator
+    @return Yields (path, text) tuples
+    
+    """
+    
+    path = None
+    lines = []
+    for line in diff_text.splitlines(True):
+        header = None
+        for prefix in ("Index: ", "Property changes on: "):
+            if line.startswith(prefix):
+                header = line[len(prefix):]
+                break
+
+        if header is not None:
+            if lines:
+                yield (path, "".join(lines))
+            path = os.path.normpath(header.rstrip("\r\n"))
+            lines = []
+
+        lines.append(line)
+
+    if lines:
+        yield (path, "".join(lines))
+
+def is_selected_path(path, selected):
+    """
+    Returns True if path, or one of the folders it is in, is in selected.
+    
+    """
+    
+    while path:
+        if path in selected:
+            return True
+        
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+
+    return ("." in selected)
+
+def get_svn_diff_targets(selected):
+    """
+    Works out which paths to diff so that every selected path is covered,
+    without diffing much more than was selected.  Selected folders are
+    diffed recursively, and selected files are diffed together through
+    their folder, without recursing, when more than one of them is in it.
+    
+    @type   selected: set
+    @param  selected: Normalized paths, relative to the current folder
+    
+    @rtype  list
+    @return (path, recurse) tuples
+    
+    """
+    
+    if "." in selected:
+        return [(".", True)]
+
+    targets = []
+    files = {}
+    for path in sorted(selected):
+        parent = os.path.dirname(path)
+        if parent and is_selected_path(parent, selected):
+            # Covered by a selected folder
+            continue
+
+        if os.path.isdir(path) or not os.path.exists(path):
+            # Deleted folders are diffed recursively too
+            targets.append((path, True))
+        else:
+            files.setdefault(parent or ".", []).append(path)
+
+    for (parent, paths) in sorted(files.items()):
+        if len(paths) == 1:
+            targets.append((paths[0], False))
+        else:
+            targets.append((parent, False))
+
+    return targets
+
 class CreatePatch:
     """
     Provides a user interface for the user to create a Patch file
@@ -113,6 +203,10 @@ class CreatePatch:
     # Helper functions
     # 
 
+    def update_patch_progress(self, index, count, path):
+        self.action.set_progress_fraction(float(index) / count)
+        self.action.set_status(_("Creating Patch File... (%s)") % path)
+
     def choose_patch_path(self):
         path = ""
         
@@ -158,12 +252,10 @@ class SVNCreatePatch(CreatePatch, SVNCommit):
             self.close()
             return
       
-        ticks = len(items)*2
         self.action = rabbitvcs.ui.action.SVNAction(
             self.svn,
             register_gtk_quit=self.gtk_quit_is_set()
         )
-        self.action.set_pbar_ticks(ticks)
         self.action.append(self.action.set_header, _("Create Patch"))
         self.action.append(self.action.set_status, _("Creating Patch File..."))
         
@@ -174,18 +266,42 @@ class SVNCreatePatch(CreatePatch, SVNCommit):
             temp_dir = tempfile.mkdtemp(prefix=rabbitvcs.TEMP_DIR_PREFIX)
             
             os.chdir(base_dir)
-           
-            # Add to the Patch file only the selected items
+
+            selected = set()
             for item in patch_items:
                 rel_path = rabbitvcs.util.helper.get_relative_path(base_dir, item)
+                selected.add(os.path.normpath(rel_path or "."))
+
+            # Diff the selected items in as few calls as possible, and only
+            # keep the parts for the selected items.  This is much faster
+            # than diffing each item on its own, since each diff call has to
+            # crawl the working copy and create temp files.
+            count = len(patch_items)
+            index = 0
+            last_path = None
+            for (target, recurse) in get_svn_diff_targets(selected):
                 diff_text = self.svn.diff(
                     temp_dir, 
-                    rel_path, 
+                    target, 
                     self.svn.revision("base"), 
-                    rel_path, 
-                    self.svn.revision("working")
+                    target, 
+                    self.svn.revision("working"),
+                    recurse=recurse
                 )
-                fileObj.write(diff_text)
+
+                for (section_path, section_text) in split_svn_diff(diff_text):
+                    if (section_path is not None and
+                            not is_selected_path(section_path, selected)):
+                        continue
+
+                    fileObj.write(section_text)
+
+                    if section_path != last_path:
+                        last_path = section_path
+                        if section_path in selected:
+                            index += 1
+                        self.update_patch_progress(min(index, count), count,
+                                                   section_path)
     
             fileObj.close()            
         
@@ -225,40 +341,34 @@ class GitCreatePatch(CreatePatch, GitCommit):
             self.close()
             return
       
-        ticks = len(items)*2
         self.action = rabbitvcs.ui.action.GitAction(
             self.git,
             register_gtk_quit=self.gtk_quit_is_set()
         )
-        self.action.set_pbar_ticks(ticks)
         self.action.append(self.action.set_header, _("Create Patch"))
         self.action.append(self.action.set_status, _("Creating Patch File..."))
         
         def create_patch_action(patch_path, patch_items, base_dir):
             fileObj = open(patch_path,"w")
-            
-            # PySVN takes a path to create its own temp files...
-            temp_dir = tempfile.mkdtemp(prefix=rabbitvcs.TEMP_DIR_PREFIX)
-            
-            os.chdir(base_dir)
-           
-            # Add to the Patch file only the selected items
-            for item in patch_items:
-                rel_path = rabbitvcs.util.helper.get_relative_path(base_dir, item)
-                diff_text = self.git.diff(
-                    rel_path, 
-                    self.git.revision("HEAD"), 
-                    rel_path, 
-                    self.git.revision("WORKING")
-                )
-                fileObj.write(diff_text)
+
+            count = len(patch_items)
+            progress = {"index": 0}
+            def on_file(path):
+                progress["index"] += 1
+                self.update_patch_progress(min(progress["index"], count),
+                    count, path)
+
+            # The selected items are diffed a batch at a time, and git writes
+            # straight into the patch file
+            self.git.diff_to_file(
+                patch_items,
+                self.git.revision("HEAD"),
+                fileObj,
+                callback=on_file
+            )
     
             fileObj.close()            
         
-            # Note: if we don't want to ignore errors here, we could define a
-            # function that logs failures.
-            shutil.rmtree(temp_dir, ignore_errors = True)
-        
         self.action.append(create_patch_action, path, items, self.common)
         
         self.action.append(self.action.set_status, _("Patch File Created"))
@@ -25,6 +25,8 @@ import threading
 from datetime import datetime
 
 import os.path
+import re
+from bisect import bisect_left
 import pygtk
 import gobject
 import gtk
@@ -40,6 +42,9 @@ import rabbitvcs.util.helper
 import rabbitvcs.vcs
 from rabbitvcs.util.decorators import gtk_unsafe
 
+from rabbitvcs.util.log import Log as Logger
+log = Logger("rabbitvcs.ui.log")
+
 from rabbitvcs import gettext
 _ = gettext.gettext
 
@@ -111,6 +116,16 @@ class Log(InterfaceView):
 
     limit = 100
 
+    # The width of the (fixed width) revisions table columns, see
+    # set_fixed_height_mode()
+    COLUMN_WIDTHS = {
+        _("Graph"): 16,
+        REVISION_LABEL: 70,
+        AUTHOR_LABEL: 120,
+        DATE_LABEL: 130
+    }
+    MESSAGE_COLUMN_WIDTH = 400
+
     def __init__(self, path):
         """
         @type   path: string
@@ -126,6 +141,7 @@ class Log(InterfaceView):
         self.filter_text = None
         self.path = path
         self.cache = LogCache()
+        self.display_items = []
 
         self.rev_first = None
         self.rev_start = None
@@ -269,6 +285,48 @@ class Log(InterfaceView):
     # Helper methods
     #
 
+    def set_fixed_height_mode(self):
+        """
+        Puts the revisions table into fixed height mode, so that the tree view
+        only measures (and formats, see the filters below) the rows that are
+        actually visible, rather than every row in the log.
+        
+        """
+        
+        treeview = self.revisions_table.treeview
+        for column in treeview.get_columns():
+            column.set_sizing(gtk.TREE_VIEW_COLUMN_FIXED)
+            title = column.get_title()
+            if title in self.COLUMN_WIDTHS:
+                column.set_fixed_width(self.COLUMN_WIDTHS[title])
+            elif title == _("Message"):
+                column.set_fixed_width(self.MESSAGE_COLUMN_WIDTH)
+                column.set_expand(True)
+
+        treeview.set_fixed_height_mode(True)
+
+    #
+    # Revisions table filters
+    #
+    # The revisions table only holds the raw log data.  These filters format
+    # it as it is drawn, which means only the visible rows are ever formatted.
+    #
+
+    def message_filter(self, row, column, user_data=None):
+        text = row[column]
+        if text:
+            text = cgi.escape(rabbitvcs.util.helper.format_long_text(text, 80))
+
+        return text
+
+    def date_filter(self, row, column, user_data=None):
+        try:
+            item = self.display_items[row.path[0]]
+        except IndexError:
+            return ""
+
+        return rabbitvcs.util.helper.format_datetime(item.date)
+
     def load_or_refresh(self):
         if self.cache.has(self.rev_start):
             self.refresh()
@@ -370,10 +428,22 @@ class SVNLog(Log):
             [_("Revision"), _("Author"), 
                 _("Date"), _("Message"),
                 _("Color")],
+            filters=[{
+                "callback": self.date_filter,
+                "user_data": {
+                    "column": 2
+                }
+            },{
+                "callback": self.message_filter,
+                "user_data": {
+                    "column": 3
+                }
+            }],
             callbacks={
                 "mouse-event":   self.on_revisions_table_mouse_event
             }
         )
+        self.set_fixed_height_mode()
 
         for i in range(4):
             column = self.revisions_table.get_column(i)
@@ -396,6 +466,13 @@ class SVNLog(Log):
             }
         )
 
+        # Changed paths are only fetched for the revisions the user selects,
+        # using a client of their own so they can be fetched while the main
+        # client is busy loading the log
+        self.changed_paths_client = None
+        self.changed_paths_loading = False
+        self.changed_paths_pending = []
+
         self.initialize_root_url()
         self.load_or_refresh()
 
@@ -425,6 +502,7 @@ class SVNLog(Log):
         self.revisions_table.clear()
         self.message.set_text("")
         self.paths_table.clear()
+        self.changed_paths_pending = []
         
         if self.rev_start and self.cache.has(self.rev_start):
             self.revision_items = self.cache.get(self.rev_start)
@@ -432,6 +510,12 @@ class SVNLog(Log):
             # Make sure the int passed is the order the log call was made
             self.revision_items = self.action.get_result(0)
 
+            # Mark the changed paths of each item as not fetched yet, unless
+            # they were loaded along with the log
+            if self.revision_items and not self.action_discovered_paths:
+                for item in self.revision_items:
+                    item.changed_paths = None
+
         if not self.revision_items or len(self.revision_items) == 0:
             return
         
@@ -449,19 +533,14 @@ class SVNLog(Log):
         if self.rev_start > self.rev_max:
             self.rev_max = self.rev_start
         
-        self.display_items = []
-
-        for item in self.revision_items:
-            msg = cgi.escape(item.message).lower()
-
-            should_add = not self.filter_text
-            should_add = should_add or msg.find(self.filter_text) > -1
-            should_add = should_add or item.author.lower().find(self.filter_text) > -1
-            should_add = should_add or str(item.revision).lower().find(self.filter_text) > -1
-            should_add = should_add or str(item.date).lower().find(self.filter_text) > -1
-
-            if should_add:
-                self.display_items.append(item)
+        # Searches cover every revision we have loaded so far, not just the
+        # current page
+        if self.filter_text:
+            self.display_items = self.cache.search(self.filter_text)
+            self.display_items.sort(
+                key=lambda item: int(item.revision.short()), reverse=True)
+        else:
+            self.display_items = list(self.revision_items)
 
         self.set_start_revision(self.rev_start)
         self.set_end_revision(self.rev_end)
@@ -469,34 +548,37 @@ class SVNLog(Log):
         self.check_previous_sensitive()
         self.check_next_sensitive()
 
+        rows = []
         for item in self.display_items:
-            msg = cgi.escape(rabbitvcs.util.helper.format_long_text(item.message, 80))
             rev = item.revision
             color = "#000000"
             if (self.merge_candidate_revisions != None and
                 int(rev.short()) not in self.merge_candidate_revisions):
                 color = "#c9c9c9"
 
-            self.populate_table(rev, item.author, item.date, msg, color)
+            # The date and message are formatted by the table filters
+            rows.append([
+                unicode(rev),
+                item.author,
+                "",
+                item.message,
+                color
+            ])
 
             # Stop on copy after adding the item to the table
             # so the user can look at the item that was copied
-            if self.stop_on_copy:
+            if self.stop_on_copy and item.changed_paths:
+                copied = False
                 for path in item.changed_paths:
                     if path.copy_from_path or path.copy_from_revision:
-                        self.set_loading(False)
-                        return
+                        copied = True
+                        break
 
-        self.set_loading(False)
+                if copied:
+                    break
 
-    def populate_table(self, revision, author, date, msg, color):
-        self.revisions_table.append([
-            unicode(revision),
-            author,
-            rabbitvcs.util.helper.format_datetime(date),
-            msg,
-            color
-        ])
+        self.revisions_table.populate(rows)
+        self.set_loading(False)
 
 
     def load(self):
@@ -511,12 +593,17 @@ class SVNLog(Log):
         if self.rev_start:
             start = self.svn.revision("number", number=self.rev_start)
 
+        # Changed paths can be huge (eg. for merges), so they are normally
+        # fetched when a revision is selected.  Stop on copy needs them for
+        # every revision though.
+        self.action_discovered_paths = self.stop_on_copy
+
         self.action.append(
             self.svn.log, 
             self.path,
             revision_start=start,
             limit=self.limit,
-            discover_changed_paths=True
+            discover_changed_paths=self.action_discovered_paths
         )
         self.action.append(self.refresh)
         self.action.start()
@@ -547,11 +634,13 @@ class SVNLog(Log):
 
     def on_log_message_edited(self, index, val):
         self.display_items[index].message = val
+        self.cache.index.add(self.display_items[index], reindex=True)
         self.revisions_table.set_row_item(index, 3, val)
         self.message.set_text(val)
 
     def on_author_edited(self, index, val):
         self.display_items[index].author = val
+        self.cache.index.add(self.display_items[index], reindex=True)
         self.revisions_table.set_row_item(index, 1, val)
 
     def copy_revision_text(self):
@@ -576,10 +665,26 @@ class SVNLog(Log):
 
         self.revision_clipboard.set_text(text)
 
+    def on_stop_on_copy_toggled(self, widget):
+        self.stop_on_copy = self.get_widget("stop_on_copy").get_active()
+        if self.is_loading:
+            return
+
+        # Stop on copy needs the changed paths for every revision, which we
+        # may not have loaded
+        missing_paths = False
+        for item in self.revision_items:
+            if item.changed_paths is None:
+                missing_paths = True
+                break
+
+        if self.stop_on_copy and missing_paths:
+            self.cache.empty()
+            self.load()
+        else:
+            self.refresh()
+
     def update_revision_message(self):
-        combined_paths = []
-        subitems = []
-               
         for selected_row in self.revisions_table.get_selected_rows():
             item = self.display_items[selected_row]
             
@@ -591,26 +696,108 @@ class SVNLog(Log):
 					"%s %s:\n\t%s\n" % (REVISION_LABEL,
                                         unicode(item.revision),
                                         indented_message))
-            if item.changed_paths is not None:
-                for subitem in item.changed_paths:
-                    if subitem.path not in combined_paths:
-                        combined_paths.append(subitem.path)
-                        
-                        subitems.append([
-                            subitem.action,
-                            subitem.path,
-                            subitem.copy_from_path,
-                            subitem.copy_from_revision
-                        ])
+
+        self.update_paths_table()
+
+    def update_paths_table(self):
+        """
+        Shows the changed paths of the selected revisions, and fetches the ones
+        we don't have yet.
+        
+        """
+        
+        combined_paths = set()
+        subitems = []
+        missing = []
+
+        self.paths_table.clear()
+
+        for selected_row in self.revisions_table.get_selected_rows():
+            item = self.display_items[selected_row]
+
+            if item.changed_paths is None:
+                missing.append(item)
+                continue
+
+            for subitem in item.changed_paths:
+                if subitem.path not in combined_paths:
+                    combined_paths.add(subitem.path)
+                    
+                    subitems.append([
+                        subitem.action,
+                        subitem.path,
+                        subitem.copy_from_path,
+                        subitem.copy_from_revision
+                    ])
 
         subitems.sort(lambda x, y: cmp(x[1],y[1]))
-        for subitem in subitems:
-            self.paths_table.append([
-                subitem[0],
-                subitem[1],
-                subitem[2],
-                subitem[3]
-            ])
+        self.paths_table.populate(subitems)
+
+        if missing:
+            self.load_changed_paths(missing)
+
+    def load_changed_paths(self, items):
+        """
+        Fetches the changed paths for the given log items in the background.
+        Only one fetch runs at a time; if the selection changes in the meantime
+        we fetch whatever is selected once it is done.
+        
+        """
+        
+        self.changed_paths_pending = items
+        if self.changed_paths_loading:
+            return
+
+        if self.changed_paths_client is None:
+            from rabbitvcs.vcs.svn import SVN
+            self.changed_paths_client = SVN()
+
+        self.changed_paths_loading = True
+        items = self.changed_paths_pending
+        self.changed_paths_pending = []
+
+        action = SVNAction(
+            self.changed_paths_client,
+            notification=False
+        )
+        action.append(self.fetch_changed_paths, items)
+        action.append(self.on_changed_paths_loaded, items)
+        action.start()
+
+    def fetch_changed_paths(self, items):
+        for item in items:
+            if item.changed_paths is not None:
+                continue
+
+            try:
+                log_items = self.changed_paths_client.log(
+                    self.path,
+                    revision_start=item.revision,
+                    revision_end=item.revision,
+                    limit=1,
+                    discover_changed_paths=True
+                )
+            except Exception, e:
+                log.exception(e)
+                log_items = []
+
+            if log_items:
+                item.changed_paths = log_items[0].changed_paths
+            else:
+                item.changed_paths = []
+
+    @gtk_unsafe
+    def on_changed_paths_loaded(self, items):
+        self.changed_paths_loading = False
+
+        # Make the new paths searchable
+        for item in items:
+            self.cache.index.add(item, reindex=True)
+
+        if self.changed_paths_pending:
+            self.load_changed_paths(self.changed_paths_pending)
+        else:
+            self.update_paths_table()
 
     def on_previous_clicked(self, widget):
         self.rev_start = self.previous_starts.pop()
@@ -661,11 +848,27 @@ class GitLog(Log):
                 "user_data": {
                     "column": 1
                 }
+            },{
+                "callback": self.author_filter,
+                "user_data": {
+                    "column": 2
+                }
+            },{
+                "callback": self.date_filter,
+                "user_data": {
+                    "column": 3
+                }
+            },{
+                "callback": self.message_filter,
+                "user_data": {
+                    "column": 4
+                }
             }],
             callbacks={
                 "mouse-event":   self.on_revisions_table_mouse_event
             }
         )
+        self.set_fixed_height_mode()
 
         self.paths_table = rabbitvcs.ui.widget.Table(
             self.get_widget("paths_table"),
@@ -707,19 +910,15 @@ class GitLog(Log):
         self.set_start_revision(self.revision_items[0].revision.short())
         self.set_end_revision(self.revision_items[-1].revision.short())
 
-        self.display_items = []
-
-        for item in self.revision_items:
-            msg = cgi.escape(item.message).lower()
-
-            should_add = not self.filter_text
-            should_add = should_add or msg.find(self.filter_text) > -1
-            should_add = should_add or item.author.lower().find(self.filter_text) > -1
-            should_add = should_add or unicode(item.revision).lower().find(self.filter_text) > -1
-            should_add = should_add or str(item.date).lower().find(self.filter_text) > -1
+        # The pages are only cached so that they can be searched
+        self.cache.set(self.start_point, self.revision_items)
 
-            if should_add:
-                self.display_items.append(item)
+        # Searches cover every revision we have loaded so far, in the order
+        # they were loaded, not just the current page
+        if self.filter_text:
+            self.display_items = self.cache.search(self.filter_text)
+        else:
+            self.display_items = list(self.revision_items)
 
         grapher = revision_grapher(self.display_items)
         max_columns = 1
@@ -732,32 +931,26 @@ class GitLog(Log):
             cell = graph_column.get_cell_renderers()[0]
             self.revisions_table.set_column_width(0, 16*max_columns)
 
-        index = 0
+        self.head_row = None
+        rows = []
         for (item, node, in_lines, out_lines) in grapher:
-            revision = unicode(item.revision)
-            msg = cgi.escape(rabbitvcs.util.helper.format_long_text(item.message, 80))
-            author = item.author
-            date = rabbitvcs.util.helper.format_datetime(item.date)
-            
             if item.head:
-                self.head_row = index
-                msg = "<b>%s</b>" % msg
-                author = "<b>%s</b>" % author
-                date = "<b>%s</b>" % date            
+                self.head_row = len(rows)
             
             graph_render = ()
             if not self.filter_text:
                 graph_render = (node, in_lines, out_lines)
 
-            self.revisions_table.append([
+            # The author, date and message are formatted by the table filters
+            rows.append([
                 graph_render,
-                revision,
-                author,
-                date,
-                msg
+                unicode(item.revision),
+                item.author,
+                "",
+                item.message
             ])
 
-            index += 1
+        self.revisions_table.populate(rows)
 
         self.check_previous_sensitive()
         self.check_next_sensitive()
@@ -781,6 +974,23 @@ class GitLog(Log):
         self.action.append(self.refresh)
         self.action.start()
 
+    def highlight_head(self, row, text):
+        if row.path[0] == self.head_row:
+            return "<b>%s</b>" % text
+
+        return text
+
+    def author_filter(self, row, column, user_data=None):
+        return self.highlight_head(row, row[column])
+
+    def date_filter(self, row, column, user_data=None):
+        return self.highlight_head(row,
+            Log.date_filter(self, row, column, user_data))
+
+    def message_filter(self, row, column, user_data=None):
+        return self.highlight_head(row,
+            Log.message_filter(self, row, column, user_data))
+
     def copy_revision_text(self):
         text = ""
         for selected_row in self.revisions_table.get_selected_rows():
@@ -794,7 +1004,7 @@ class GitLog(Log):
         self.revision_clipboard.set_text(text)
 
     def update_revision_message(self):
-        combined_paths = []
+        combined_paths = set()
         subitems = []
         
         for selected_row in self.revisions_table.get_selected_rows():
@@ -812,7 +1022,7 @@ class GitLog(Log):
             for subitem in item.changed_paths:
                 
                 if subitem.path not in combined_paths:
-                    combined_paths.append(subitem.path)
+                    combined_paths.add(subitem.path)
                     
                     subitems.append([
                         subitem.action,
@@ -820,11 +1030,7 @@ class GitLog(Log):
                     ])
 
         subitems.sort(lambda x, y: cmp(x[1],y[1]))
-        for subitem in subitems:
-            self.paths_table.append([
-                subitem[0],
-                subitem[1]
-            ])
+        self.paths_table.populate(subitems)
 
     def on_previous_clicked(self, widget):
         self.start_point -= self.limit
@@ -895,11 +1101,23 @@ class GitLogDialog(GitLog):
                 self.ok_callback(self.get_selected_revision_number())
 
 class LogCache:
-    def __init__(self, cache={}):
+    """
+    Caches pages of log items, and keeps a search index of every item that
+    has been cached.
+    
+    """
+    
+    def __init__(self, cache=None):
+        if cache is None:
+            cache = {}
         self.cache = cache
+        self.index = LogSearchIndex()
+        for val in self.cache.values():
+            self.index.add_items(val)
     
     def set(self, key, val):
         self.cache[key] = val
+        self.index.add_items(val)
     
     def get(self, key):
         return self.cache[key]
@@ -907,8 +1125,181 @@ class LogCache:
     def has(self, key):
         return (key in self.cache)
     
+    def search(self, query):
+        return self.index.search(query)
+    
     def empty(self):
         self.cache = {}
+        self.index.clear()
+
+class LogSearchIndex:
+    """
+    An inverted index over log items, used by the log window's search box.
+    
+    Messages, authors, revisions, dates and changed paths are split into
+    lower case tokens.  Words such as "foo.c", "ABC-123" or "trunk/src/foo.c"
+    are indexed whole, by path component ("foo.c"), by the rest of the path
+    from each component on ("src/foo.c") and by their parts ("foo", "c"), so
+    any of those can be searched for.
+    
+    A query is split into tokens the same way, and matches the items that have
+    a token starting with each of the query's tokens.  So the results narrow
+    down as the user types, and "foo.c abc-123" finds the revisions that
+    touched foo.c and mention ABC-123.
+    
+    """
+    
+    TOKEN_RE = re.compile(r"\w[\w.\-/]*", re.UNICODE)
+    PART_RE = re.compile(r"[._\-/]+")
+    
+    def __init__(self):
+        self.clear()
+    
+    def clear(self):
+        # The indexed items, by id.  The ids are in the order the items were
+        # first indexed.
+        self.items = []
+        
+        # revision -> id
+        self.ids = {}
+        
+        # token -> set of ids
+        self.postings = {}
+        
+        # id -> the tokens the item was indexed under
+        self.item_tokens = {}
+        
+        # A sorted list of the tokens, for prefix lookups.  This is rebuilt
+        # when needed after the index has changed.
+        self.vocabulary = None
+        
+        # prefix -> set of ids, for the prefixes we have looked up since the
+        # index last changed
+        self.prefix_cache = {}
+
+    def tokenize(self, text):
+        tokens = set()
+        for word in self.TOKEN_RE.findall(text.lower()):
+            tokens.add(word)
+            components = word.split("/")
+            for i in range(len(components)):
+                if components[i]:
+                    tokens.add(components[i])
+                    
+                    # Paths are also indexed from each of their components
+                    # on, so "src/foo" finds "trunk/src/foo.c"
+                    if i:
+                        tokens.add("/".join(components[i:]))
+            for part in self.PART_RE.split(word):
+                if part:
+                    tokens.add(part)
+        
+        return tokens
+
+    def add(self, item, reindex=False):
+        """
+        Adds a log item to the index.  An item that is already indexed (ie. an
+        item for the same revision) is skipped, unless reindex is True, in
+        which case the item's tokens are replaced.
+        
+        @type   item: rabbitvcs.vcs.log.Log
+        @param  item: The log item to index
+        
+        @type   reindex: boolean
+        @param  reindex: Whether to index the item again if it is already there
+        
+        """
+        
+        key = unicode(item.revision)
+        if key in self.ids:
+            item_id = self.ids[key]
+            if self.items[item_id] is item and not reindex:
+                return
+            
+            self.items[item_id] = item
+            for token in self.item_tokens[item_id]:
+                self.postings[token].discard(item_id)
+        else:
+            item_id = len(self.items)
+            self.items.append(item)
+            self.ids[key] = item_id
+        
+        tokens = self.tokenize(key)
+        if item.message:
+            tokens |= self.tokenize(item.message)
+        if item.author:
+            tokens |= self.tokenize(item.author)
+        if item.date:
+            tokens |= self.tokenize(unicode(item.date))
+        if item.changed_paths:
+            for changed_path in item.changed_paths:
+                tokens |= self.tokenize(changed_path.path)
+        
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self.vocabulary = None
+            self.postings[token].add(item_id)
+        
+        self.item_tokens[item_id] = tokens
+        self.prefix_cache = {}
+
+    def add_items(self, items):
+        if not items:
+            return
+
+        for item in items:
+            self.add(item)
+
+    def lookup(self, prefix):
+        """
+        Returns the ids of the items with a token that starts with prefix.
+        
+        """
+        
+        if prefix in self.prefix_cache:
+            return self.prefix_cache[prefix]
+        
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        
+        # The tokens starting with prefix are all next to each other
+        ids = set()
+        start = bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            ids |= self.postings[token]
+        
+        self.prefix_cache[prefix] = ids
+        return ids
+
+    def search(self, query):
+        """
+        Returns the indexed items that match every token in the query, in the
+        order they were first indexed.
+        
+        @type   query: string
+        @param  query: The search text
+        
+        @rtype  list
+        @return The matching log items
+        
+        """
+        
+        tokens = self.TOKEN_RE.findall(query.lower())
+        if not tokens:
+            return []
+        
+        # Start with the rarest token, so the intersection stays small
+        results = sorted([self.lookup(token) for token in tokens], key=len)
+        ids = set(results[0])
+        for result in results[1:]:
+            ids &= result
+            if not ids:
+                break
+        
+        return [self.items[item_id] for item_id in sorted(ids)]
 
 
 class MenuViewDiffWorkingCopy(MenuItem):
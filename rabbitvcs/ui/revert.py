@@ -105,7 +105,7 @@ class Revert(InterfaceView, GtkContextMenuCaller):
     def load(self):
         gtk.gdk.threads_enter()
         self.get_widget("status").set_text(_("Loading..."))
-        self.items = self.vcs.get_items(self.paths, self.statuses)
+        self.items = rabbitvcs.ui.get_items(self.vcs, self.paths, self.statuses)
 
         self.populate_files_table()
         self.get_widget("status").set_text(_("Found %d item(s)") % len(self.items))
@@ -100,8 +100,7 @@ class GitStage(Add):
         
         self.action.append(self.action.set_header, _("Stage"))
         self.action.append(self.action.set_status, _("Running Stage Command..."))
-        for item in items:
-            self.action.append(self.git.stage, item)
+        self.action.append(self.git.stage, items)
         self.action.append(self.action.set_status, _("Completed Stage"))
         self.action.append(self.action.finish)
         self.action.start()
@@ -115,8 +114,7 @@ class GitStageQuiet:
             run_in_thread=False
         )
         
-        for path in paths:
-            self.action.append(self.git.stage, path)
+        self.action.append(self.git.stage, paths)
         self.action.run()
 
 classes_map = {
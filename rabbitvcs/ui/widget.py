@@ -94,6 +94,14 @@ ELLIPSIZE_COLUMN_CHARS = 20
 PATH_ENTRY = 'PATH_ENTRY'
 SEPARATOR = u'\u2015' * 10
 
+#: Batches of at least this many rows are added to a table with its model
+#: detached from the tree view (see TableBase.populate)
+BULK_LOAD_ROWS = 100
+
+# The virtual model needs PyGTK's GenericTreeModel, which is not available
+# through GObject introspection
+HAS_GENERIC_TREE_MODEL = hasattr(gtk, "GenericTreeModel")
+
 from pprint import pformat
 def filter_router(model, iter, column, filters):
     """
@@ -400,9 +408,15 @@ class TableBase:
             self.treeview.append_column(col)
             i += 1
 
-        self.data = self.get_store(coltypes)
+        self.coltypes = coltypes
+        self.column_count = i
+        self.filters = filters
+        self.filter_types = (filter_types and filter_types or coltypes)
+        self.sortable = flags["sortable"]
+        self.sort_column = flags["sort_on"]
+        self.sort_order = gtk.SORT_ASCENDING
 
-        self.sorted = None
+        self.data = self.get_store(coltypes)
 
         # self.sorted == sorted view of data
         # self.filter == filtered data (abs paths -> rel paths)
@@ -410,52 +424,80 @@ class TableBase:
 
         # The filter is there to change the way data is displayed. The data
         # should always be accessed via self.data, NOT self.filter.
+        self.filter = None
+        self.sorted = None
+        self.attach_model()
+
+        if len(values) > 0:
+            self.populate(values)
+    
+        self.set_resizable()
+
+        # Set up some callbacks for all tables to deal with row clicking and
+        # selctions
+        self.treeview.connect("cursor-changed", self.__cursor_changed_event)
+        self.treeview.connect("row-activated", self.__row_activated_event)
+        self.treeview.connect("button-press-event", self.__button_press_event)
+        self.treeview.connect("button-release-event", self.__button_release_event)
+        self.treeview.connect("key-press-event", self.__key_press_event)
+        self.treeview.connect("select-cursor-row", self.__row_selected)
+        self.callbacks = callbacks
+        if self.callbacks:
+            self.allow_multiple()
+
+    def attach_model(self):
+        """
+        Builds the filter (and, if the table is sortable, sort) models on top
+        of the data and gives them to the tree view.
+        
+        """
+        
         self.filter = self.data.filter_new()
-        types = (filter_types and filter_types or coltypes)
         self.filter.set_modify_func(
-                        types,
+                        self.filter_types,
                         filter_router,
-                        filters)
+                        self.filters)
 
-
-		# This runs through the columns, and sets the "compare_items" comparator
+        # This runs through the columns, and sets the "compare_items" comparator
         # as needed. Note that the user data tells which column to sort on.
-        if flags["sortable"]:
+        if self.sortable:
             self.sorted = gtk.TreeModelSort(self.filter)
             
             self.sorted.set_default_sort_func(compare_items, None)
             
-            for idx in range(0, i):
+            for idx in range(0, self.column_count):
                 self.sorted.set_sort_func(idx,
                                           compare_items,
-                                          (idx, coltypes[idx]))
+                                          (idx, self.coltypes[idx]))
                
-            self.sorted.set_sort_column_id(flags["sort_on"], gtk.SORT_ASCENDING)
+            self.sorted.set_sort_column_id(self.sort_column, self.sort_order)
             
             self.treeview.set_model(self.sorted)
             
-        elif filters:
+        elif self.filters:
             self.treeview.set_model(self.filter)
         else:
             self.treeview.set_model(self.data)
 
+    def detach_model(self):
+        """
+        Takes the data away from the tree view and drops the filter and sort
+        models, so that changes to the data don't have to be filtered, sorted
+        and drawn row by row.  The user's sort order is kept for when the
+        model is attached again.
         
-        if len(values) > 0:
-            self.populate(values)
-    
-        self.set_resizable()
-
-        # Set up some callbacks for all tables to deal with row clicking and
-        # selctions
-        self.treeview.connect("cursor-changed", self.__cursor_changed_event)
-        self.treeview.connect("row-activated", self.__row_activated_event)
-        self.treeview.connect("button-press-event", self.__button_press_event)
-        self.treeview.connect("button-release-event", self.__button_release_event)
-        self.treeview.connect("key-press-event", self.__key_press_event)
-        self.treeview.connect("select-cursor-row", self.__row_selected)
-        self.callbacks = callbacks
-        if self.callbacks:
-            self.allow_multiple()
+        """
+        
+        if self.sorted:
+            (column, order) = self.sorted.get_sort_column_id()
+            if column is not None:
+                self.sort_column = column
+                self.sort_order = order
+        
+        self.treeview.set_model(None)
+        self.sorted = None
+        self.filter = None
+        self.reset_selection()
 
     def _realpath(self, visible_path):
         """
@@ -499,8 +541,31 @@ class TableBase:
         return self.data
 
     def clear(self):
-        self.data.clear()
+        if len(self.data) >= BULK_LOAD_ROWS:
+            self.detach_model()
+            self.data.clear()
+            self.attach_model()
+        else:
+            self.data.clear()
         self.reset_selection()
+
+    def populate(self, values):
+        """
+        Adds the given rows to the table.  Large batches are added with the
+        model detached from the tree view, so the rows are filtered and sorted
+        once when it is attached again rather than once for every row.
+        
+        """
+        
+        if len(values) < BULK_LOAD_ROWS:
+            self.insert_rows(values)
+            return
+        
+        self.detach_model()
+        try:
+            self.insert_rows(values)
+        finally:
+            self.attach_model()
         
     def get_row(self, index):
         model = self.data
@@ -695,7 +760,7 @@ class Table(TableBase):
     def get_store(self, coltypes):
         return gtk.ListStore(*coltypes)
 
-    def populate(self, values):
+    def insert_rows(self, values):
         for row in values:
             self.data.append(row)
 
@@ -729,12 +794,300 @@ class Tree(TableBase):
         return gtk.TreeStore(*coltypes)
 
     def populate(self, values, parent=None):
+        if parent is None:
+            TableBase.populate(self, values)
+        else:
+            self.insert_rows(values, parent)
+
+    def insert_rows(self, values, parent=None):
         for node in values:
             root = node[0]
             new_root = self.data.append(parent, root)
             if len(node) > 1 and node[1] is not None:
-                self.populate(node[1], new_root)
+                self.insert_rows(node[1], new_root)
         
+if HAS_GENERIC_TREE_MODEL:
+    class VirtualListModel(gtk.GenericTreeModel):
+        """
+        A flat tree model that holds arbitrary items (eg. status objects) and
+        only turns them into rows of cell values when the tree view (or a
+        filter or sort model) asks for them.  Rows are remembered once they
+        have been made, and any cells that have been changed are kept
+        separately from them.
+        
+        """
+
+        def __init__(self, coltypes, row_callback):
+            """
+            @type   coltypes: list
+            @param  coltypes: The type of each column
+            
+            @type   row_callback: callable
+            @param  row_callback: Given an item, returns its list of cell values
+            
+            """
+            
+            gtk.GenericTreeModel.__init__(self)
+            self.set_property("leak-references", False)
+            
+            self.coltypes = coltypes
+            self.row_callback = row_callback
+            self.items = []
+            self.rows = []
+
+        def get_item(self, index):
+            return self.items[index]
+
+        def get_row_values(self, index):
+            row = self.rows[index]
+            if row is None:
+                row = list(self.row_callback(self.items[index]))
+                self.rows[index] = row
+            return row
+
+        def set_cell(self, index, column, value):
+            self.get_row_values(index)[column] = value
+            path = (index,)
+            self.row_changed(path, self.get_iter(path))
+
+        def set_item(self, index, item):
+            """
+            Replaces an item (or tells the model that it has changed), so its
+            row is made again the next time it is needed.
+            
+            """
+            
+            self.items[index] = item
+            self.rows[index] = None
+            path = (index,)
+            self.row_changed(path, self.get_iter(path))
+
+        def append(self, item):
+            self.items.append(item)
+            self.rows.append(None)
+            path = (len(self.items) - 1,)
+            self.row_inserted(path, self.get_iter(path))
+
+        def extend(self, items):
+            """
+            Adds items without telling anyone about them.  This should only be
+            used while no view is attached to the model.
+            
+            """
+            
+            self.items.extend(items)
+            self.rows.extend([None] * len(items))
+
+        def sort(self, column, reverse=False):
+            """
+            Puts the items in order of their values in the given column, which
+            means making the row of every item.  Like extend, this should only
+            be used while no view is attached to the model.
+            
+            """
+            
+            order = sorted(range(len(self.items)),
+                key=lambda index: self.get_row_values(index)[column],
+                reverse=reverse)
+            self.items = [self.items[index] for index in order]
+            self.rows = [self.rows[index] for index in order]
+
+        def remove(self, index):
+            del self.items[index]
+            del self.rows[index]
+            self.row_deleted((index,))
+
+        def __len__(self):
+            return len(self.items)
+
+        def on_get_flags(self):
+            return gtk.TREE_MODEL_LIST_ONLY
+
+        def on_get_n_columns(self):
+            return len(self.coltypes)
+
+        def on_get_column_type(self, index):
+            return self.coltypes[index]
+
+        def on_get_iter(self, path):
+            if path[0] < len(self.items):
+                return path[0]
+            return None
+
+        def on_get_path(self, rowref):
+            return (rowref,)
+
+        def on_get_value(self, rowref, column):
+            return self.get_row_values(rowref)[column]
+
+        def on_iter_next(self, rowref):
+            if rowref + 1 < len(self.items):
+                return rowref + 1
+            return None
+
+        def on_iter_children(self, parent):
+            if parent is None and self.items:
+                return 0
+            return None
+
+        def on_iter_has_child(self, rowref):
+            return False
+
+        def on_iter_n_children(self, rowref):
+            if rowref is None:
+                return len(self.items)
+            return 0
+
+        def on_iter_nth_child(self, parent, n):
+            if parent is None and n < len(self.items):
+                return n
+            return None
+
+        def on_iter_parent(self, child):
+            return None
+
+class VirtualTable(TableBase):
+    """
+    Generate a flat tree view of a list of items, for very large listings.
+    Rather than rows, the table is populated with items (eg. status objects),
+    and the row_callback turns an item into its row of cell values only when
+    that row is needed (usually because it is being drawn).
+    
+    Cells can be changed with set_row_item (which is what toggling does), but
+    not by assigning to the rows directly.
+    
+    Without PyGTK's GenericTreeModel this falls back to an ordinary ListStore,
+    with every row made up front.
+    
+    A sort model would ask for every row as soon as the table is populated, so
+    if the table is sortable, the model sorts its own items instead (see
+    VirtualListModel.sort).  The rows are only all made when the table is
+    populated with a sort column set, or when the user clicks on a column
+    header.
+    
+    See the TableBase documentation for the other parameters
+
+    """
+    
+    def __init__(self, treeview, coltypes, colnames, row_callback, values=[],
+            filters=None, filter_types=None, callbacks={}, flags={}):
+        self.row_callback = row_callback
+        
+        # Without a VirtualListModel, the ListStore is sorted like any other
+        self.sort_items = (HAS_GENERIC_TREE_MODEL and
+            flags.get("sortable", False))
+        
+        flags = flags.copy()
+        if self.sort_items:
+            flags["sortable"] = False
+        
+        TableBase.__init__(self, treeview, coltypes, colnames, [], filters, 
+            filter_types, callbacks, flags)
+        
+        if self.sort_items:
+            for (index, column) in enumerate(self.treeview.get_columns()):
+                column.set_clickable(True)
+                column.connect("clicked", self.__column_clicked, index)
+            self.update_sort_indicators()
+        
+        if len(values) > 0:
+            self.populate(values)
+    
+    def get_store(self, coltypes):
+        if HAS_GENERIC_TREE_MODEL:
+            return VirtualListModel(coltypes, self.row_callback)
+        return gtk.ListStore(*coltypes)
+
+    def insert_rows(self, items):
+        if not HAS_GENERIC_TREE_MODEL:
+            for item in items:
+                self.data.append(self.row_callback(item))
+        elif self.filter is None:
+            self.data.extend(items)
+        else:
+            for item in items:
+                self.data.append(item)
+
+    def populate(self, values):
+        if not self.sort_items or self.sort_column < 0:
+            TableBase.populate(self, values)
+            return
+        
+        # The new items have to be sorted in with the others
+        self.detach_model()
+        try:
+            self.insert_rows(values)
+            self.data.sort(self.sort_column,
+                self.sort_order == gtk.SORT_DESCENDING)
+        finally:
+            self.attach_model()
+
+    def update_sort_indicators(self):
+        for (index, column) in enumerate(self.treeview.get_columns()):
+            column.set_sort_indicator(index == self.sort_column)
+            column.set_sort_order(self.sort_order)
+
+    def __column_clicked(self, column, index):
+        if (index == self.sort_column and
+                self.sort_order == gtk.SORT_ASCENDING):
+            self.sort_order = gtk.SORT_DESCENDING
+        else:
+            self.sort_order = gtk.SORT_ASCENDING
+        self.sort_column = index
+        
+        self.detach_model()
+        try:
+            self.data.sort(self.sort_column,
+                self.sort_order == gtk.SORT_DESCENDING)
+        finally:
+            self.attach_model()
+        
+        self.update_sort_indicators()
+
+    def clear(self):
+        if HAS_GENERIC_TREE_MODEL:
+            # Dropping the model is much quicker than deleting every row
+            self.detach_model()
+            self.data = self.get_store(self.coltypes)
+            self.attach_model()
+        else:
+            TableBase.clear(self)
+
+    def toggled_cb(self, cell, path, column):
+        realpath = self._realpath(path)
+        self.set_row_item(realpath[0], column,
+            not self.data[realpath][column])
+        if "row-toggled" in self.callbacks:
+            self.callbacks["row-toggled"](self.data[realpath], column)
+
+    def remove(self, index):
+        if HAS_GENERIC_TREE_MODEL:
+            self.data.remove(index)
+        else:
+            TableBase.remove(self, index)
+
+    def set_row(self, index, row):
+        for column in range(len(row)):
+            self.set_row_item(index, column, row[column])
+
+    def update_item(self, index, item):
+        """
+        Replaces the item at the given index, or redraws its row if the item
+        itself has changed.
+        
+        """
+        
+        if HAS_GENERIC_TREE_MODEL:
+            self.data.set_item(index, item)
+        else:
+            TableBase.set_row(self, index, self.row_callback(item))
+
+    def set_row_item(self, row, column, val):
+        if HAS_GENERIC_TREE_MODEL:
+            self.data.set_cell(row, column, val)
+        else:
+            TableBase.set_row_item(self, row, column, val)
+
 class ComboBox:
     def __init__(self, cb, items=None):
     
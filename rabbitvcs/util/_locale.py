@@ -9,7 +9,7 @@ log = Log("rabbitvcs.util.locale")
 
 def initialize_locale():
     try:
-        settings = rabbitvcs.util.settings.SettingsManager()
+        settings = rabbitvcs.util.settings.get_settings()
 
         sane_default = locale.getdefaultlocale(['LANG', 'LANGUAGE'])
 
@@ -38,7 +38,7 @@ else:
 from rabbitvcs.vcs import create_vcs_instance, VCS_SVN, VCS_GIT, VCS_DUMMY, VCS_MERCURIAL
 from rabbitvcs.util.log import Log
 from rabbitvcs import gettext
-from rabbitvcs.util.settings import SettingsManager
+from rabbitvcs.util.settings import get_settings
 import rabbitvcs.util.helper
 
 # Yes, * imports are bad. You write it out then.
@@ -47,8 +47,6 @@ from contextmenuitems import *
 log = Log("rabbitvcs.util.contextmenu")
 _ = gettext.gettext
 
-settings = SettingsManager()
-
 class MenuBuilder(object):
     """
     Generalised menu builder class. Subclasses must provide:
@@ -234,6 +232,11 @@ class GtkContextMenuCaller:
         if callback is None:
             callback = self.on_context_menu_command_finished
 
+        if hasattr(proc, "add_exit_callback"):
+            # The UI host tells us when its windows close
+            proc.add_exit_callback(callback)
+            return
+
         def is_process_still_alive():
             log.debug("is_process_still_alive() for pid: %i" % proc.pid)
             # First we need to see if the process is still running
@@ -338,6 +341,39 @@ class ContextMenuCallbacks:
             
         gobject.idle_add(add_emblem_dialog)
     
+    def debug_metrics(self, widget, data1=None, data2=None):
+        def show_metrics_dialog():
+            from subprocess import Popen
+            from rabbitvcs.services.checkerservice import format_metrics
+            
+            snapshot = self.caller.status_checker.get_metrics()
+            if snapshot is None:
+                text = "The status checker could not be reached"
+            else:
+                text = format_metrics(snapshot)
+            
+            path = rabbitvcs.util.helper.get_tmp_path("checker-metrics.txt")
+            metrics_file = open(path, "w")
+            metrics_file.write(text)
+            metrics_file.close()
+            
+            command = ["zenity", "--text-info", "--title=RabbitVCS Checker Metrics",
+                       "--width=800", "--height=600", "--filename=%s" % path]
+            proc = Popen(command)
+            self.caller.execute_after_process_exit(proc, lambda: os.remove(path))
+            return False
+        
+        gobject.idle_add(show_metrics_dialog)
+    
+    def debug_profiler(self, widget, data1=None, data2=None):
+        status_checker = self.caller.status_checker
+        snapshot = status_checker.get_metrics()
+        if snapshot is None:
+            return
+        
+        running = status_checker.set_profiling("profile" not in snapshot)
+        log.debug("Checker profiler running: %s" % running)
+    
     # End debugging callbacks
 
     def checkout(self, widget, data1=None, data2=None):
@@ -456,8 +492,7 @@ class ContextMenuCallbacks:
         rabbitvcs.util.helper.launch_ui_window("about")
         
     def settings(self, widget, data1=None, data2=None):
-        proc = rabbitvcs.util.helper.launch_ui_window("settings", [self.base_dir])
-        self.caller.reload_settings(proc)
+        rabbitvcs.util.helper.launch_ui_window("settings", [self.base_dir])
 
     def ignore_by_filename(self, widget, data1=None, data2=None):
         path = self.paths[0]
@@ -910,7 +945,7 @@ class ContextMenuConditions:
             not self.path_dict["is_in_a_or_a_working_copy"])
     
     def debug(self, data=None):
-        return settings.get("general", "show_debug")
+        return get_settings().get("general", "show_debug")
     
     def separator(self, data=None):
         return True
@@ -1275,7 +1310,9 @@ class MainContextMenu:
                 (MenuRefreshStatus, None),
                 (MenuDebugRevert, None),
                 (MenuDebugInvalidate, None),
-                (MenuDebugAddEmblem, None)
+                (MenuDebugAddEmblem, None),
+                (MenuDebugMetrics, None),
+                (MenuDebugProfiler, None)
             ]),
             (MenuUpdate, None),
             (MenuCommit, None),
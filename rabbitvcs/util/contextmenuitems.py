@@ -340,6 +340,20 @@ class MenuDebugAddEmblem(MenuItem):
     icon = "rabbitvcs-emblems"
     condition_name = "debug"
 
+class MenuDebugMetrics(MenuItem):
+    identifier = "RabbitVCS::Debug_Metrics"
+    label = _("Checker Metrics")
+    tooltip = _("Show the status checker's timings and counters")
+    icon = "rabbitvcs-dbus"
+    condition_name = "debug"
+
+class MenuDebugProfiler(MenuItem):
+    identifier = "RabbitVCS::Debug_Profiler"
+    label = _("Toggle Checker Profiler")
+    tooltip = _("Start or stop sampling what the status checker is doing")
+    icon = "rabbitvcs-run"
+    condition_name = "debug"
+
 class MenuCheckout(MenuItem):
     identifier = "RabbitVCS::Checkout"
     label = _("Checkout...")
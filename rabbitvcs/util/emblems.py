@@ -0,0 +1,159 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+
+Coalesces the status replies that the file manager extensions receive from the
+checker service, so that each item is only redrawn once per main loop frame
+regardless of how many replies came in for it.
+
+"""
+
+import time
+
+try:
+    from gi.repository import GObject as gobject
+except ImportError:
+    import gobject
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.util.emblems")
+
+class EmblemUpdater:
+    """
+    Collects statuses as they arrive from the status checker and invalidates
+    the corresponding file manager items in batches from an idle handler.
+
+    Statuses are keyed by path, so a newer status for a path simply replaces
+    an older one that hasn't been drawn yet. Once an item has been invalidated,
+    the file manager calls back into update_file_info, which should use take()
+    to pick up the status that triggered it.
+
+    """
+
+    #: The maximum number of items we invalidate in a single main loop frame
+    BATCH_SIZE = 200
+
+    #: How long (in seconds) a status is held for update_file_info. The file
+    #: manager doesn't call it for items that have left the view, so statuses
+    #: that haven't been picked up by then are dropped.
+    READY_TIMEOUT = 30
+
+    def __init__(self, invalidate, batch_size=None):
+        """
+        @param  invalidate: Called with a path and should invalidate the file
+                            manager item for that path. Should return False if
+                            the path is no longer known.
+        @type   invalidate: callable
+
+        @param  batch_size: The maximum number of items to invalidate per frame
+        @type   batch_size: integer
+
+        """
+        self.invalidate = invalidate
+
+        if batch_size is not None:
+            self.BATCH_SIZE = batch_size
+
+        # Statuses that have been received but not yet drawn
+        self.pending = {}
+
+        # (status, time) tuples for the items that have been invalidated and
+        # are waiting to be picked up by update_file_info
+        self.ready = {}
+
+        self.scheduled = False
+
+    def push(self, status):
+        """
+        Queue a status to be drawn. Any status for the same path that hasn't
+        been drawn yet is dropped.
+
+        """
+        self.pending[status.path] = status
+
+        if not self.scheduled:
+            self.scheduled = True
+            gobject.idle_add(self.flush)
+
+    def take(self, path):
+        """
+        Returns the status received for the given path, if the item is being
+        updated because of a reply from the status checker. Otherwise returns
+        None.
+
+        """
+        entry = self.ready.pop(path, None)
+        if entry is None:
+            return None
+        
+        return entry[0]
+
+    def discard(self, path):
+        """
+        Forget about any status we are holding for the given path.
+
+        """
+        self.pending.pop(path, None)
+        self.ready.pop(path, None)
+
+    def flush(self):
+        """
+        Invalidate the items for up to BATCH_SIZE pending statuses. This is
+        used as an idle handler, and returns True while there is more to do.
+
+        """
+        now = time.time()
+        self.expire(now)
+
+        count = 0
+        while self.pending and count < self.BATCH_SIZE:
+            (path, status) = self.pending.popitem()
+            count += 1
+
+            # NOTE! The file manager may call update_file_info from WITHIN the
+            # invalidate call, so the status must be ready before we make it.
+            self.ready[path] = (status, now)
+
+            try:
+                if not self.invalidate(path):
+                    del self.ready[path]
+                    log.debug("Path [%s] not found in file table" % path)
+            except Exception, ex:
+                self.ready.pop(path, None)
+                log.exception(ex)
+
+        self.scheduled = bool(self.pending)
+        return self.scheduled
+
+    def expire(self, now=None):
+        """
+        Drop the statuses that have been waiting for update_file_info for
+        longer than READY_TIMEOUT seconds.
+
+        """
+        if now is None:
+            now = time.time()
+
+        for (path, (status, since)) in self.ready.items():
+            if now - since > self.READY_TIMEOUT:
+                del self.ready[path]
@@ -0,0 +1,190 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+
+Matches paths against the folders the user has excluded (one per line in the
+exclude_paths file in our home folder).  Everything in an excluded folder is
+left alone, which is mostly used for slow network mounts.
+
+"""
+
+import os
+import time
+import threading
+from fnmatch import fnmatchcase
+
+from rabbitvcs.util.helper import get_exclude_paths, get_exclude_paths_path, \
+    get_file_stamp
+
+#: The most often (in seconds) that the exclude_paths file is looked at to see
+#: if it has changed
+CHECK_INTERVAL = 2
+
+GLOB_CHARACTERS = "*?["
+
+class _Node(object):
+    __slots__ = ("children", "globs", "excluded")
+
+    def __init__(self):
+        # Path components to nodes
+        self.children = {}
+
+        # (glob pattern, node) pairs for components with wildcards
+        self.globs = []
+
+        # Whether a pattern ends here, ie. this folder is excluded
+        self.excluded = False
+
+class ExcludeMatcher:
+    """
+    The excluded paths compiled into a tree of path components, so checking
+    a path costs one dictionary lookup per component of the path, rather than
+    a comparison with every excluded path.
+
+    Each pattern excludes a folder (or file) and everything in it.  A
+    component of a pattern may contain shell wildcards (*, ? and [...]),
+    which match within that component only.
+
+    >>> matcher = ExcludeMatcher(["/home/a/src", "/mnt/*/backup", ""])
+    >>> matcher.matches("/home/a/src")
+    True
+    >>> matcher.matches("/home/a/src/project/file.c")
+    True
+    >>> matcher.matches("/home/a/src2")
+    False
+    >>> matcher.matches("/mnt/nfs/backup/2010")
+    True
+    >>> matcher.matches("/mnt/nfs/other")
+    False
+    >>> matcher.matches("/home/a/src/")
+    True
+    >>> matcher.matches("/home/a/src2/../src/file.c")
+    True
+
+    """
+
+    def __init__(self, patterns):
+        self.root = _Node()
+        self.empty = True
+
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            return
+
+        pattern = os.path.normpath(os.path.expanduser(pattern))
+        if not os.path.isabs(pattern):
+            return
+
+        node = self.root
+        for component in self.split(pattern):
+            if [c for c in GLOB_CHARACTERS if c in component]:
+                for (glob, child) in node.globs:
+                    if glob == component:
+                        break
+                else:
+                    child = _Node()
+                    node.globs.append((component, child))
+            else:
+                child = node.children.get(component)
+                if child is None:
+                    child = node.children[component] = _Node()
+            node = child
+
+        node.excluded = True
+        self.empty = False
+
+    def split(self, path):
+        return [component for component in path.split(os.sep) if component]
+
+    def matches(self, path):
+        """
+        Returns True if the given absolute path is, or is inside, one of the
+        excluded paths.
+
+        """
+
+        if self.empty:
+            return False
+
+        nodes = [self.root]
+        for component in self.split(os.path.normpath(path)):
+            next_nodes = []
+            for node in nodes:
+                if node.excluded:
+                    return True
+
+                child = node.children.get(component)
+                if child is not None:
+                    next_nodes.append(child)
+
+                for (glob, child) in node.globs:
+                    if fnmatchcase(component, glob):
+                        next_nodes.append(child)
+
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+
+        for node in nodes:
+            if node.excluded:
+                return True
+
+        return False
+
+_matcher = None
+_stamp = None
+_last_check = 0
+_lock = threading.Lock()
+
+def get_exclude_matcher():
+    """
+    Returns the ExcludeMatcher for the exclude_paths file, compiling it again
+    if the file has changed.  The file is looked at no more than once every
+    CHECK_INTERVAL seconds.
+
+    @rtype:     ExcludeMatcher
+    @return:    The matcher for the user's excluded paths.
+
+    """
+
+    global _matcher, _stamp, _last_check
+
+    now = time.time()
+    if _matcher is not None and now - _last_check < CHECK_INTERVAL:
+        return _matcher
+
+    _lock.acquire()
+    try:
+        _last_check = now
+        stamp = get_file_stamp(get_exclude_paths_path())
+        if _matcher is None or stamp != _stamp:
+            _matcher = ExcludeMatcher(get_exclude_paths())
+            _stamp = stamp
+    finally:
+        _lock.release()
+
+    return _matcher
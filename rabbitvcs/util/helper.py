@@ -41,11 +41,6 @@ import hashlib
 import urllib
 import urlparse
 
-try:
-    from gi.repository import GObject as gobject
-except ImportError:
-    import gobject
-
 import rabbitvcs.util.settings
 
 from rabbitvcs.util.log import Log
@@ -274,6 +269,18 @@ def get_previous_messages():
     
     return returner
 
+def get_file_stamp(path):
+    """
+    Returns something that changes whenever the given file (or folder) is
+    modified or replaced, or None if it doesn't exist.
+    
+    """
+    try:
+        st = os.stat(path)
+        return (st.st_mtime, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
 def get_exclude_paths_path():
     return os.path.join(get_home_folder(), "exclude_paths")
 
@@ -382,7 +389,7 @@ def get_diff_tool():
     @return:    A dictionary with the diff tool path and swap boolean value.
     """
     
-    sm = rabbitvcs.util.settings.SettingsManager()
+    sm = rabbitvcs.util.settings.get_settings()
     diff_tool = sm.get("external", "diff_tool")
     diff_tool_swap = sm.get("external", "diff_tool_swap")
     
@@ -619,10 +626,24 @@ def launch_ui_window(filename, args=[], block=False):
     @type   args:       list
     @param  args:       A list of arguments to be passed to the window.
     
-    @rtype:             integer
-    @return:            The pid of the process (if launched)
+    If the "use_ui_host" setting is on, windows that support it are opened by
+    the UI host service instead (see rabbitvcs.services.uihostservice), which
+    saves starting a new interpreter. In that case the returned object only
+    provides the pid, poll() and wait() of a subprocess.Popen object.
+    
+    @rtype:             subprocess.Popen
+    @return:            The process (if launched)
     """
     
+    if not block and use_ui_host():
+        from rabbitvcs.services.uihostservice import get_ui_host, HOSTED_WINDOWS
+        if filename in HOSTED_WINDOWS:
+            proc = get_ui_host().open_window(filename, args)
+            if proc is not None:
+                return proc
+            
+            log.debug("UI host unavailable, launching %s directly" % filename)
+    
     # Hackish.  Get's the helper module's path, then assumes it is in
     # the lib folder.  Removes the /lib part of the path.
     basedir, head = os.path.split(
@@ -653,12 +674,16 @@ def launch_ui_window(filename, args=[], block=False):
     else:
         return None
 
+def use_ui_host():
+    sm = rabbitvcs.util.settings.get_settings()
+    return bool(int(sm.get("general", "use_ui_host")))
+
 def get_log_messages_limit():
-    sm = rabbitvcs.util.settings.SettingsManager()
+    sm = rabbitvcs.util.settings.get_settings()
     return int(sm.get("cache", "number_messages"))
 
 def get_repository_paths_limit():
-    sm = rabbitvcs.util.settings.SettingsManager()
+    sm = rabbitvcs.util.settings.get_settings()
     return int(sm.get("cache", "number_repositories"))
 
 def get_common_directory(paths):
@@ -748,7 +773,7 @@ def get_relative_path(from_path, to_path):
     return os.sep.join(p)
 
 def launch_repo_browser(uri):
-    sm = rabbitvcs.util.settings.SettingsManager()
+    sm = rabbitvcs.util.settings.get_settings()
     repo_browser = sm.get("external", "repo_browser")
     
     if repo_browser is not None:
@@ -0,0 +1,212 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+
+Registration of the RabbitVCS action icons for the GTK3 file manager
+extensions (nautilus-3.0, nemo and caja).
+
+Nothing is loaded when the icons are registered. Each icon set only points at
+its files, and GTK reads them the first time an icon is actually drawn. Where
+possible it reads a PNG that has already been rasterized at menu size, rather
+than rendering the SVG again. Those PNGs are kept in the user's cache folder
+and are created in the background the first time the icons are registered.
+
+"""
+
+import os
+import os.path
+
+from gi.repository import GObject, Gtk, GdkPixbuf
+
+from rabbitvcs import get_icon_path
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.util.icons")
+
+#: The icons we register, relative to the icon theme folder
+RABBITVCS_ICONS = [
+    "scalable/actions/rabbitvcs-settings.svg",
+    "scalable/actions/rabbitvcs-export.svg",
+    "scalable/actions/rabbitvcs-properties.svg",
+    "scalable/actions/rabbitvcs-show_log.svg",
+    "scalable/actions/rabbitvcs-delete.svg",
+    "scalable/actions/rabbitvcs-run.svg",
+    "scalable/actions/rabbitvcs-unlock.svg",
+    "scalable/actions/rabbitvcs-dbus.svg",
+    "scalable/actions/rabbitvcs-rename.svg",
+    "scalable/actions/rabbitvcs-help.svg",
+    "scalable/actions/rabbitvcs-update.svg",
+    "scalable/actions/rabbitvcs-diff.svg",
+    "scalable/actions/rabbitvcs-resolve.svg",
+    "scalable/actions/rabbitvcs-about.svg",
+    "scalable/actions/rabbitvcs-add.svg",
+    "scalable/actions/rabbitvcs-changes.svg",
+    "scalable/actions/rabbitvcs-createpatch.svg",
+    "scalable/actions/rabbitvcs-merge.svg",
+    "scalable/actions/rabbitvcs-drive.svg",
+    "scalable/actions/rabbitvcs-stop.svg",
+    "scalable/actions/rabbitvcs-checkout.svg",
+    "scalable/actions/rabbitvcs-import.svg",
+    "scalable/actions/rabbitvcs-branch.svg",
+    "scalable/actions/rabbitvcs-refresh.svg",
+    "scalable/actions/rabbitvcs-editconflicts.svg",
+    "scalable/actions/rabbitvcs-monkey.svg",
+    "scalable/actions/rabbitvcs-applypatch.svg",
+    "scalable/actions/rabbitvcs-switch.svg",
+    "scalable/actions/rabbitvcs-lock.svg",
+    "scalable/actions/rabbitvcs-annotate.svg",
+    "scalable/actions/rabbitvcs-compare.svg",
+    "scalable/actions/rabbitvcs-revert.svg",
+    "scalable/actions/rabbitvcs-bug.svg",
+    "scalable/actions/rabbitvcs-cleanup.svg",
+    "scalable/actions/rabbitvcs-clear.svg",
+    "scalable/actions/rabbitvcs-unstage.svg",
+    "scalable/actions/rabbitvcs-emblems.svg",
+    "scalable/actions/rabbitvcs-relocate.svg",
+    "scalable/actions/rabbitvcs-reset.svg",
+    "scalable/actions/rabbitvcs-asynchronous.svg",
+    "scalable/actions/rabbitvcs-commit.svg",
+    "scalable/actions/rabbitvcs-checkmods.svg",
+    "scalable/apps/rabbitvcs.svg",
+    "scalable/apps/rabbitvcs-small.svg",
+    "16x16/actions/rabbitvcs-push.png"
+]
+
+#: The size we pre-rasterize icons at (ie. the menu icon size)
+ICON_SIZE = 16
+
+_registered = False
+
+def get_icon_cache_folder(size=ICON_SIZE):
+    """
+    Returns the folder we keep pre-rasterized icons of the given size in.
+
+    @rtype:     string
+    @return:    The location of the icon cache folder.
+
+    """
+
+    xdg_cache_home = os.environ.get(
+        "XDG_CACHE_HOME",
+        os.path.join(os.path.expanduser("~"), ".cache")
+    )
+
+    return os.path.join(xdg_cache_home, "rabbitvcs", "icons",
+                        "%ix%i" % (size, size))
+
+def get_rasterized_path(icon_path, size=ICON_SIZE):
+    """
+    Returns the location of the pre-rasterized version of an icon.
+
+    """
+
+    (root, ext) = os.path.splitext(os.path.basename(icon_path))
+    return os.path.join(get_icon_cache_folder(size), root + ".png")
+
+def is_rasterized(icon_path, size=ICON_SIZE):
+    """
+    Returns True if there is an up to date pre-rasterized version of an icon.
+
+    """
+
+    cached_path = get_rasterized_path(icon_path, size)
+    try:
+        return os.stat(cached_path).st_mtime >= os.stat(icon_path).st_mtime
+    except OSError:
+        return False
+
+def rasterize_icon(icon_path, size=ICON_SIZE):
+    """
+    Renders a single icon at the given size and saves it to the icon cache.
+
+    """
+
+    cached_path = get_rasterized_path(icon_path, size)
+    folder = os.path.dirname(cached_path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder, 0700)
+
+    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon_path, size, size)
+    pixbuf.savev(cached_path, "png", [], [])
+
+def register_icons():
+    """
+    Registers the RabbitVCS icons with GTK, if that hasn't been done already.
+    This is cheap to call, so it should be called right before the icons are
+    needed (eg. when building a menu) rather than at start up.
+
+    """
+
+    global _registered
+    if _registered:
+        return
+    _registered = True
+
+    factory = Gtk.IconFactory()
+    to_rasterize = []
+
+    icon_folder = get_icon_path()
+    for rel_icon_path in RABBITVCS_ICONS:
+        icon_path = os.path.join(icon_folder, rel_icon_path)
+        (root, ext) = os.path.splitext(os.path.basename(rel_icon_path))
+
+        iconset = Gtk.IconSet.new()
+
+        if ext == ".svg":
+            if is_rasterized(icon_path):
+                source = Gtk.IconSource.new()
+                source.set_filename(get_rasterized_path(icon_path))
+                source.set_size(Gtk.IconSize.MENU)
+                source.set_size_wildcarded(False)
+                iconset.add_source(source)
+            else:
+                to_rasterize.append(icon_path)
+
+        # The original file is used for any other size, or if we have not
+        # rasterized it yet
+        source = Gtk.IconSource.new()
+        source.set_filename(icon_path)
+        iconset.add_source(source)
+
+        factory.add(root, iconset)
+
+    factory.add_default()
+
+    if to_rasterize:
+        GObject.idle_add(_rasterize_icons, to_rasterize,
+                         priority=GObject.PRIORITY_LOW)
+
+def _rasterize_icons(icon_paths):
+    """
+    Idle handler that rasterizes one icon at a time, so that the next start
+    up does not need to render any SVGs for the menus.
+
+    """
+
+    icon_path = icon_paths.pop()
+    try:
+        rasterize_icon(icon_path)
+    except Exception, e:
+        log.debug("Unable to rasterize %s: %s" % (icon_path, e))
+
+    return len(icon_paths) > 0
@@ -37,15 +37,25 @@ Usage:
 
     log = Log("my.module")
     log.debug("a debug message")
+    log.debug("checked %s in %.3f seconds", path, duration)
+
+Messages for files and the console are written by a background thread (see
+LogWriter), so logging never waits for the disk or the terminal.  Passing
+arguments separately, as in the last line, means the message is only
+formatted if it is going to be written, and by the background thread.
 
 """
 
 import os
+import time
+import atexit
+import threading
 from os.path import expanduser
+from Queue import Queue, Empty, Full
 import logging
 import logging.handlers
 
-from rabbitvcs.util.settings import SettingsManager, get_home_folder
+from rabbitvcs.util.settings import get_settings, get_home_folder
 
 LEVELS = {
     "debug":    logging.DEBUG,
@@ -55,7 +65,7 @@ LEVELS = {
     "critical": logging.CRITICAL
 }
 
-settings = SettingsManager()
+settings = get_settings()
 DEFAULT_LEVEL = settings.get("logging", "level").lower()
 DEFAULT_LOG_TYPE = settings.get("logging", "type")
 
@@ -80,6 +90,218 @@ DEFAULT_FORMAT = "%(message)s"
 FILE_FORMAT = "%(asctime)s %(levelname)s\t%(name)s\t%(message)s"
 CONSOLE_FORMAT = "%(levelname)s\t%(name)s\t%(message)s"
 
+#: The most messages waiting to be written.  Once the writer is this far
+#: behind, new messages are dropped (and counted) rather than making the
+#: thread that is logging wait.
+MAX_QUEUED = 10000
+
+#: The most times the same message (from the same logger, at the same level)
+#: is written every RATE_PERIOD seconds.  Any more are counted, and the count
+#: is written once the period is over.
+RATE_LIMIT = 20
+RATE_PERIOD = 10
+
+#: The most distinct messages that are rate limited at once
+MAX_RATES = 1000
+
+class LogWriter(threading.Thread):
+    """
+    Writes the messages queued by AsyncHandlers from a background thread,
+    and keeps repeated messages from flooding the log.
+    
+    """
+    
+    def __init__(self, maxsize=MAX_QUEUED):
+        threading.Thread.__init__(self)
+        self.setName("RabbitVCS log writer")
+        self.setDaemon(True)
+        
+        self.queue = Queue(maxsize)
+        self.lock = threading.Lock()
+        
+        # Target handlers and message keys (see get_key) to [period start, count, suppressed
+        # count, target handler, last record]
+        self.rates = {}
+        self.last_sweep = time.time()
+        
+        self.dropped = 0
+    
+    def get_key(self, record):
+        msg = record.msg
+        if not isinstance(msg, basestring):
+            # Eg. log.debug(e), which is keyed on the type of exception
+            msg = msg.__class__
+        
+        return (record.name, record.levelno, msg)
+    
+    def submit(self, target, record):
+        """
+        Queues a record to be written by the given handler, unless it is
+        being rate limited or the queue is full.  This never blocks.
+        
+        """
+        
+        key = (target, ) + self.get_key(record)
+        now = time.time()
+        
+        self.lock.acquire()
+        try:
+            rate = self.rates.get(key)
+            if rate is None:
+                if len(self.rates) < MAX_RATES:
+                    self.rates[key] = [now, 1, 0, target, record]
+            elif now - rate[0] < RATE_PERIOD:
+                rate[1] += 1
+                if rate[1] > RATE_LIMIT:
+                    rate[2] += 1
+                    rate[4] = record
+                    return
+            else:
+                if rate[2]:
+                    self.put(rate[3], self.make_suppressed_record(rate))
+                self.rates[key] = [now, 1, 0, target, record]
+            
+            self.put(target, record)
+        finally:
+            self.lock.release()
+    
+    def put(self, target, record):
+        try:
+            self.queue.put_nowait((target, record))
+        except Full:
+            self.dropped += 1
+    
+    def run(self):
+        while True:
+            try:
+                (target, record) = self.queue.get(timeout=RATE_PERIOD)
+            except Empty:
+                target = None
+            
+            if target is not None:
+                target.handle(record)
+                self.queue.task_done()
+                
+                if self.dropped:
+                    self.lock.acquire()
+                    dropped = self.dropped
+                    self.dropped = 0
+                    self.lock.release()
+                    
+                    target.handle(self.make_record(record, logging.WARNING,
+                        "%d log messages were dropped", dropped))
+            
+            if time.time() - self.last_sweep >= RATE_PERIOD:
+                self.sweep()
+    
+    def sweep(self):
+        """
+        Forgets the messages whose rate limiting period is over, and writes
+        how many times they were suppressed.
+        
+        """
+        
+        now = time.time()
+        self.last_sweep = now
+        
+        suppressed = []
+        self.lock.acquire()
+        try:
+            for (key, rate) in self.rates.items():
+                if now - rate[0] >= RATE_PERIOD:
+                    del self.rates[key]
+                    if rate[2]:
+                        suppressed.append(rate)
+        finally:
+            self.lock.release()
+        
+        for rate in suppressed:
+            rate[3].handle(self.make_suppressed_record(rate))
+    
+    def make_suppressed_record(self, rate):
+        record = rate[4]
+        return self.make_record(record, record.levelno,
+            "%d more like the last message were suppressed", rate[2])
+    
+    def make_record(self, record, level, msg, *args):
+        return logging.LogRecord(record.name, level, record.pathname,
+            record.lineno, msg, args, None)
+    
+    def flush(self, timeout=2):
+        """
+        Waits (for up to timeout seconds) for the queued messages to be
+        written.
+        
+        """
+        
+        end = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < end:
+            time.sleep(0.01)
+
+class AsyncHandler(logging.Handler):
+    """
+    Passes records to the LogWriter to be written by the target handler in
+    the background.  Records are formatted by the target handler.
+    
+    """
+    
+    def __init__(self, target):
+        logging.Handler.__init__(self)
+        self.target = target
+    
+    def emit(self, record):
+        get_writer().submit(self.target, record)
+
+_writer = None
+_targets = {}
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """
+    Returns the LogWriter for this process, starting it if need be.
+    
+    """
+    
+    global _writer
+    
+    if _writer is None:
+        _writer_lock.acquire()
+        try:
+            if _writer is None:
+                writer = LogWriter()
+                writer.start()
+                atexit.register(writer.flush)
+                _writer = writer
+        finally:
+            _writer_lock.release()
+    
+    return _writer
+
+def get_target_handler(kind):
+    """
+    Returns the handler that AsyncHandlers of the given kind ("file" or
+    "console") write to.  There is only one of each per process, however
+    many logs there are.
+    
+    """
+    
+    _writer_lock.acquire()
+    try:
+        if kind not in _targets:
+            if kind == "file":
+                handler = logging.handlers.TimedRotatingFileHandler(
+                    LOG_PATH, "D", 1, 7, "utf-8")
+                handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            else:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            
+            _targets[kind] = handler
+        
+        return _targets[kind]
+    finally:
+        _writer_lock.release()
+
 class BaseLog:
     """
     Provides a wrapper around the logging module to simplify some logging tasks.
@@ -105,7 +327,7 @@ class BaseLog:
         self.level = level
         self.logger.setLevel(LEVELS[level])
     
-    def debug(self, msg=""):
+    def debug(self, msg="", *args):
         """
         Pass a debug level log message (Numeric value: 10)
         
@@ -114,9 +336,9 @@ class BaseLog:
         
         """
         
-        self.logger.debug(msg)
+        self.logger.debug(msg, *args)
     
-    def info(self, msg=""):
+    def info(self, msg="", *args):
         """
         Pass an info level log message (Numeric value: 20)
         
@@ -125,9 +347,9 @@ class BaseLog:
         
         """
         
-        self.logger.info(msg)
+        self.logger.info(msg, *args)
     
-    def warning(self, msg=""):
+    def warning(self, msg="", *args):
         """
         Pass a warning level log message (Numeric value: 30)
         
@@ -136,9 +358,9 @@ class BaseLog:
         
         """
         
-        self.logger.warning(msg)
+        self.logger.warning(msg, *args)
         
-    def error(self, msg=""):
+    def error(self, msg="", *args):
         """
         Pass an error level log message (Numeric value: 40)
         
@@ -147,9 +369,9 @@ class BaseLog:
         
         """
         
-        self.logger.error(msg)
+        self.logger.error(msg, *args)
     
-    def critical(self, msg=""):
+    def critical(self, msg="", *args):
         """
         Pass a critical level log message (Numeric value: 50)
         
@@ -158,9 +380,9 @@ class BaseLog:
         
         """
         
-        self.logger.critical(msg)
+        self.logger.critical(msg, *args)
 
-    def exception(self, msg=""):
+    def exception(self, msg="", *args):
         """
         Pass a exception level log message (Numeric value: 50)
         
@@ -169,7 +391,7 @@ class BaseLog:
         
         """
         
-        self.logger.exception(msg)
+        self.logger.exception(msg, *args)
     
     def exception_info(self, msg, exc_info):
         """
@@ -197,6 +419,19 @@ class BaseLog:
         self.handler.setLevel(LEVELS[self.level])
         self.handler.setFormatter(logging.Formatter(format))
         self.logger.addHandler(self.handler)
+    
+    def set_async_handler(self, kind):
+        """
+        Have the log messages written in the background (see LogWriter).
+        
+        @type   kind: string
+        @param  kind: Where to write the messages ("file" or "console")
+        
+        """
+        
+        self.handler = AsyncHandler(get_target_handler(kind))
+        self.handler.setLevel(LEVELS[self.level])
+        self.logger.addHandler(self.handler)
 
 class ConsoleLog(BaseLog):
     """
@@ -221,7 +456,7 @@ class ConsoleLog(BaseLog):
         """
         
         BaseLog.__init__(self, logger, level)
-        self.set_handler(logging.StreamHandler(), CONSOLE_FORMAT)
+        self.set_async_handler("console")
 
 class FileLog(BaseLog):
     """
@@ -246,10 +481,7 @@ class FileLog(BaseLog):
         """
 
         BaseLog.__init__(self, logger, level)
-        self.set_handler(
-            logging.handlers.TimedRotatingFileHandler(LOG_PATH, "D", 1, 7, "utf-8"), 
-            FILE_FORMAT
-        )
+        self.set_async_handler("file")
 
 class DualLog(BaseLog):
     """
@@ -275,11 +507,8 @@ class DualLog(BaseLog):
         """
         
         BaseLog.__init__(self, logger, level)
-        self.set_handler(
-            logging.handlers.TimedRotatingFileHandler(LOG_PATH, "D", 1, 7, "utf-8"), 
-            FILE_FORMAT
-        )
-        self.set_handler(logging.StreamHandler(), CONSOLE_FORMAT)
+        self.set_async_handler("file")
+        self.set_async_handler("console")
 
 class NullHandler(logging.Handler):
     """
@@ -311,11 +540,11 @@ elif DEFAULT_LOG_TYPE == "Both":
     
 def reload_log_settings():
     """
-    Refreshes the settings manager and returns a new log instance
+    Returns the log class for the current settings
     
     """
     
-    settings = SettingsManager()
+    settings = get_settings()
     DEFAULT_LEVEL = settings.get("logging", "level").lower()
     DEFAULT_LOG_TYPE = settings.get("logging", "type")
     
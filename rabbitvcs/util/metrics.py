@@ -0,0 +1,365 @@
+#
+# This is an extension to the Nautilus file manager to allow better
+# integration with the Subversion source control system.
+#
+# Copyright (C) 2006-2008 by Jason Field <jason@jasonfield.com>
+# Copyright (C) 2007-2008 by Bruce van der Kooij <brucevdkooij@gmail.com>
+# Copyright (C) 2008-2010 by Adam Plumb <adamplumb@gmail.com>
+#
+# RabbitVCS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RabbitVCS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with RabbitVCS;  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+
+Lightweight instrumentation for long running processes (ie. the checker
+service). Timings are kept as histograms rather than individual samples, so
+recording them costs about the same as a dictionary lookup and the memory used
+does not grow with the number of calls.
+
+Everything is recorded in the process wide Metrics object returned by
+get_metrics(), and a snapshot of it can be turned into JSON as is.
+
+"""
+
+import os
+import sys
+import time
+import threading
+
+from rabbitvcs.util.log import Log
+log = Log("rabbitvcs.util.metrics")
+
+#: The upper bounds (in milliseconds) of the histogram buckets. The last
+#: bucket takes everything slower than that.
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+class Histogram:
+    """
+    Counts how many durations fell into each of the BUCKETS, along with the
+    total, fastest and slowest durations.
+
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, duration):
+        """
+        @type   duration: float
+        @param  duration: The duration in milliseconds
+
+        """
+        index = 0
+        for bound in BUCKETS:
+            if duration <= bound:
+                break
+            index += 1
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total += duration
+
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket that the given fraction of the
+        durations fell into (or the slowest duration, for the last bucket).
+
+        """
+        if not self.count:
+            return 0.0
+
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                if index < len(BUCKETS):
+                    return float(min(BUCKETS[index], self.max))
+                break
+
+        return self.max
+
+    def snapshot(self):
+        mean = 0.0
+        if self.count:
+            mean = self.total / self.count
+
+        return {
+            "count": self.count,
+            "mean": round(mean, 3),
+            "min": round(self.min or 0.0, 3),
+            "max": round(self.max or 0.0, 3),
+            "p50": round(self.percentile(0.5), 3),
+            "p90": round(self.percentile(0.9), 3),
+            "p99": round(self.percentile(0.99), 3),
+            "buckets": self.counts[:]
+        }
+
+class Metrics:
+    """
+    A thread safe collection of named timings, counters and gauges.
+
+    Gauges are functions that are only called when a snapshot is taken, so
+    they are a cheap way to report things like queue lengths.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def record(self, name, duration):
+        """
+        Adds a duration to the timing histogram of the given name.
+
+        @type   name: string
+        @param  name: The name of the timing (eg. "dbus.CheckStatus")
+
+        @type   duration: float
+        @param  duration: The duration in seconds (ie. the difference between
+                          two time.time() calls)
+
+        """
+        self.lock.acquire()
+        try:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(duration * 1000.0)
+        finally:
+            self.lock.release()
+
+    def increment(self, name, amount=1):
+        self.lock.acquire()
+        try:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        finally:
+            self.lock.release()
+
+    def set_gauge(self, name, func):
+        """
+        @type   name: string
+        @param  name: The name of the gauge
+
+        @type   func: callable
+        @param  func: Called without arguments whenever a snapshot is taken,
+                      and should return a number
+
+        """
+        self.gauges[name] = func
+
+    def snapshot(self):
+        """
+        Returns everything recorded so far as a dictionary of plain types.
+
+        """
+        self.lock.acquire()
+        try:
+            timings = dict([(name, histogram.snapshot())
+                for name, histogram in self.timings.items()])
+            counters = self.counters.copy()
+        finally:
+            self.lock.release()
+
+        gauges = {}
+        for name, func in self.gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception, e:
+                log.debug("Unable to read gauge %s: %s" % (name, e))
+                gauges[name] = None
+
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "buckets": BUCKETS,
+            "timings": timings,
+            "counters": counters,
+            "gauges": gauges
+        }
+
+    def reset(self):
+        """
+        Forgets all of the timings and counters (but not the gauges).
+
+        """
+        self.lock.acquire()
+        try:
+            self.started = time.time()
+            self.timings = {}
+            self.counters = {}
+        finally:
+            self.lock.release()
+
+_metrics = Metrics()
+
+def get_metrics():
+    """
+    Returns the Metrics object for this process.
+
+    """
+    return _metrics
+
+def hit_rate(counters, name):
+    """
+    Returns the fraction of lookups that were hits, for counters named
+    "<name>.hit" and "<name>.miss".
+
+    """
+    hits = counters.get(name + ".hit", 0)
+    total = hits + counters.get(name + ".miss", 0)
+    if not total:
+        return None
+
+    return float(hits) / total
+
+def count_child_processes(pid=None):
+    """
+    Returns the number of processes that are currently children of the given
+    process (this one by default), eg. git or ssh commands run by a backend.
+
+    """
+    if pid is None:
+        pid = os.getpid()
+
+    count = 0
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+
+        try:
+            stat = open(os.path.join("/proc", entry, "stat")).read()
+        except IOError:
+            continue
+
+        # The command name is in brackets and may contain spaces, the parent
+        # pid is the second field after it
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 1 and fields[1] == str(pid):
+            count += 1
+
+    return count
+
+class SamplingProfiler(threading.Thread):
+    """
+    Periodically looks at what a thread (the main thread by default) is doing,
+    and counts the functions it finds there. Unlike cProfile this costs the
+    profiled thread next to nothing, so it can be switched on in a process
+    that is already misbehaving.
+
+    """
+
+    #: Seconds between samples
+    INTERVAL = 0.005
+
+    def __init__(self, thread_id=None, interval=None):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+
+        if thread_id is None:
+            thread_id = threading.currentThread().ident
+        self.thread_id = thread_id
+
+        if interval is not None:
+            self.INTERVAL = interval
+
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.own_counts = {}
+        self.total_counts = {}
+        self.running = False
+
+    def run(self):
+        self.running = True
+        while self.running:
+            time.sleep(self.INTERVAL)
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.sample(frame)
+            frame = None
+
+    def stop(self):
+        self.running = False
+
+    def sample(self, frame):
+        """
+        Counts the innermost function of the given frame as the one that was
+        running, and every function on the stack as having been called.
+
+        """
+        self.lock.acquire()
+        try:
+            self.samples += 1
+
+            key = self.describe(frame)
+            self.own_counts[key] = self.own_counts.get(key, 0) + 1
+
+            seen = set()
+            while frame is not None:
+                key = self.describe(frame, with_line=False)
+                if key not in seen:
+                    seen.add(key)
+                    self.total_counts[key] = self.total_counts.get(key, 0) + 1
+                frame = frame.f_back
+        finally:
+            self.lock.release()
+
+    def describe(self, frame, with_line=True):
+        code = frame.f_code
+        if with_line:
+            return "%s:%i(%s)" % (code.co_filename, frame.f_lineno,
+                code.co_name)
+
+        return "%s:%i(%s)" % (code.co_filename, code.co_firstlineno,
+            code.co_name)
+
+    def report(self, limit=25):
+        """
+        Returns the most frequently seen lines (own) and functions (total),
+        as lists of [description, fraction of samples].
+
+        """
+        self.lock.acquire()
+        try:
+            samples = max(self.samples, 1)
+            def top(counts):
+                items = sorted(counts.items(), key=lambda item: -item[1])
+                return [[key, round(float(count) / samples, 4)]
+                    for key, count in items[:limit]]
+
+            return {
+                "samples": self.samples,
+                "interval": self.INTERVAL,
+                "own": top(self.own_counts),
+                "total": top(self.total_counts)
+            }
+        finally:
+            self.lock.release()
@@ -27,6 +27,8 @@ Everything related retrieving and storing configuration keys.
 """
 
 import os
+import time
+import threading
 from os.path import dirname
 
 import shutil
@@ -83,6 +85,10 @@ def find_configspec():
 
 SETTINGS_SPEC = find_configspec()
 
+#: The most often (in seconds) that the settings file is looked at to see if
+#: another process (eg. the settings dialog) has changed it
+CHECK_INTERVAL = 2
+
 class SettingsManager:
     """
     This class provides an shallow interface for the rest of the program to use 
@@ -98,10 +104,14 @@ class SettingsManager:
             sm = SettingsManager()
             sm.set("external", "diff_tool", "/usr/bin/meld")
             sm.write()
+
+    Most code should use the manager shared by the whole process, which is
+    returned by get_settings(), rather than parsing the file again.
     """
     
     def __init__(self):
         
+        self.stamp = get_file_stamp()
         self.settings = configobj.ConfigObj(
             infile=SETTINGS_FILE,
             create_empty=True,
@@ -212,6 +222,10 @@ class SettingsManager:
         """
         
         self.settings.write()
+        self.stamp = get_file_stamp()
+
+        if self is _shared_settings:
+            check_settings(force=True)
         
     def clear(self):
         """
@@ -304,5 +318,117 @@ class SettingsManager:
                 renumber += 1
 
 
+def get_file_stamp():
+    try:
+        st = os.stat(SETTINGS_FILE)
+        return (st.st_mtime, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
+_shared_settings = None
+_published = {}
+_last_check = 0
+_listeners = []
+_lock = threading.RLock()
+
+def get_settings():
+    """
+    Returns the settings manager shared by the whole process.  The settings
+    file is only parsed and validated again when it has changed, so this is
+    cheap enough to call for every file that is drawn.  The values have
+    already been converted to the types given in the configspec (eg. the
+    boolean settings are bools).
+
+    @rtype:     SettingsManager
+    @return:    The shared settings manager.
+
+    """
+
+    if _shared_settings is None:
+        _lock.acquire()
+        try:
+            if _shared_settings is None:
+                _load_settings()
+        finally:
+            _lock.release()
+    else:
+        check_settings()
+
+    return _shared_settings
+
+def _load_settings():
+    global _shared_settings, _published
+
+    _shared_settings = SettingsManager()
+    _published = _shared_settings.settings.dict()
+
+def check_settings(force=False):
+    """
+    Reloads the shared settings if the settings file has changed, and tells
+    the listeners (see add_settings_listener) what changed.  The file is only
+    looked at once every CHECK_INTERVAL seconds, unless force is True.
+
+    @rtype:     list
+    @return:    The (section, keyword) tuples of the settings that changed.
+
+    """
+
+    global _last_check, _published
+
+    now = time.time()
+    if not force and now - _last_check < CHECK_INTERVAL:
+        return []
+
+    _lock.acquire()
+    try:
+        _last_check = now
+        if _shared_settings is None:
+            _load_settings()
+            return []
+
+        old = _published
+        if _shared_settings.stamp != get_file_stamp():
+            _load_settings()
+        elif force:
+            # This process wrote the file itself
+            _published = _shared_settings.settings.dict()
+
+        changed = []
+        for (section, values) in _published.items():
+            for (keyword, value) in values.items():
+                if old.get(section, {}).get(keyword) != value:
+                    changed.append((section, keyword))
+
+        listeners = _listeners[:]
+    finally:
+        _lock.release()
+
+    if changed:
+        for func in listeners:
+            try:
+                func(changed)
+            except Exception, e:
+                print "Error: settings listener failed: %s" % e
+
+    return changed
+
+def add_settings_listener(func):
+    """
+    Registers a function to be called whenever the shared settings change
+    (whether this process wrote them or another one did).
+
+    @type   func: callable
+    @param  func: Called with a list of the (section, keyword) tuples of the
+                  settings that changed.
+
+    """
+
+    if func not in _listeners:
+        _listeners.append(func)
+
+def remove_settings_listener(func):
+    if func in _listeners:
+        _listeners.remove(func)
+
 if __name__ == "__main__":
     pass
@@ -27,7 +27,7 @@ _ = gettext.gettext
 from rabbitvcs.util.log import Log
 logger = Log("rabbitvcs.vcs")
 
-from rabbitvcs.util.helper import get_exclude_paths
+from rabbitvcs.util.excludes import get_exclude_matcher
 
 EXT_UTIL_ERROR = _("The output from '%s' was not able to be processed.\n%s")
 
@@ -77,12 +77,19 @@ def guess(path):
         "repo_path": path
     }
 
+#: The clients that new VCS instances use instead of the ones every instance
+#: in the process shares, if not None. The UI host (see
+#: rabbitvcs.services.uihostservice) sets this to a dict of its own while it
+#: opens each window, since the clients hold the window's repository and the
+#: callbacks of its running action.
+DEFAULT_CLIENTS = None
+
 class VCS:
     clients = {}
-    exclude_paths = []
     
     def __init__(self):
-        self.exclude_paths = get_exclude_paths()
+        if DEFAULT_CLIENTS is not None:
+            self.clients = DEFAULT_CLIENTS
     
     def dummy(self):
         if VCS_DUMMY in self.clients:
@@ -172,7 +179,7 @@ class VCS:
 
     def client(self, path, vcs=None):
         if self.should_exclude(path):
-            logger.debug("Excluding path: %s" % path)
+            logger.debug("Excluding path: %s", path)
             return self.dummy()
 
         # Determine the VCS instance based on the vcs parameter
@@ -195,13 +202,16 @@ class VCS:
             return self.dummy()
     
     def should_exclude(self, path):
-        for exclude_path in self.exclude_paths:
-            if path.startswith(exclude_path):
-                return True
-        
-        return False
+        return get_exclude_matcher().matches(path)
     
     def guess(self, path):
+        # Don't go looking for administrative folders in excluded paths
+        if self.should_exclude(path):
+            return {
+                "vcs": VCS_DUMMY,
+                "repo_path": path
+            }
+
         return guess(path)
     
     # Methods that call client methods
@@ -231,9 +241,9 @@ class VCS:
         client = self.client(path)
         return client.is_locked(path)
 
-    def get_items(self, paths, statuses=[]):
+    def get_items(self, paths, statuses=[], invalidate=True):
         client = self.client(paths[0])
-        return client.get_items(paths, statuses)
+        return client.get_items(paths, statuses, invalidate)
 
     def statuses_for_add(self,paths):
         client = self.client(paths[0])
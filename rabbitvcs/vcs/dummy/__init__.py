@@ -43,7 +43,7 @@ class Dummy:
     def is_versioned(self, path):
         return False
     
-    def get_items(self, paths, statuses=[]):
+    def get_items(self, paths, statuses=[], invalidate=True):
         return []
     
     def is_locked(self, path):
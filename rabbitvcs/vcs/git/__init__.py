@@ -196,6 +196,13 @@ class Git:
                 if summarize:
                     st.summary = st.single
                 return st
+        elif not invalidate:
+            ignored = self._find_ignored_parent(path)
+            if ignored:
+                st = rabbitvcs.vcs.status.GitStatus.restore(path,
+                    ignored.content, ignored.metadata)
+                st.summary = st.single
+                return st
         
         all_statuses = self.statuses(path, invalidate=invalidate)
         
@@ -215,6 +222,25 @@ class Git:
 
         return path_status
     
+    def _find_ignored_parent(self, path):
+        """
+        Returns the cached status of the ignored folder that the given path is
+        in, if there is one.  The contents of ignored folders aren't walked
+        when the status of a repository is checked, so asking git about each
+        item in them would only tell us the same thing.
+        
+        """
+        
+        parent = os.path.dirname(path)
+        while parent != os.path.dirname(parent):
+            if parent in self.cache:
+                st = self.cache[parent]
+                if st and st.content == rabbitvcs.vcs.status.status_ignored:
+                    return st
+            parent = os.path.dirname(parent)
+        
+        return None
+    
     def is_working_copy(self, path):
         if (os.path.isdir(path) and
                 os.path.isdir(os.path.join(path, ".git"))):
@@ -243,7 +269,7 @@ class Git:
     def is_locked(self, path):
         return False
 
-    def get_items(self, paths, statuses=[]):
+    def get_items(self, paths, statuses=[], invalidate=True):
         """
         Retrieves a list of files that have one of a set of statuses
         
@@ -253,6 +279,10 @@ class Git:
         @type   statuses:   list
         @param  statuses:   A list of statuses.
         
+        @type   invalidate: boolean
+        @param  invalidate: Whether to check the statuses again rather than use
+                            any cached ones.
+        
         @rtype:             list
         @return:            A list of GittyupStatus objects.
         
@@ -263,7 +293,7 @@ class Git:
         
         items = []
         for path in paths:
-            st = self.statuses(path, invalidate=True)
+            st = self.statuses(path, invalidate=invalidate)
             for st_item in st:
                 if st_item.content == "modified" and os.path.isdir(st_item.path):
                     continue
@@ -735,63 +765,44 @@ class Git:
         
         """
         
-        # The strptime method relies on locales to work, and may not work with non en_US locales
-        # Temporarily change the locale to en_US so strptime can work consistently
-        # Then change it back at the end of the method
-        import locale
-        current_locale = locale.getlocale()
-        if current_locale[0] is not None:
-            locale.setlocale(locale.LC_ALL, "C")
-
         items = self.client.log(path, skip, limit, revision.primitive(), showtype)
+        head_commit = self.client.head()
         returner = []
         for item in items:
             revision = self.revision(item["commit"])
-            date = datetime.strptime(item["commit_date"][0:-6], "%a %b %d %H:%M:%S %Y")
+            date = datetime.fromtimestamp(item["commit_date"])
             
             author = _("(no author)")
-            if "committer" in item:
+            if item["committer"]:
                 author = item["committer"]
                 pos = author.find("<")
                 if pos != -1:
                     author = author[0:pos-1]
 
-            message = ""
-            if "message" in item:
-                message = item["message"]
-            
             changed_paths = []
-            if "changed_paths" in item:
-                for changed_path in item["changed_paths"]:
-                    action = "+%s/-%s" % (changed_path["additions"], changed_path["removals"])
-                
-                    changed_paths.append(rabbitvcs.vcs.log.LogChangedPath(
-                        changed_path["path"],
-                        action,
-                        "", ""
-                    ))
+            for changed_path in item["changed_paths"]:
+                action = "+%s/-%s" % (changed_path["additions"], changed_path["removals"])
             
-            parents = []
-            if "parents" in item:
-                for parent in item["parents"]:
-                    parents.append(self.revision(parent))
+                changed_paths.append(rabbitvcs.vcs.log.LogChangedPath(
+                    changed_path["path"],
+                    action,
+                    changed_path.get("old_path", ""), ""
+                ))
             
-            head = False
-            if item["commit"] == self.client.head():
-                head = True
+            parents = []
+            for parent in item["parents"]:
+                parents.append(self.revision(parent))
             
             returner.append(rabbitvcs.vcs.log.Log(
                 date,
                 revision,
                 author,
-                message,
+                item["message"],
                 changed_paths,
                 parents,
-                head
+                item["commit"] == head_commit
             ))
             
-        locale.setlocale(locale.LC_ALL, current_locale)
-            
         return returner
 
     def diff_summarize(self, path1, revision_obj1, path2=None, revision_obj2=None):
@@ -821,7 +832,7 @@ class Git:
         
         return summary
     
-    def annotate(self, path, revision_obj=Revision("head")):
+    def annotate(self, path, revision_obj=Revision("head"), callback=None):
         """
         Returns an annotation for a specified file
             
@@ -831,9 +842,13 @@ class Git:
         @type   revision: string
         @param  revision: HEAD or a sha1 hash
         
+        @type   callback: callable
+        @param  callback: Called as lines are annotated (see
+            GittyupClient.annotate)
+        
         """
 
-        return self.client.annotate(path, revision_obj.primitive())
+        return self.client.annotate(path, revision_obj.primitive(), callback)
 
     def show(self, path, revision_obj):
         """
@@ -870,6 +885,28 @@ class Git:
         return self.client.diff(path1, revision_obj1.primitive(), path2,
             revision_obj2.primitive())
 
+    def diff_to_file(self, paths, revision_obj, fileobj, callback=None):
+        """
+        Writes the diff between a revision and the working tree for the given
+        paths to a file, without holding the whole diff in memory.
+        
+        @type   paths: list
+        @param  paths: A list of absolute paths
+        
+        @type   revision_obj: git.Revision()
+        @param  revision_obj: The revision to diff against
+        
+        @type   fileobj: file
+        @param  fileobj: The file to write the diff to
+        
+        @type   callback: def
+        @param  callback: Called with the path of each file as it is written
+        
+        """
+        
+        return self.client.diff_to_file(paths, revision_obj.primitive(),
+            fileobj, callback)
+
     def apply_patch(self, patch_file, base_dir):
         """
         Applies a patch created for this WC.
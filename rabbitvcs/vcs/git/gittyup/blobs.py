@@ -0,0 +1,141 @@
+#
+# blobs.py
+#
+
+import os
+import zlib
+import threading
+import tempfile
+from Queue import Queue, Empty
+
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+#: Files are read, hashed and compressed this many bytes at a time, so large
+#: files are never held in memory whole
+CHUNK_SIZE = 1024 * 1024
+
+#: The number of threads used to hash files.  Reading, hashing and compressing
+#: all release the interpreter lock, so these do run in parallel.
+THREADS = 4
+
+def write_blob(path, objects_dir):
+    """
+    Stores the contents of a file as a loose blob object (unless the object
+    store already has it), reading the file a piece at a time.
+
+    @type   path: string
+    @param  path: The absolute path to the file
+
+    @type   objects_dir: string
+    @param  objects_dir: The repository's objects folder
+
+    @rtype  tuple
+    @return The os.stat() result for the file, and the blob's sha1
+
+    """
+
+    st = os.stat(path)
+
+    hasher = sha1()
+    compressor = zlib.compressobj()
+
+    header = "blob %d\0" % st.st_size
+    hasher.update(header)
+
+    (fd, tmp_path) = tempfile.mkstemp(prefix="tmp_obj_", dir=objects_dir)
+    try:
+        tmp = os.fdopen(fd, "wb")
+        try:
+            tmp.write(compressor.compress(header))
+
+            size = 0
+            source = open(path, "rb")
+            try:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+
+                    size += len(chunk)
+                    hasher.update(chunk)
+                    tmp.write(compressor.compress(chunk))
+            finally:
+                source.close()
+
+            # The size is part of the object, so it must not have changed
+            if size != st.st_size:
+                raise IOError("%s changed while it was being staged" % path)
+
+            tmp.write(compressor.flush())
+        finally:
+            tmp.close()
+
+        sha = hasher.hexdigest()
+        object_dir = os.path.join(objects_dir, sha[:2])
+        object_path = os.path.join(object_dir, sha[2:])
+
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            if not os.path.isdir(object_dir):
+                try:
+                    os.mkdir(object_dir)
+                except OSError:
+                    # Another thread made it first
+                    pass
+
+            os.chmod(tmp_path, 0444)
+            os.rename(tmp_path, object_path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return (st, sha)
+
+def write_blobs(paths, objects_dir, threads=THREADS):
+    """
+    Stores many files as blobs (see write_blob), using a few threads.
+
+    @rtype  list
+    @return A (stat result, sha1) tuple for each path, in the same order.  If
+            a file couldn't be read its tuple is replaced by the exception.
+
+    """
+
+    results = [None] * len(paths)
+    if len(paths) < 2 or threads < 2:
+        for index, path in enumerate(paths):
+            try:
+                results[index] = write_blob(path, objects_dir)
+            except (IOError, OSError), e:
+                results[index] = e
+        return results
+
+    queue = Queue()
+    for index, path in enumerate(paths):
+        queue.put((index, path))
+
+    def worker():
+        while True:
+            try:
+                (index, path) = queue.get_nowait()
+            except Empty:
+                return
+
+            try:
+                results[index] = write_blob(path, objects_dir)
+            except (IOError, OSError), e:
+                results[index] = e
+
+    workers = [threading.Thread(target=worker)
+        for i in range(min(threads, len(paths)))]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return results
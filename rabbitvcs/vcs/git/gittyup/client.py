@@ -7,6 +7,7 @@ import os.path
 import re
 import shutil
 import fnmatch
+import tarfile
 import time
 from string import ascii_letters, digits
 from datetime import datetime
@@ -26,10 +27,90 @@ import util
 from objects import *
 from config import GittyupLocalFallbackConfig
 from command import GittyupCommand
+from refs import RefsSnapshot
+from blobs import write_blobs
+from walk import walk_tree
 
 TZ = -1 * time.timezone
 ENCODING = "UTF-8"
 
+# The number of paths we pass to a single git diff when creating patches
+DIFF_BATCH_SIZE = 500
+
+# The format we ask git log for.  Every field is followed by a NUL (which can't
+# appear in any of them), and each commit starts with a \x01 so we can tell it
+# from the --numstat output of the previous commit.  The dates are unix
+# timestamps, so they can be converted without any locale dependent parsing.
+LOG_FORMAT = "%x01%H%x00%P%x00%an <%ae>%x00%at%x00%cn <%ce>%x00%ct%x00%B%x00"
+LOG_FIELDS = 7
+
+def parse_log(tokens):
+    """
+    Parses the output of git log with LOG_FORMAT, --numstat and -z, split on
+    NULs, into a list of commit dictionaries (see GittyupClient.log).  The
+    tokens can come from a generator, so the output is parsed as it is read.
+
+    """
+
+    revisions = []
+    fields = None
+    changed_paths = None
+    rename = None
+
+    for token in tokens:
+        if fields is not None and len(fields) < LOG_FIELDS:
+            fields.append(token)
+            if len(fields) == LOG_FIELDS:
+                changed_paths = []
+                revisions.append({
+                    "commit": fields[0],
+                    "parents": fields[1].split(),
+                    "author": fields[2],
+                    "author_date": int(fields[3]),
+                    "committer": fields[4],
+                    "commit_date": int(fields[5]),
+                    "message": fields[6].rstrip("\n"),
+                    "changed_paths": changed_paths
+                })
+            continue
+
+        if token[:1] == "\x01":
+            fields = [token[1:]]
+            rename = None
+            continue
+
+        if rename is not None:
+            # Renames and copies are given as "added<TAB>removed<TAB>", then
+            # the old path and the new path as separate fields
+            rename.append(token)
+            if len(rename) == 3:
+                changed_paths.append({
+                    "additions": rename[0][0],
+                    "removals": rename[0][1],
+                    "path": rename[2],
+                    "old_path": rename[1]
+                })
+                rename = None
+            continue
+
+        if token[:1] == "\n":
+            token = token[1:]
+
+        file_line = token.split("\t", 2)
+        if len(file_line) != 3 or changed_paths is None:
+            continue
+
+        if file_line[2]:
+            changed_paths.append({
+                "additions": file_line[0],
+                "removals": file_line[1],
+                "path": file_line[2]
+            })
+        else:
+            rename = [file_line]
+
+    return revisions
+
 def callback_notify_null(val):
     pass
 
@@ -46,11 +127,6 @@ def callback_get_user():
 def callback_get_cancel():
     return False
 
-def get_tmp_path(filename):
-    tmpdir = "/tmp/rabbitvcs"
-    if not os.path.isdir(tmpdir):
-        os.mkdir(tmpdir)
-
 class GittyupClient:
     def __init__(self, path=None, create=False):
         self.callback_notify = callback_notify_null
@@ -61,6 +137,8 @@ class GittyupClient:
         self.global_ignore_patterns = []
         
         self.git_version = None
+        
+        self.refs_snapshot = None
 
         self.numberOfCommandStages = 0
         self.numberOfCommandStagesExecuted = 0
@@ -267,30 +345,26 @@ class GittyupClient:
     def _read_directory_tree(self, path, show_ignored_files=False):
         files = []
         directories = []
-        for root, dirs, filenames in os.walk(path, topdown=True):
-            try:
-                dirs.remove(".git")
-                removed_git_dir = True
-            except ValueError:
-                pass
-
-            # Find the relative root path of this folder
-            if root == self.repo.path:
-                rel_root = ""
+        for (name, is_dir) in walk_tree(path, self.repo.path):
+            if is_dir:
+                directories.append(name)
             else:
-                rel_root = self.get_relative_path(root)
+                files.append(name)
 
-            for filename in filenames:
-                files.append(os.path.join(rel_root, filename))
-        
-            for _d in dirs:
-                directories.append(os.path.join(rel_root, _d))
+        return (files, directories)
 
-            directories.append(rel_root)
-        
-        #Remove duplicates in list
-        directories=list(set(directories))
-        return (sorted(files), directories)
+    def _is_within(self, path, folders):
+        """
+        Returns True if the given relative path is one of, or is inside one
+        of, the given set of relative folder paths.
+
+        """
+        while path:
+            if path in folders:
+                return True
+            path = os.path.dirname(path)
+
+        return False
 
     def _get_blob_from_file(self, path):
         file = open(path, "rb")
@@ -396,14 +470,34 @@ class GittyupClient:
     def track(self, name):
         self.repo.refs.set_symbolic_ref("HEAD", name)
 
+    def get_refs_snapshot(self):
+        """
+        Returns a RefsSnapshot of the repository, reusing the last one for as
+        long as the refs haven't changed.
+        
+        """
+        
+        git_dir = self.repo.controldir()
+        snapshot = self.refs_snapshot
+        if (snapshot is None or snapshot.git_dir != git_dir or
+                not snapshot.is_current()):
+            snapshot = self.refs_snapshot = RefsSnapshot(git_dir)
+        
+        return snapshot
+
     def is_tracking(self, name):
-        return (self.repo.refs.read_ref("HEAD")[5:] == name)
+        return (self.tracking() == name)
 
     def tracking(self):
-        return self.repo.refs.read_ref("HEAD")[5:]
+        return self.get_refs_snapshot().head_ref or ""
     
     def head(self):
-        return self.repo.refs["HEAD"]
+        head = self.get_refs_snapshot().head
+        if head is None:
+            # There are no commits yet, dulwich will raise the error
+            return self.repo.refs["HEAD"]
+        
+        return head
     
     def get_sha1_from_refspec(self, refspec):
         if refspec in self.repo.refs:
@@ -420,34 +514,48 @@ class GittyupClient:
         
         """
 
-        index = self._get_index()
-
         if type(paths) in (str, unicode):
             paths = [paths]
 
-        for path in paths:
+        index = self._get_index()
+        self._stage_into_index(index, paths)
+        index.write()
+
+    def _stage_into_index(self, index, paths):
+        """
+        Stores the given files as blobs and updates their entries in the
+        index, without writing the index.  The files are hashed in parallel and
+        written as loose objects as they are read.
+        
+        """
+
+        objects_dir = os.path.join(self.repo.controldir(), "objects")
+        absolute_paths = [self.get_absolute_path(path) for path in paths]
+        results = write_blobs(absolute_paths, objects_dir)
+
+        for path, absolute_path, result in zip(paths, absolute_paths, results):
+            if isinstance(result, EnvironmentError):
+                self.callback_notify(result)
+                continue
+
+            (st, blob_id) = result
             relative_path = self.get_relative_path(path)
-            absolute_path = self.get_absolute_path(path)
-            blob = self._get_blob_from_file(absolute_path)
             
             if relative_path in index:
-                (ctime, mtime, dev, ino, mode, uid, gid, size, blob_id, flags) = index[relative_path]
+                flags = index[relative_path][-1]
             else:
                 flags = 0
 
             # make sure mtime and ctime is updated every time a file is staged
-            (mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime) = os.stat(path)
+            (mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime) = st
 
-            index[relative_path] = (ctime, mtime, dev, ino, mode, uid, gid, size, blob.id, flags)
-            index.write()
+            index[relative_path] = (ctime, mtime, dev, ino, mode, uid, gid, size, blob_id, flags)
 
             self.notify({
                 "action": "Staged",
                 "path": absolute_path,
                 "mime_type": guess_type(absolute_path)[0]
             })
-
-            self.repo.object_store.add_object(blob)
     
     def stage_all(self):
         """
@@ -456,15 +564,18 @@ class GittyupClient:
         """
         
         index = self._get_index()
+        paths = []
         for status in self.status():
             if status in [AddedStatus, RemovedStatus, ModifiedStatus]:
                 abs_path = self.get_absolute_path(status.path)
                 if os.path.isfile(abs_path):
-                    self.stage(abs_path)
+                    paths.append(abs_path)
 
             if status == MissingStatus:
                 self._remove_from_index(index, status.path)
-                index.write()
+
+        self._stage_into_index(index, paths)
+        index.write()
 
     def unstage(self, paths):
         """
@@ -639,22 +750,14 @@ class GittyupClient:
 
     def branch_list(self, commit_sha=None):
         """
-        List all branches
+        List all branches, or only those that contain the given commit
         
         """
-        """
-        refs = self.repo.get_refs()
-        branches = []
-        for ref,branch_sha in refs.items():
-            if ref.startswith("refs/heads"):
-                branch = Branch(ref[11:], branch_sha, self.repo[branch_sha])
-                branches.append(branch)
         
-        return branches
-        """
-        cmd = ["git", "branch", "-lv", "--no-abbrev"]
-        if commit_sha:
-            cmd += ["--contains", commit_sha]
+        if not commit_sha:
+            return self._branch_list_from_refs()
+        
+        cmd = ["git", "branch", "-lv", "--no-abbrev", "--contains", commit_sha]
 
         try:
             (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
@@ -686,6 +789,42 @@ class GittyupClient:
         
         return branches
 
+    def _branch_list_from_refs(self):
+        """
+        Lists the branches (as branch_list does) from the refs snapshot, so no
+        git process is needed.
+        
+        """
+        
+        snapshot = self.get_refs_snapshot()
+        if "branches" not in snapshot.cache:
+            branches = []
+            if snapshot.head_ref is None and snapshot.head is not None:
+                branches.append({
+                    "tracking": True,
+                    "name": "(no branch)",
+                    "revision": snapshot.head,
+                    "message": self._get_commit_summary(snapshot.head)
+                })
+            
+            for (name, sha) in snapshot.get_refs("refs/heads/"):
+                branches.append({
+                    "tracking": (snapshot.head_ref == "refs/heads/" + name),
+                    "name": name,
+                    "revision": sha,
+                    "message": self._get_commit_summary(sha)
+                })
+            
+            snapshot.cache["branches"] = branches
+        
+        return [branch.copy() for branch in snapshot.cache["branches"]]
+
+    def _get_commit_summary(self, sha):
+        try:
+            return self.repo[sha].message.split("\n", 1)[0]
+        except (KeyError, AttributeError):
+            return ""
+
     def checkout(self, paths=[], revision="HEAD"):
         """
         Checkout a series of paths from a tree or commit.  If no tree or commit
@@ -1067,13 +1206,18 @@ class GittyupClient:
             
         """
         
+        # The snapshot is also replaced when the config file changes
+        snapshot = self.get_refs_snapshot()
+        if "remotes" in snapshot.cache:
+            return [remote.copy() for remote in snapshot.cache["remotes"]]
+        
         cmd = ["git", "remote", "-v"]
 
         try:
             (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
         except GittyupCommandError, e:
             self.callback_notify(e)
-            stdout = []
+            return []
             
         returner = []
         for line in stdout:
@@ -1092,8 +1236,9 @@ class GittyupClient:
                         "name": name,
                         "host": host
                     })
-                    
-        return returner
+        
+        snapshot.cache["remotes"] = returner
+        return [remote.copy() for remote in returner]
     
     def tag(self, name, message, revision="HEAD"):
         """
@@ -1140,30 +1285,22 @@ class GittyupClient:
         
         """
     
-        refs = self.repo.get_refs()
-
-        tags = []
-        for ref,tag_sha in refs.items():
-            if ref.startswith("refs/tags"):
-                if type(self.repo[tag_sha]) == dulwich.objects.Commit:
-                    tag = CommitTag(ref[10:], tag_sha, self.repo[tag_sha])
+        snapshot = self.get_refs_snapshot()
+        if "tags" not in snapshot.cache:
+            tags = []
+            for (name, tag_sha) in snapshot.get_refs("refs/tags/"):
+                obj = self.repo[tag_sha]
+                if type(obj) == dulwich.objects.Commit:
+                    tag = CommitTag(name, tag_sha, obj)
                 else:
-                    tag = Tag(tag_sha, self.repo[tag_sha])
+                    tag = Tag(tag_sha, obj)
                 tags.append(tag)
+            
+            snapshot.cache["tags"] = tags
         
-        return tags
+        return list(snapshot.cache["tags"])
 
     def status_porcelain(self, path):
-        if os.path.isdir(path):
-            (files, directories) = self._read_directory_tree(path)
-        else:
-            files = [self.get_relative_path(path)]
-            directories = []
-
-        files_hash = {}
-        for file in files:
-            files_hash[file] = True
-
         cmd = ["git", "status", "--porcelain", path]
         try:
             (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify).execute()
@@ -1171,30 +1308,33 @@ class GittyupClient:
             self.callback_notify(e)
         
         statuses = []
-        modified_files = []
+        
+        # Paths git has told us about, and the folders with changes in them
+        seen = set()
+        modified_directories = set()
         for line in stdout:
             components = re.match("^([\sA-Z\?]+)\s(.*?)$", line)
             if components:
                 status = components.group(1)
                 strip_status = status.strip()
-                path = components.group(2)
+                file = components.group(2)
                
                 if status == " D":
-                    statuses.append(MissingStatus(path))
+                    statuses.append(MissingStatus(file))
                 elif strip_status in ["M", "R", "U"]:
-                    statuses.append(ModifiedStatus(path))
+                    statuses.append(ModifiedStatus(file))
                 elif strip_status in ["A", "C"]:
-                    statuses.append(AddedStatus(path))
+                    statuses.append(AddedStatus(file))
                 elif strip_status == "D":
-                    statuses.append(RemovedStatus(path))
+                    statuses.append(RemovedStatus(file))
                 elif strip_status == "??":
-                    statuses.append(UntrackedStatus(path))
+                    statuses.append(UntrackedStatus(file))
                 
-                modified_files.append(path)
-                try:
-                    del files_hash[path]
-                except Exception, e:
-                    pass
+                seen.add(file)
+                parent = file
+                while parent:
+                    parent = os.path.dirname(parent)
+                    modified_directories.add(parent)
 
         # Determine untracked directories
         cmd = ["git", "clean", "-nd", self.repo.path]
@@ -1203,13 +1343,13 @@ class GittyupClient:
         except GittyupCommandError, e:
             self.callback_notify(e)
 
-        untracked_directories = []
+        untracked_directories = set()
         for line in stdout:
             components = re.match("^(Would remove)\s(.*?)$", line)
             if components:
                 untracked_path = components.group(2)
                 if untracked_path[-1]=='/':
-                    untracked_directories.append(untracked_path[:-1])
+                    untracked_directories.add(untracked_path[:-1])
 
         #Determine the ignored files and directories in Repo
         cmd = ["git", "clean", "-ndX", self.repo.path]
@@ -1217,64 +1357,49 @@ class GittyupClient:
             (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify).execute()
         except GittyupCommandError, e:
             self.callback_notify(e)
-        ignored_directories=[]
+        ignored_directories = set()
         for line in stdout:
             components = re.match("^(Would remove)\s(.*?)$", line)
             if components:
                 ignored_path=components.group(2)
                 if ignored_path[-1]=='/':
-                    ignored_directories.append(ignored_path[:-1])
-                    next
+                    ignored_directories.add(ignored_path[:-1])
+                    continue
                 statuses.append(IgnoredStatus(ignored_path))
                 self.ignored_paths.append(ignored_path)
-                try:
-                    del files_hash[ignored_path]
-                except Exception, e:
-                    pass
-        for file,data in files_hash.items():
-            ignore_file=False
-            untracked_file=False
-            for ignored_path in ignored_directories:
-                if ignored_path in file:
-                    ignore_file=True
-                    break
-            for untracked_path in untracked_directories:
-                if untracked_path in file:
-                    untracked_file=True
-                    break
-            if untracked_file==True:
-                statuses.append(UntrackedStatus(file))
-                if ignore_file==True:
-                    self.ignored_paths.append(file)
-            elif ignore_file==True:
-                statuses.append(IgnoredStatus(file))
-                self.ignored_paths.append(file)
-            else:
-                statuses.append(NormalStatus(file))
-
-        # Determine status of folders based on child contents
-        for d in directories:
-            d_status = NormalStatus(d)
+                seen.add(ignored_path)
 
-            # Check if directory is untracked or a sub-directory of an untracked directory
-            for untracked_path in untracked_directories:
-                if untracked_path in d:
-                    d_status = UntrackedStatus(d)
-                    break
-
-            # Check if directory includes modified files
-            for file in modified_files:
-                if file.startswith(d):
-                    d_status = ModifiedStatus(d)
-                    break
+        # Ignored folders are reported, but not walked into (they tend to be
+        # the biggest ones)
+        if os.path.isdir(path):
+            entries = walk_tree(path, self.repo.path,
+                prune=lambda name: name in ignored_directories)
+        else:
+            entries = [(self.get_relative_path(path), False)]
+
+        for (name, is_dir) in entries:
+            if is_dir:
+                # Determine status of folders based on child contents
+                if self._is_within(name, ignored_directories):
+                    statuses.append(IgnoredStatus(name))
+                elif name in modified_directories:
+                    statuses.append(ModifiedStatus(name))
+                elif self._is_within(name, untracked_directories):
+                    statuses.append(UntrackedStatus(name))
+                else:
+                    statuses.append(NormalStatus(name))
+                continue
 
-            # Check if directory is ignored
-            for ignored_path in ignored_directories:
-                if ignored_path in d:
-                    d_status = IgnoredStatus(d)
-                    break
-            statuses.append(d_status)
+            if name in seen:
+                continue
 
+            if self._is_within(name, untracked_directories):
+                statuses.append(UntrackedStatus(name))
+            elif self._is_within(name, ignored_directories):
+                statuses.append(IgnoredStatus(name))
+                self.ignored_paths.append(name)
+            else:
+                statuses.append(NormalStatus(name))
 
         return statuses
 
@@ -1383,9 +1508,15 @@ class GittyupClient:
             return self.status_dulwich(path)
 
     def log(self, path="", skip=0, limit=None, revision="", showtype="all"):
+        """
+        Returns a list of commit dictionaries, newest first.  Each has the
+        keys commit, parents, author, author_date, committer, commit_date,
+        message and changed_paths.  The dates are unix timestamps.
+
+        """
         
-        cmd = ["git", "--no-pager", "log", "--numstat", "--parents", "--pretty=fuller", 
-            "--date-order"]
+        cmd = ["git", "--no-pager", "log", "--numstat", "-z", "--parents",
+            "--pretty=format:%s" % LOG_FORMAT, "--date-order"]
 
         if showtype == "all":
             cmd.append("--all")
@@ -1403,68 +1534,17 @@ class GittyupClient:
             cmd += ["--", path]
 
         try:
-            (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
-        except GittyupCommandError, e:
+            command = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel)
+            return parse_log(command.stream())
+        except (GittyupCommandError, OSError), e:
             self.callback_notify(e)
             return []
-
-        revisions = []
-        revision = {}
-        changed_file = {}
-        for line in stdout:
-            if line == "":
-                continue
-            
-            if line[0:6] == "commit":
-                if revision:
-                    if "changed_paths" not in revision:
-                        revision["changed_paths"] = {}
-                    revisions.append(revision)
-            
-                revision = {}
-                changed_file = {}
-                commit_line = line.split(" ")
-                revision["commit"] = commit_line[1]
-                revision["parents"] = []
-                for parent in commit_line[2:]:
-                    revision["parents"].append(parent)
-            elif line[0:7] == "Author:":
-                revision["author"] = line[7:].strip()
-            elif line[0:11] == "AuthorDate:":
-                revision["author_date"] = line[11:].strip()
-            elif line[0:7] == "Commit:":
-                revision["committer"] = line[7:].strip()
-            elif line[0:11] == "CommitDate:":
-                revision["commit_date"] = line[11:].strip()
-            elif line[0:4] == "    ":
-                message = line[4:]
-                if "message" not in revision:
-                    revision["message"] = ""
-                else:
-                    revision["message"] += "\n"
-                    
-                revision["message"] = revision["message"] + message
-            elif line[0].isdigit() or line[0] in "-":
-                file_line = line.split("\t")
-                if not changed_file:
-                    revision["changed_paths"] = []
-
-                if len(file_line) == 3:
-                    changed_file = {
-                        "additions": file_line[0],
-                        "removals": file_line[1],
-                        "path": file_line[2]
-                    }
-                    revision["changed_paths"].append(changed_file)
-
-        if revision:
-            revisions.append(revision)
-
-        return revisions
         
-    def annotate(self, path, revision_obj="HEAD"):
+    def annotate(self, path, revision_obj="HEAD", callback=None):
         """
-        Returns an annotation for a specified file
+        Returns an annotation for a specified file, as a list of AnnotatedLine
+        objects.  Lines that were changed in the same commit share a single
+        BlameCommit.
             
         @type   path: string
         @param  path: The absolute path to a tracked file
@@ -1472,40 +1552,74 @@ class GittyupClient:
         @type   revision: string
         @param  revision: HEAD or a sha1 hash
         
+        @type   callback: callable
+        @param  callback: Called as callback(lines, first, last) once the
+            file has been read (with first == last == 0), and again each time
+            git has found the commit for lines[first:last].  This is called
+            from whatever thread annotate runs in.
+        
         """
 
-        relative_path = self.get_relative_path(path)
+        if not revision_obj:
+            revision_obj = "HEAD"
 
-        cmd = ["git", "annotate", "-l", revision_obj, relative_path]
+        relative_path = self.get_relative_path(path)
 
         try:
-            (status, stdout, stderr) = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
-        except GittyupCommandError, e:
-            self.callback_notify(e)
-            stdout = []
-
-        returner = []
-        for line in stdout:
-            components = re.split("\t", line, 3)
-            if len(components) < 4:
-                continue
+            cmd = ["git", "show", "%s:%s" % (revision_obj, relative_path)]
+            text = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).stream("\n")
+
+            lines = []
+            for line in text:
+                lines.append(AnnotatedLine(len(lines) + 1, line.rstrip("\r")))
+
+            if callback:
+                callback(lines, 0, 0)
+
+            # The incremental format gives each commit's details only the
+            # first time it is seen, and reports groups of lines as soon as
+            # they are found rather than in order
+            cmd = ["git", "blame", "--incremental", revision_obj, "--", relative_path]
+            output = GittyupCommand(cmd, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).stream("\n")
+
+            commits = {}
+            commit = None
+            first = last = 0
+            for line in output:
+                if commit is None:
+                    fields = line.split(" ")
+                    if len(fields) != 4:
+                        continue
 
-            dt = datetime(*time.strptime(components[2][:-6],"%Y-%m-%d %H:%M:%S")[:-2])
+                    commit = commits.get(fields[0])
+                    if commit is None:
+                        commit = commits[fields[0]] = BlameCommit(fields[0])
+
+                    first = int(fields[2]) - 1
+                    last = first + int(fields[3])
+                    continue
+
+                (key, space, value) = line.partition(" ")
+                if key == "author":
+                    commit.author = value
+                elif key == "author-time":
+                    commit.date = datetime.fromtimestamp(int(value))
+                elif key == "summary":
+                    commit.summary = value
+                elif key == "filename":
+                    # The last field of every group
+                    for annotated_line in lines[first:last]:
+                        annotated_line.commit = commit
+
+                    if callback:
+                        callback(lines, first, min(last, len(lines)))
+
+                    commit = None
+        except (GittyupCommandError, OSError), e:
+            self.callback_notify(e)
+            return []
 
-            message = components[3].split(")", 1)
-            code = message[1]
-            if len(components) == 5:
-                code = components[4]
-                
-            returner.append({
-                "revision": components[0],
-                "author": components[1][1:],
-                "date": dt,
-                "line": code,
-                "number": message[0]
-            })
-        
-        return returner
+        return lines
 
     def show(self, path, revision_obj):
         """
@@ -1577,6 +1691,63 @@ class GittyupClient:
         
         return "\n".join(stdout)
 
+    def diff_to_file(self, paths, revision_obj, fileobj, callback=None):
+        """
+        Writes the diff between revision_obj and the working tree for the given
+        paths straight into fileobj.  The paths are diffed DIFF_BATCH_SIZE at
+        a time, in sorted order, so the output is the same as diffing each path
+        on its own but only takes a few git processes.
+        
+        @type   paths: list
+        @param  paths: A list of absolute paths
+        
+        @type   revision_obj: string
+        @param  revision_obj: The revision to diff against
+        
+        @type   fileobj: file
+        @param  fileobj: The file to write the diff to
+        
+        @type   callback: def
+        @param  callback: Called with the (relative) path of each file as its
+            diff starts
+        
+        """
+        
+        relative_paths = []
+        for path in sorted(set(self.get_relative_path(path) for path in paths)):
+            # A path inside a selected folder is already covered by the folder
+            if relative_paths and (relative_paths[-1] == "" or
+                    path.startswith(relative_paths[-1] + "/")):
+                continue
+            relative_paths.append(path)
+        
+        for i in range(0, len(relative_paths), DIFF_BATCH_SIZE):
+            cmd = ["git", "diff", "--no-color"]
+            if revision_obj:
+                cmd.append(revision_obj)
+            cmd.append("--")
+            for path in relative_paths[i:i+DIFF_BATCH_SIZE]:
+                cmd.append(path or ".")
+            
+            env = os.environ.copy()
+            env["LANG"] = "C"
+            proc = subprocess.Popen(cmd, cwd=self.repo.path, stdout=subprocess.PIPE,
+                env=env, close_fds=True)
+            
+            for line in proc.stdout:
+                if callback and line.startswith("diff --git "):
+                    callback(line.rstrip("\n").split(" b/", 1)[-1])
+                fileobj.write(line)
+                
+                if self.get_cancel():
+                    proc.kill()
+                    break
+            
+            proc.wait()
+            
+            if self.get_cancel():
+                break
+
     def diff_summarize(self, path1, revision_obj1, path2=None, revision_obj2=None):
         results = self.diff(path1, revision_obj1, path2, revision_obj2, True)
         summary = []
@@ -1607,22 +1778,77 @@ class GittyupClient:
 
         """
         
-        tmp_file = get_tmp_path("rabbitvcs-git-export.tar")
-        cmd1 = ["git", "archive", "--format", "tar", "-o", tmp_file, revision, path]
-        cmd2 = ["tar", "-xf", tmp_file, "-C", dest_path]
-        
         if not os.path.isdir(dest_path):
             os.mkdir(dest_path)
 
+        archive_path = path
+        if os.path.isabs(path) and (path + "/").startswith(self.repo.path.rstrip("/") + "/"):
+            archive_path = self.get_relative_path(path) or "."
+
+        # The archive is extracted as git writes it, so no temporary tarball
+        # is needed and both happen at the same time
+        total_size = self._get_tree_size(revision, archive_path)
+        exported_size = 0
+
+        cmd = ["git", "archive", "--format", "tar", revision, archive_path]
+        proc = GittyupCommand(cmd, cwd=self.repo.path).open()
         try:
-            (status, stdout, stderr) = GittyupCommand(cmd1, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
-            (status, stdout, stderr) = GittyupCommand(cmd2, cwd=self.repo.path, notify=self.notify, cancel=self.get_cancel).execute()
-        except GittyupCommandError, e:
-            self.callback_notify(e)
-            stdout = []
-            
+            try:
+                archive = tarfile.open(fileobj=proc.stdout, mode="r|")
+                for member in archive:
+                    if self.get_cancel():
+                        self.notify("Export cancelled")
+                        return ""
+
+                    archive.extract(member, dest_path)
+
+                    if member.isfile():
+                        exported_size += member.size
+                        member_path = os.path.join(dest_path, member.name)
+                        self.notify({
+                            "action": "Exported",
+                            "path": member_path,
+                            "mime_type": guess_type(member_path)[0]
+                        })
+
+                        if total_size and self.callback_progress_update:
+                            self.callback_progress_update(
+                                min(float(exported_size) / total_size, 1.0))
+                archive.close()
+            except (tarfile.TarError, EnvironmentError), e:
+                error = proc.stderr.read().strip()
+                self.callback_notify(GittyupCommandError(error or str(e)))
+                return ""
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.stderr.close()
+            proc.wait()
+
         self.notify("%s at %s exported to %s" % (path, revision, dest_path))
-        return "\n".join(stdout)      
+        return ""
+
+    def _get_tree_size(self, revision, path):
+        """
+        Returns the total size of the files in the given path at a revision,
+        or 0 if it can't be worked out.
+
+        """
+
+        cmd = ["git", "ls-tree", "-r", "-l", "-z", revision, path]
+
+        size = 0
+        try:
+            for entry in GittyupCommand(cmd, cwd=self.repo.path).stream():
+                # <mode> <type> <object> <size><TAB><path>
+                fields = entry.split("\t", 1)[0].split()
+                if len(fields) == 4 and fields[3].isdigit():
+                    size += int(fields[3])
+        except OSError:
+            return 0
+
+        return size
     
     def clean(self, path, remove_dir=True, remove_ignored_too=False, 
             remove_only_ignored=False, dry_run=False, force=True):
@@ -1913,4 +2139,8 @@ class GittyupClient:
         self.notify_and_parse_progress (return_data)
     
     def get_cancel(self):
-        return self.callback_get_cancel
+        cancel = self.callback_get_cancel
+        if callable(cancel):
+            cancel = cancel()
+        
+        return cancel is True
@@ -67,3 +67,67 @@ class GittyupCommand:
                 proc.kill()
 
         return (0, stdout, None)
+
+    def open(self):
+        """
+        Starts the command and returns the subprocess.Popen object, with its
+        stdout and stderr as pipes, for callers that read the output
+        themselves (eg. as a file object).
+
+        """
+        env = os.environ.copy()
+        env["LANG"] = "C";
+        return subprocess.Popen(self.command,
+                                cwd=self.cwd,
+                                stdin=None,
+                                stderr=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                env=env,
+                                close_fds=True,
+                                preexec_fn=os.setsid)
+
+    def stream(self, separator="\0", chunk_size=65536):
+        """
+        Runs the command and yields its output split on the given separator,
+        as it arrives.  This is meant for commands with machine readable
+        output (eg. git log -z), so the output is not split into lines, nor
+        passed to the notify function, and stderr is discarded.
+
+        """
+        env = os.environ.copy()
+        env["LANG"] = "C";
+        devnull = open(os.devnull, "w")
+        proc = subprocess.Popen(self.command,
+                                cwd=self.cwd,
+                                stdin=None,
+                                stderr=devnull,
+                                stdout=subprocess.PIPE,
+                                env=env,
+                                close_fds=True,
+                                preexec_fn=os.setsid)
+
+        fd = proc.stdout.fileno()
+        remainder = ""
+        try:
+            while True:
+                chunk = os.read(fd, chunk_size)
+                if chunk == "":
+                    break
+
+                tokens = (remainder + chunk).split(separator)
+                remainder = tokens.pop()
+                for token in tokens:
+                    yield token
+
+                if self.get_cancel():
+                    return
+
+            if remainder:
+                yield remainder
+        finally:
+            # The caller may stop reading before the command has finished
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            devnull.close()
@@ -182,3 +182,50 @@ class Branch(Commit):
     
     def __eq__(self, other):
         return (self.name == other)
+
+class BlameCommit(object):
+    """
+    The commit that lines of an annotated file were last changed in.  There
+    is only one of these per commit, shared by all of its lines.
+
+    """
+    __slots__ = ("revision", "author", "date", "summary")
+
+    def __init__(self, revision, author="", date=None, summary=""):
+        self.revision = revision
+        self.author = author
+        self.date = date
+        self.summary = summary
+
+    def __repr__(self):
+        return "<BlameCommit %s>" % self.revision
+
+class AnnotatedLine(object):
+    """
+    A single line of an annotated file.  The commit is None until the line
+    has been annotated.
+
+    For compatibility with the dictionaries annotate used to return, the
+    number, line, revision, author and date can also be read as items.
+
+    """
+    __slots__ = ("number", "line", "commit")
+
+    def __init__(self, number, line, commit=None):
+        self.number = number
+        self.line = line
+        self.commit = commit
+
+    def __getitem__(self, key):
+        if key in ("number", "line"):
+            return getattr(self, key)
+
+        if self.commit is None:
+            if key == "date":
+                return None
+            return ""
+
+        return getattr(self.commit, key)
+
+    def __repr__(self):
+        return "<AnnotatedLine %s>" % self.number
@@ -0,0 +1,152 @@
+#
+# refs.py
+#
+
+import os
+import time
+
+class RefsSnapshot:
+    """
+    The refs of a repository (branches, tags, remote branches and HEAD), read
+    straight from packed-refs and the loose ref files rather than by running
+    git.  Anything worked out from the refs (eg. the branch list) can be kept
+    in the cache dictionary, and is thrown away along with the snapshot.
+
+    A snapshot is current until HEAD, packed-refs, the config file or any of
+    the folders under refs are modified.  Git writes refs by renaming a lock
+    file over them, so a changed loose ref always changes its folder.
+
+    """
+
+    #: Seconds either side of reading the refs in which we don't trust that a
+    #: modification would change a timestamp (some file systems only store
+    #: whole seconds)
+    MTIME_SLACK = 1
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+
+        # Ref names to sha1s
+        self.refs = {}
+
+        # The ref HEAD points to (eg. refs/heads/master), or None if HEAD is
+        # detached
+        self.head_ref = None
+
+        # The sha1 HEAD resolves to, or None if there are no commits yet
+        self.head = None
+
+        self.cache = {}
+
+        self.read_time = time.time()
+        self.stamps = self.get_stamps()
+        self.read()
+
+    def get_stamps(self):
+        stamps = {}
+        for name in ("HEAD", "packed-refs", "config"):
+            path = os.path.join(self.git_dir, name)
+            try:
+                st = os.stat(path)
+                stamps[path] = (st.st_mtime, st.st_ino, st.st_size)
+            except OSError:
+                stamps[path] = None
+
+        for (root, dirs, files) in os.walk(os.path.join(self.git_dir, "refs")):
+            try:
+                stamps[root] = os.stat(root).st_mtime
+            except OSError:
+                stamps[root] = None
+
+        return stamps
+
+    def is_current(self):
+        """
+        Returns True if the refs can't have changed since the snapshot was
+        taken.
+
+        """
+
+        for stamp in self.stamps.values():
+            if stamp is None:
+                continue
+
+            if isinstance(stamp, tuple):
+                stamp = stamp[0]
+
+            if stamp >= self.read_time - self.MTIME_SLACK:
+                return False
+
+        return self.get_stamps() == self.stamps
+
+    def read(self):
+        symbolic = {}
+
+        try:
+            packed_refs = open(os.path.join(self.git_dir, "packed-refs"))
+            try:
+                for line in packed_refs:
+                    if line[0] in "#^":
+                        continue
+
+                    fields = line.split()
+                    if len(fields) == 2:
+                        self.refs[fields[1]] = fields[0]
+            finally:
+                packed_refs.close()
+        except IOError:
+            pass
+
+        # Loose refs override packed ones
+        for (root, dirs, files) in os.walk(os.path.join(self.git_dir, "refs")):
+            for filename in files:
+                if filename.endswith(".lock"):
+                    continue
+
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.git_dir).replace(os.sep, "/")
+                value = self._read_ref_file(path)
+                if value is None:
+                    continue
+
+                if value.startswith("ref: "):
+                    symbolic[name] = value[5:]
+                else:
+                    self.refs[name] = value
+
+        for (name, target) in symbolic.items():
+            if target in self.refs:
+                self.refs[name] = self.refs[target]
+
+        value = self._read_ref_file(os.path.join(self.git_dir, "HEAD"))
+        if value is not None:
+            if value.startswith("ref: "):
+                self.head_ref = value[5:]
+                self.head = self.refs.get(self.head_ref)
+            else:
+                self.head = value
+
+    def _read_ref_file(self, path):
+        try:
+            ref_file = open(path)
+            try:
+                return ref_file.read().strip()
+            finally:
+                ref_file.close()
+        except IOError:
+            return None
+
+    def get_refs(self, prefix):
+        """
+        Returns the (name without the prefix, sha1) pairs of all of the refs
+        that start with the given prefix (eg. "refs/heads/"), sorted by name.
+
+        """
+
+        refs = []
+        for (name, sha) in self.refs.items():
+            if name.startswith(prefix):
+                refs.append((name[len(prefix):], sha))
+
+        refs.sort()
+        return refs
@@ -0,0 +1,59 @@
+#
+# test/log.py
+#
+
+import os
+from shutil import rmtree
+from sys import argv
+from optparse import OptionParser
+
+from gittyup.client import GittyupClient
+from gittyup.objects import *
+from util import touch, change
+
+parser = OptionParser()
+parser.add_option("-c", "--cleanup", action="store_true", default=False)
+(options, args) = parser.parse_args(argv)
+
+DIR = "log"
+
+if options.cleanup:
+    rmtree(DIR, ignore_errors=True)
+
+    print "log.py clean"
+else:
+    if os.path.isdir(DIR):
+        raise SystemExit("This test script has already been run.  Please call this script with --cleanup to start again")
+
+    os.mkdir(DIR)
+    g = GittyupClient()
+    g.initialize_repository(DIR)
+    
+    touch(DIR + "/test1.txt")
+    touch(DIR + "/test2.txt")
+    
+    g.stage([DIR+"/test1.txt", DIR+"/test2.txt"])
+    first_id = g.commit("First commit\n\nWith a longer description", commit_all=True)
+    
+    change(DIR + "/test1.txt")
+    g.stage([DIR+"/test1.txt"])
+    second_id = g.commit("Second commit", author="Alex Plumb <alexplumb@gmail.com>")
+    
+    log = g.log()
+    assert (len(log) == 2)
+    assert (log[0]["commit"] == second_id)
+    assert (log[0]["parents"] == [first_id])
+    assert (log[0]["author"] == "Alex Plumb <alexplumb@gmail.com>")
+    assert (isinstance(log[0]["commit_date"], int))
+    assert (log[0]["message"] == "Second commit")
+    assert ([p["path"] for p in log[0]["changed_paths"]] == ["test1.txt"])
+    
+    assert (log[1]["commit"] == first_id)
+    assert (log[1]["parents"] == [])
+    assert (log[1]["message"] == "First commit\n\nWith a longer description")
+    assert (len(log[1]["changed_paths"]) == 2)
+    
+    assert (len(g.log(limit=1)) == 1)
+    assert (g.log(skip=1)[0]["commit"] == first_id)
+    
+    print "log.py pass"
@@ -18,7 +18,9 @@ modules = [
     "clone.py",
     "move.py",
     "pull.py",
-    "remote.py"
+    "remote.py",
+    "log.py",
+    "walk.py"
 ]
 
 if len(argv) == 2 and  argv[1] == "--cleanup":
@@ -0,0 +1,75 @@
+#
+# test/walk.py
+#
+
+import os
+from shutil import rmtree
+from sys import argv
+from optparse import OptionParser
+
+from gittyup.walk import walk_tree
+from util import touch
+
+parser = OptionParser()
+parser.add_option("-c", "--cleanup", action="store_true", default=False)
+(options, args) = parser.parse_args(argv)
+
+DIR = "walk"
+
+if options.cleanup:
+    rmtree(DIR, ignore_errors=True)
+
+    print "walk.py clean"
+else:
+    if os.path.isdir(DIR):
+        raise SystemExit("This test script has already been run.  Please call this script with --cleanup to start again")
+
+    os.makedirs(DIR + "/.git/objects")
+    os.makedirs(DIR + "/src/lib")
+    os.makedirs(DIR + "/build/out")
+    touch(DIR + "/README")
+    touch(DIR + "/src/main.c")
+    touch(DIR + "/src/lib/util.c")
+    touch(DIR + "/build/out/main.o")
+
+    entries = list(walk_tree(os.path.abspath(DIR), threads=3))
+    assert (sorted(entries) == [
+        ("", True),
+        ("README", False),
+        ("build", True),
+        ("build/out", True),
+        ("build/out/main.o", False),
+        ("src", True),
+        ("src/lib", True),
+        ("src/lib/util.c", False),
+        ("src/main.c", False)
+    ])
+    
+    # Folders come before their contents
+    names = [name for (name, is_dir) in entries]
+    assert (names.index("src/lib") < names.index("src/lib/util.c"))
+    
+    # Pruned folders are listed, but not walked into
+    entries = list(walk_tree(os.path.abspath(DIR),
+        prune=lambda name: name == "build"))
+    assert (("build", True) in entries)
+    assert (("build/out", True) not in entries)
+    
+    # Paths are relative to the base folder
+    entries = list(walk_tree(os.path.abspath(DIR + "/src"),
+        os.path.abspath(DIR)))
+    assert (("src/lib/util.c", False) in entries)
+    
+    # A name that can't be decoded stops the walk with an error, rather than
+    # leaving it waiting for workers that have died
+    for i in range(5):
+        os.makedirs(DIR + "/bad%i" % i)
+        touch(DIR + "/bad%i/\xff" % i)
+    try:
+        list(walk_tree(unicode(os.path.abspath(DIR)), threads=3))
+    except UnicodeDecodeError:
+        pass
+    else:
+        assert False, "the walk should have failed"
+    
+    print "walk.py pass"
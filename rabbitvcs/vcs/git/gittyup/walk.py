@@ -0,0 +1,170 @@
+#
+# walk.py
+#
+
+import os
+import stat
+import sys
+import threading
+from Queue import Queue, Empty, Full
+
+#: The number of threads listing folders.  Listing and stat'ing release the
+#: interpreter lock, which matters on network file systems.
+THREADS = 4
+
+#: The most entries that are waiting for the consumer.  When the consumer is
+#: slower than the walk, the walk waits rather than filling memory.
+MAX_QUEUED = 1000
+
+#: Folders that are never walked into
+SKIP = (".git",)
+
+_DONE = object()
+
+def walk_tree(path, base=None, prune=None, skip=SKIP, threads=THREADS):
+    """
+    Walks the given folder with a few threads, yielding its entries as they
+    are found rather than once the walk is over.  Folders are yielded before
+    anything in them, but otherwise the order is undefined.
+
+    Symbolic links are yielded as files and never followed, as git treats
+    them.
+
+    @type   path: string
+    @param  path: The absolute path to the folder to walk
+
+    @type   base: string
+    @param  base: The paths yielded are relative to this folder (by default
+                  the walked folder itself, which is yielded as "")
+
+    @type   prune: callable
+    @param  prune: Called with the relative path of each folder found, and
+                   returns True if the folder should be yielded but not walked
+                   into (eg. because it is ignored)
+
+    @type   skip: tuple
+    @param  skip: The names of folders that are neither yielded nor walked
+
+    @rtype  generator
+    @return (relative path, is a folder) tuples
+
+    If listing a folder fails with anything but an OSError (eg. a file name
+    that can't be decoded when path is unicode), the walk stops and the
+    error is raised here, once the entries found so far have been yielded.
+
+    """
+
+    if base is None:
+        base = path
+
+    threads = max(threads, 1)
+
+    root = os.path.relpath(path, base)
+    if root == ".":
+        root = ""
+
+    yield (root, True)
+    if prune and prune(root):
+        return
+
+    work = Queue()
+    entries = Queue(MAX_QUEUED)
+    stopped = threading.Event()
+    lock = threading.Lock()
+
+    # The first unexpected error raised by a worker, as sys.exc_info()
+    errors = []
+
+    # The number of folders that have been found but not yet listed
+    pending = [1]
+    work.put((path, root))
+
+    def put(entry):
+        while not stopped.isSet():
+            try:
+                entries.put(entry, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def list_folder(folder, rel_folder):
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+
+        for name in names:
+            if name in skip:
+                continue
+
+            child = os.path.join(folder, name)
+            if rel_folder:
+                rel_child = rel_folder + "/" + name
+            else:
+                rel_child = name
+
+            try:
+                is_dir = stat.S_ISDIR(os.lstat(child).st_mode)
+            except OSError:
+                # It went away
+                continue
+
+            put((rel_child, is_dir))
+
+            if is_dir and not (prune and prune(rel_child)):
+                lock.acquire()
+                pending[0] += 1
+                lock.release()
+                work.put((child, rel_child))
+
+    def worker():
+        while not stopped.isSet():
+            try:
+                item = work.get(timeout=0.1)
+            except Empty:
+                continue
+
+            if item is _DONE:
+                return
+
+            try:
+                try:
+                    list_folder(*item)
+                except Exception:
+                    # Stop the walk, and let the consumer know why
+                    lock.acquire()
+                    errors.append(sys.exc_info())
+                    lock.release()
+                    stopped.set()
+            finally:
+                lock.acquire()
+                pending[0] -= 1
+                finished = (pending[0] == 0)
+                lock.release()
+
+                if finished:
+                    put(_DONE)
+                    for i in range(threads):
+                        work.put(_DONE)
+
+    for i in range(threads):
+        thread = threading.Thread(target=worker)
+        thread.setDaemon(True)
+        thread.start()
+
+    try:
+        while True:
+            try:
+                entry = entries.get(timeout=0.1)
+            except Empty:
+                if errors:
+                    (error_type, error, traceback) = errors[0]
+                    raise error_type, error, traceback
+                continue
+
+            if entry is _DONE:
+                break
+            yield entry
+    finally:
+        # The consumer may stop early
+        stopped.set()
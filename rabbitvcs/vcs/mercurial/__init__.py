@@ -252,13 +252,13 @@ class Mercurial:
     def is_locked(self, path):
         return False
 
-    def get_items(self, paths, statuses=[]):
+    def get_items(self, paths, statuses=[], invalidate=True):
         if paths is None:
             return []
         
         items = []
         for path in paths:
-            st = self.statuses(path, invalidate=True)
+            st = self.statuses(path, invalidate=invalidate)
             for st_item in st:
                 if st_item.content == "modified" and os.path.isdir(st_item.path):
                     continue
@@ -21,12 +21,14 @@
 #
 
 import os.path
+import time
 import unittest
 
 from datetime import datetime
 
 import rabbitvcs.vcs
 
+from rabbitvcs.util.helper import get_file_stamp
 from rabbitvcs.util.log import Log
 
 log = Log("rabbitvcs.vcs.status")
@@ -60,7 +62,45 @@ MODIFIED_CHILD_STATUSES = [
     status_replaced
 ]
 
+class _ValueTable(object):
+    """
+    A list of values that are each stored once, so they can be referred to
+    by their index, with a dictionary for finding a value's index.
+    """
+
+    def __init__(self, values=[]):
+        self.values = []
+        self.indexes = {}
+        for value in values:
+            self.index(value)
+
+    def index(self, value):
+        try:
+            return self.indexes[value]
+        except KeyError:
+            pass
+        except TypeError:
+            # Not hashable
+            try:
+                return self.values.index(value)
+            except ValueError:
+                self.values.append(value)
+                return len(self.values) - 1
+
+        self.values.append(value)
+        self.indexes[value] = len(self.values) - 1
+        return self.indexes[value]
+
+    def __getitem__(self, index):
+        return self.values[index]
+
 class StatusCache(object):
+    """
+    Keeps the statuses of a VCS client, condensed into tuples of indexes into
+    tables of the values they share (status types, statuses, revisions and
+    authors), along with the time each one was checked.
+    """
+
     keys = [
         None,
         status_normal,
@@ -78,51 +118,50 @@ class StatusCache(object):
         status_calculating,
         status_error
     ]
-    
-    authors = []
-    revisions = []
 
     def __init__(self):
         self.cache = {}
+        
+        # The VCS specific statuses are added to the simple ones as they are
+        # seen, so each client has its own tables
+        self.statuses = _ValueTable(self.keys)
+        self.types = _ValueTable()
+        self.authors = _ValueTable()
+        self.revisions = _ValueTable()
+        
+        # path -> {file: stamp}, for the paths whose statuses were all checked
+        # together (see mark_fresh)
+        self.snapshots = {}
 
     def __setitem__(self, path, status):
         try:
-            content_index = self.keys.index(status.simple_content_status())
-            metadata_index = self.keys.index(status.simple_metadata_status())
-
-            try:
-                author_index = self.authors.index(status.author)
-            except ValueError, e:
-                self.authors.append(status.author)
-                author_index = len(self.authors) -1
-
-            try:
-                revision_index = self.revisions.index(status.revision)
-            except ValueError, e:
-                self.revisions.append(status.revision)
-                revision_index = len(self.revisions) -1
-            
+            # The VCS specific statuses are kept (rather than the simple ones)
+            # so that callers can filter them on the statuses they know about
             self.cache[path] = (
-                content_index,
-                metadata_index,
-                revision_index,
-                author_index,
-                status.date
+                self.types.index(type(status)),
+                self.statuses.index(status.content),
+                self.statuses.index(status.metadata),
+                self.revisions.index(status.revision),
+                self.authors.index(status.author),
+                status.date,
+                time.time()
             )
         except Exception, e:
             log.debug(e)
             
     def __getitem__(self, path):
         try:
-            (content_index, metadata_index, revision_index, author_index, date) = self.cache[path]
-            
-            content = self.keys[content_index]
-            metadata = self.keys[metadata_index]
-            revision = self.revisions[revision_index]
-            author = self.authors[author_index]
+            (type_index, content_index, metadata_index, revision_index,
+                author_index, date, checked) = self.cache[path]
             
-            return Status(path, content, metadata, revision=revision, 
-                author=author, date=date)
+            return self.types[type_index].restore(
+                path,
+                self.statuses[content_index],
+                self.statuses[metadata_index],
+                revision=self.revisions[revision_index],
+                author=self.authors[author_index],
+                date=date
+            )
         except Exception, e:
             log.debug(e)
 
@@ -147,6 +186,94 @@ class StatusCache(object):
             
         return statuses
 
+    def invalidate_path_statuses(self, path):
+        """
+        Removes the cached statuses for a path and everything below it.
+        """
+        prefix = path.rstrip(os.sep) + os.sep
+        for key in self.cache.keys():
+            if key == path or key.startswith(prefix):
+                del self.cache[key]
+        
+        # The snapshots of the path, the paths below it and the paths above it
+        # no longer describe what is cached
+        for key in self.snapshots.keys():
+            if (key == path or key.startswith(prefix) or
+                    path.startswith(key.rstrip(os.sep) + os.sep)):
+                del self.snapshots[key]
+
+    def mark_fresh(self, path, stamps=[]):
+        """
+        Records that the statuses for a path and everything below it have
+        just been checked, so that is_fresh can tell whether they are still
+        good without checking them again.
+        
+        The stamps (modification time, size and inode) of the items, of the
+        folders they are in and of the given administrative files are noted.
+        So this should be called after the check, once the VCS has finished
+        writing its own files.
+        
+        @type   path:   string
+        @param  path:   The path whose statuses were checked
+        
+        @type   stamps: list
+        @param  stamps: Any other files whose modification means the statuses
+                        are out of date (eg. the VCS administrative files)
+        
+        """
+        
+        if path not in self.cache:
+            return
+        
+        prefix = path.rstrip(os.sep) + os.sep
+        names = set([path])
+        for key in self.cache:
+            if key.startswith(prefix):
+                names.add(key)
+                names.add(os.path.dirname(key))
+        
+        snapshot = {}
+        for name in list(names) + list(stamps):
+            snapshot[name] = get_file_stamp(name)
+        
+        self.snapshots[path] = snapshot
+
+    def is_fresh(self, path, stamps=[]):
+        """
+        Checks whether the cached statuses for a path (and everything below it)
+        can still be trusted, ie. none of the items, the folders they are in,
+        nor the administrative files, have been modified since mark_fresh was
+        called for the path.
+        
+        Only the items under the path are looked at, not the whole cache.
+        
+        @type   path:   string
+        @param  path:   The path to check
+        
+        @type   stamps: list
+        @param  stamps: Any other files whose modification means the statuses
+                        are out of date (eg. the VCS administrative files)
+        
+        @rtype:         boolean
+        @return:        False if the statuses for the path weren't marked as
+                        fresh, or anything has changed since.
+        
+        """
+        
+        snapshot = self.snapshots.get(path)
+        if snapshot is None or path not in self.cache:
+            return False
+        
+        for stamp in stamps:
+            if stamp not in snapshot:
+                return False
+        
+        for (name, stamp) in snapshot.items():
+            if get_file_stamp(name) != stamp:
+                return False
+        
+        return True
+
 class Status(object):
 
     @staticmethod
@@ -161,6 +288,18 @@ class Status(object):
     def status_calc(path):
         return Status(path, status_calculating, summary = status_calculating)
     
+    @classmethod
+    def restore(cls, path, content, metadata=None, revision=None, author=None,
+            date=None):
+        """
+        Recreates a status of this type from its fields, without the VCS
+        specific status object it was originally made from.
+        """
+        status = cls.__new__(cls)
+        Status.__init__(status, path, content, metadata, revision=revision,
+            author=author, date=date)
+        return status
+    
     vcs_type = rabbitvcs.vcs.VCS_DUMMY
  
     clean_statuses = ['unchanged']
@@ -27,6 +27,9 @@ import subprocess
 import os
 import shutil
 import os.path
+import threading
+import urllib
+from Queue import Queue, Empty
 from os.path import isdir, isfile, dirname, islink, realpath
 from datetime import datetime
 
@@ -43,6 +46,14 @@ log = Log("rabbitvcs.vcs.svn")
 from rabbitvcs import gettext
 _ = gettext.gettext
 
+#: The most working copies (or externals) that are checked against the
+#: repository at the same time, when checking for modifications
+REMOTE_STATUS_WORKERS = 4
+
+#: When more paths than this have changed in the repository since a working
+#: copy was last checked, the whole working copy is checked again instead
+REMOTE_STATUS_MAX_CHANGED_PATHS = 200
+
 # Extra "action" for "commit completed"
 commit_completed = "commit_completed"
 
@@ -237,6 +248,10 @@ class SVN:
         self.vcs = rabbitvcs.vcs.VCS_SVN
         self.cache = rabbitvcs.vcs.status.StatusCache()
 
+        # Working copy paths to what they looked like the last time they were
+        # checked against the repository (see get_remote_updates)
+        self.remote_cache = {}
+
     def statuses(self, path, recurse=True, update=False, invalidate=False):
         """
 
@@ -390,7 +405,7 @@ class SVN:
 
         return is_locked
 
-    def get_items(self, paths, statuses=[]):
+    def get_items(self, paths, statuses=[], invalidate=True):
         """
         Retrieves a list of files that have one of a set of statuses
 
@@ -400,6 +415,10 @@ class SVN:
         @type   statuses:   list
         @param  statuses:   A list of pysvn.wc_status_kind statuses.
 
+        @type   invalidate: boolean
+        @param  invalidate: Whether to check the statuses again rather than use
+                            any cached ones.
+
         @rtype:             list
         @return:            A list of statuses
 
@@ -409,36 +428,272 @@ class SVN:
 
         for path in paths:
 
-            sts = self.statuses(path, invalidate=True)
+            sts = self.statuses(path, invalidate=invalidate)
             for st in sts:
                 if (not statuses) or (st.content in statuses or st.metadata in statuses):
                     items.append(st)
 
         return items
 
-    def get_remote_updates(self, paths):
+    def get_remote_updates(self, paths, workers=REMOTE_STATUS_WORKERS):
+        """
+        Retrieves the items that have changed in the repository since they
+        were last updated (ie. "svn status -u"), without touching the local
+        status cache.
+
+        Each working copy (and each external in one) is checked by its own
+        worker, up to the given number at a time.  The HEAD revision that a
+        working copy was last checked against is remembered, so checking it
+        again only asks the repository about the paths that were committed
+        since then.
+
+        @type   paths:      list
+        @param  paths:      A list of working copy paths.
+
+        @type   workers:    integer
+        @param  workers:    The most working copies to check at the same time.
+
+        @rtype:             list
+        @return:            A list of statuses
+
+        """
+
         if paths is None:
             return []
-        
-        items = []
+
+        targets = []
         for path in paths:
-            try:
-                sts = self.statuses(path, update=True, invalidate=True)
-            except Exception, e:
-                log.exception(e)
-                continue
+            if path not in targets:
+                targets.append(path)
+            for external in self._find_externals(path):
+                if external not in targets:
+                    targets.append(external)
+
+        results = [[]] * len(targets)
+
+        queue = Queue()
+        for index, path in enumerate(targets):
+            queue.put((index, path))
+
+        def worker():
+            # pysvn clients must not be shared between threads
+            client = self._make_worker_client()
+            while True:
+                try:
+                    (index, path) = queue.get_nowait()
+                except Empty:
+                    return
+
+                try:
+                    results[index] = self._check_remote(client, path)
+                except Exception, e:
+                    log.exception(e)
+
+        threads = [threading.Thread(target=worker)
+            for i in range(max(1, min(workers, len(targets))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
-            for st in sts:
-                        
-                if st.remote_content is None and st.remote_metadata is None:
-                    continue
+        items = []
+        seen = set()
+        for statuses in results:
+            for st in statuses:
+                if st.path not in seen:
+                    seen.add(st.path)
+                    items.append(st)
+
+        return items
 
-                if st.remote_content == "none" and st.remote_metadata == "none":
-                    continue
+    def _find_externals(self, path):
+        """
+        Returns the paths of the externals (including nested ones) in the
+        given working copy path, from a local status check.
 
-                items.append(st)
+        """
 
-        return items
+        externals = []
+        try:
+            for st in self.client.status(path, depth=pysvn.depth.infinity,
+                    get_all=False, ignore_externals=False):
+                if (st.text_status == pysvn.wc_status_kind.external and
+                        st.path != path):
+                    externals.append(st.path)
+        except pysvn.ClientError, e:
+            log.exception(e)
+
+        return externals
+
+    def _make_worker_client(self):
+        client = pysvn.Client()
+        for name in ("callback_cancel", "callback_get_login",
+                "callback_ssl_server_trust_prompt",
+                "callback_ssl_client_cert_password_prompt",
+                "callback_ssl_client_cert_prompt"):
+            func = getattr(self.client, name, None)
+            if func is not None:
+                setattr(client, name, func)
+
+        return client
+
+    def _get_wc_stamp(self, path):
+        """
+        Returns the modification time of the working copy's administrative
+        files, which changes whenever it is updated, switched or committed.
+
+        """
+
+        folder = path
+        if not isdir(folder):
+            folder = dirname(folder)
+
+        stamp = []
+        while folder:
+            for name in ("wc.db", "entries"):
+                admin_file = os.path.join(folder, ".svn", name)
+                if os.path.exists(admin_file):
+                    stamp.append((admin_file, os.stat(admin_file).st_mtime))
+                    if name == "wc.db":
+                        return stamp
+
+            parent = dirname(folder)
+            if parent == folder:
+                break
+            folder = parent
+
+        return stamp
+
+    def _has_remote_changes(self, st):
+        if st.remote_content is None and st.remote_metadata is None:
+            return False
+
+        if st.remote_content == "none" and st.remote_metadata == "none":
+            return False
+
+        return True
+
+    def _remote_statuses(self, client, path, depth):
+        return [rabbitvcs.vcs.status.SVNStatus(st)
+            for st in client.status(path, depth=depth, get_all=False,
+                update=True, ignore_externals=True)]
+
+    def _check_remote(self, client, path):
+        """
+        Checks a single working copy path against the repository.
+
+        @rtype:     list
+        @return:    The statuses of the items with remote changes.
+
+        """
+
+        info = client.info2(path, recurse=False)[0][1]
+        url = info["URL"]
+        # The log gives the paths decoded, but the URL is escaped
+        url_path = urllib.unquote(
+            self._to_utf8(url[len(info["repos_root_URL"]):]))
+
+        head = client.info2(url,
+            revision=pysvn.Revision(pysvn.opt_revision_kind.head),
+            recurse=False)[0][1]["rev"].number
+
+        stamp = self._get_wc_stamp(path)
+
+        cached = self.remote_cache.get(path)
+        if cached and (cached["url"] != url or cached["stamp"] != stamp):
+            cached = None
+
+        if cached and cached["revision"] == head:
+            return cached["items"].values()
+
+        changed_paths = None
+        if cached:
+            changed_paths = self._find_changed_paths(client, url, url_path,
+                path, cached["revision"] + 1, head)
+
+        if changed_paths is None:
+            items = {}
+            for st in self._remote_statuses(client, path,
+                    pysvn.depth.infinity):
+                if self._has_remote_changes(st):
+                    items[st.path] = st
+        else:
+            items = cached["items"].copy()
+            for (check_path, depth) in changed_paths:
+                for st in self._remote_statuses(client, check_path, depth):
+                    if self._has_remote_changes(st):
+                        items[st.path] = st
+                    elif st.path in items:
+                        del items[st.path]
+
+        self.remote_cache[path] = {
+            "url": url,
+            "stamp": stamp,
+            "revision": head,
+            "items": items
+        }
+
+        return items.values()
+
+    def _to_utf8(self, path):
+        if isinstance(path, unicode):
+            return path.encode("utf-8")
+        return path
+
+    def _find_changed_paths(self, client, url, url_path, path, start, end):
+        """
+        Works out which paths of a working copy need checking again, from the
+        log of the revisions committed since it was last checked.
+
+        @rtype:     list
+        @return:    (path, depth) tuples to pass to a status check, or None
+                    if too much has changed to be worth checking piecemeal.
+
+        """
+
+        changed = set()
+        logged = False
+        for entry in client.log(url,
+                revision_start=pysvn.Revision(pysvn.opt_revision_kind.number, end),
+                revision_end=pysvn.Revision(pysvn.opt_revision_kind.number, start),
+                discover_changed_paths=True):
+            for changed_path in entry.changed_paths:
+                logged = True
+                repos_path = self._to_utf8(changed_path.path)
+                if repos_path == url_path:
+                    changed.add(path)
+                elif repos_path.startswith(url_path.rstrip("/") + "/"):
+                    rel_path = repos_path[len(url_path):].lstrip("/")
+                    if isinstance(path, unicode):
+                        rel_path = rel_path.decode("utf-8")
+                    changed.add(os.path.join(path, rel_path))
+
+            if len(changed) > REMOTE_STATUS_MAX_CHANGED_PATHS:
+                return None
+
+        if logged and not changed:
+            # The log only lists revisions that touched the working copy's
+            # URL, so if none of its paths could be placed in the working
+            # copy, don't trust the cached result
+            return None
+
+        checks = []
+        for changed_path in sorted(changed):
+            # Added items don't exist locally yet, so they are picked up by
+            # checking the nearest folder that does
+            check_path = changed_path
+            while not os.path.exists(check_path) and check_path != path:
+                check_path = dirname(check_path)
+
+            if isdir(check_path):
+                check = (check_path, pysvn.depth.immediates)
+            else:
+                check = (check_path, pysvn.depth.empty)
+
+            if check not in checks:
+                checks.append(check)
+
+        return checks
 
     def get_repo_url(self, path):
         """
@@ -494,6 +749,33 @@ class SVN:
 
         return returner
 
+    def get_repo_info(self, url_or_path):
+        """
+        Retrieve the repository root URL and the youngest (HEAD) revision of
+        the repository for the given URL or path, using a single request.
+
+        @type   url_or_path:    string
+        @param  url_or_path:    A repository URL or working copy path.
+
+        @rtype:                 tuple
+        @return:                (repository root URL, youngest revision number)
+
+        """
+
+        info = self.client.info2(url_or_path,
+            revision=pysvn.Revision(pysvn.opt_revision_kind.head),
+            recurse=False)
+
+        root_url = ""
+        youngest = None
+        try:
+            root_url = info[0][1]["repos_root_URL"]
+            youngest = info[0][1]["rev"].number
+        except Exception, e:
+            log.exception(e)
+
+        return (root_url, youngest)
+
     def is_path_repository_url(self, path):
         for proto in ("http://", "https://", "svn://", "svn+ssh://", "file://"):
             if path.startswith(proto):